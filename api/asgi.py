@@ -0,0 +1,97 @@
+# api/asgi.py
+# 功能：ASGI 入口（uvicorn api.asgi:app 等 ASGI 服务器）
+# - POST /check 直接在 ASGI 服务器的事件循环中等待结果（外部请求在共享事件循环中执行），不占用工作线程
+# - 其他路由（含 "stream": true 的 /check、格式错误的请求）交给 Flask 应用（asgiref 的 WsgiToAsgi）
+# - 启动时（lifespan.startup）调用 start_job_workers() 继续执行未完成的异步批量任务
+import json
+
+from asgiref.wsgi import WsgiToAsgi
+
+from api.index import app as flask_app, check_batch_async, check_error, parse_check_request, start_job_workers
+from utils.async_http import on_shared_loop
+
+wsgi_app = WsgiToAsgi(flask_app)
+
+
+async def read_body(receive):
+    """读取完整的请求体"""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return body
+
+
+def replay_body(body, receive):
+    """已读取的请求体重新交给 Flask 应用（之后的消息仍从原 receive 读取，如客户端断开）"""
+    sent = False
+
+    async def replay():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return replay
+
+
+async def send_json(send, payload, status=200):
+    body = flask_app.json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def check(data, send):
+    """
+    POST /check（与 api/index.py 的 check() 返回相同的 JSON）
+    """
+    try:
+        try:
+            addresses, options = parse_check_request(data)
+        except ValueError as e:
+            await send_json(send, {"error": str(e)}, 400)
+            return
+
+        if not addresses:
+            await send_json(send, {"error": "住所を入力してください"})
+            return
+
+        results = await on_shared_loop(check_batch_async(addresses, **options))
+        await send_json(send, {"results": results})
+
+    except Exception as e:
+        await send_json(send, check_error(e), 500)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_job_workers()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] == "/check":
+        body = await read_body(receive)
+        try:
+            data = json.loads(body)
+        except ValueError:
+            data = None
+        if isinstance(data, dict) and not data.get("stream"):
+            await check(data, send)
+            return
+        receive = replay_body(body, receive)
+    await wsgi_app(scope, receive, send)
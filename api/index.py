@@ -1,15 +1,30 @@
 # api/index.py
 # 2025 年 Vercel 部署专用入口（已测试 100% 成功）
+import asyncio
+import csv
+import hashlib
+import io
+import json
 import os
-from flask import Flask, render_template, request, jsonify
-import math
+import queue
+import re
+from flask import Flask, Response, render_template, request, jsonify, stream_with_context
+import time
 import yaml
-import requests
 
 # 导入你的工具函数（相对路径要改对！）
-from utils.geocoder import geocode
-from utils.osm_roads import query_osm_roads
-from utils.rules import can_access_fcl
+from utils.async_http import async_http_get, gather_limited, run_sync, submit
+from utils.drayage_grid import get_drayage_grid
+from utils.geocoder import geocode_async, geocode_cache_stats, tokenize_address
+from utils.jobs import JobManager
+from utils.settings import get_setting
+from utils.singleflight import SingleFlight
+from utils.timing import METRICS, collect_async, collect_spans, summarize, timed, timer
+from utils.osm_roads import OVERPASS_FLIGHTS, query_osm_roads_batch_async
+from utils.port_index import PortIndex
+from utils.port_routes import OSRM_URL, format_port_result, get_route_table_async, port_result_from_route
+from utils.result_cache import create_result_cache
+from utils.rules import can_access_fcl, evaluate_all_vehicles, get_rules, rules_version
 #from jp_address_parser import parse  # 如果你装了这个包
 #from japanese_address_parser_py import parse  # 正确导入路径
 from utils.jp_address_parser_simple import parse
@@ -20,31 +35,38 @@ CONFIG_DIR = os.path.join(BASE_DIR, "config")
 # app = Flask(__name__, template_folder="../templates")  # 注意路径！！！
 app = Flask(__name__, template_folder=TEMPLATE_DIR)  # ✅ 正确路径
 # 修改加载配置方式（避免路径错误）
-with open(os.path.join(CONFIG_DIR, "ports.yaml"), encoding="utf-8") as f:
-    PORTS = yaml.safe_load(f)["destination_ports"]
+with open(os.path.join(CONFIG_DIR, "ports.yaml"), "rb") as f:
+    PORTS_CONFIG = f.read()
+PORTS = yaml.safe_load(PORTS_CONFIG.decode("utf-8"))["destination_ports"]
+# 港口配置版本（结果缓存键的一部分，港口配置变更后旧结果自动失效）
+PORTS_VERSION = hashlib.sha1(PORTS_CONFIG).hexdigest()[:12]
 
-def haversine(lat1, lon1, lat2, lon2):
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return round(R * c, 1)
+# 港口空间索引（启动时构建一次）
+PORT_INDEX = PortIndex(PORTS)
 
-def get_route_info(start_lat, start_lng, end_lat, end_lng, timeout=8):
+# 进行中的相同 OSRM 查询（按起终点）只发送一次
+ROUTE_FLIGHTS = SingleFlight()
+
+async def get_route_info_async(start_lat, start_lng, end_lat, end_lng, timeout=8):
     """
-    使用 OSRM API 获取实际道路距离和时间
+    使用 OSRM API 获取实际道路距离和时间（同一起终点正在查询时等待其结果）
     :return: (distance_km, duration_minutes) 或 (None, None)
     """
+    key = (start_lat, start_lng, end_lat, end_lng)
+    with timer("osrm_route"):
+        return await ROUTE_FLIGHTS.do(key, _fetch_route_info_async, start_lat, start_lng, end_lat, end_lng, timeout)
+
+
+async def _fetch_route_info_async(start_lat, start_lng, end_lat, end_lng, timeout):
     try:
         # OSRM API - 免费的路线规划服务
-        url = f"http://router.project-osrm.org/route/v1/driving/{start_lng},{start_lat};{end_lng},{end_lat}"
+        url = f"{OSRM_URL}/route/v1/driving/{start_lng},{start_lat};{end_lng},{end_lat}"
         params = {
             "overview": "false",
             "steps": "false"
         }
         
-        resp = requests.get(url, params=params, timeout=timeout)
+        resp = await async_http_get(url, params=params, timeout=timeout)
         resp.raise_for_status()
         data = resp.json()
         
@@ -64,52 +86,137 @@ def get_route_info(start_lat, start_lng, end_lat, end_lng, timeout=8):
         return None, None
 
 
+def get_route_info(start_lat, start_lng, end_lat, end_lng, timeout=8):
+    """同步版本（见 get_route_info_async）"""
+    return run_sync(get_route_info_async(start_lat, start_lng, end_lat, end_lng, timeout))
+
+
+def port_result_from_grid(lat, lng, port):
+    """
+    从预计算的牵引时间网格查询（scripts/build_drayage_grid.py 生成）
+    只采用 OSRM 实际路线的网格值；估算值或超出网格范围时返回 None，继续走 OSRM
+    :return: 港口距离结果 dict 或 None
+    """
+    grid = get_drayage_grid()
+    if grid is None:
+        return None
+    hit = grid.lookup(lat, lng, port)
+    if hit is None or not hit[2]:
+        return None
+    distance, total_minutes, _ = hit
+    return format_port_result(port, distance, total_minutes, source="grid")
+
+
 def calculate_port_distance(lat, lng, port):
     """
-    计算到指定港口的距离和时间
+    计算到指定港口的距离和时间（优先查预计算网格）
     :return: dict with name, code, distance, time
     """
-    straight_dist = haversine(lat, lng, port["lat"], port["lng"])
-    
+    info = port_result_from_grid(lat, lng, port)
+    if info:
+        return info
     # 尝试获取实际道路距离和时间
     actual_distance, actual_duration = get_route_info(lat, lng, port["lat"], port["lng"])
+    return port_result_from_route(lat, lng, port, actual_distance, actual_duration)
+
+
+def lookup_grid_results(points, candidates):
+    """
+    从预计算网格查询每个（地点, 候选港口）
+    :return: ([{港口代码: port_info 或 None}, ...], 网格未命中的 [(地点下标, port), ...])
+    """
+    results = [{} for _ in points]
+    pending = []
+    for i, ((lat, lng), row) in enumerate(zip(points, candidates)):
+        for port in row:
+            if port["code"] in results[i]:
+                continue
+            info = port_result_from_grid(lat, lng, port)
+            if info:
+                results[i][port["code"]] = info
+            else:
+                results[i][port["code"]] = None
+                pending.append((i, port))
+    return results, pending
+
+
+async def resolve_port_results_async(points, candidates):
+    """
+    批量计算每个地点到各自候选港口的距离和时间
+    先查预计算网格，网格没有的（地点, 港口）才合并为一次 OSRM table 请求
+    :param points: [(lat, lng), ...]
+    :param candidates: 与 points 顺序一致的候选港口列表 [[port, ...], ...]
+    :return: 与 points 顺序一致的 [{港口代码: port_info}, ...]
+    """
+    # 网格查询（NumPy 插值）在线程池中执行，不阻塞共享事件循环
+    results, pending = await asyncio.to_thread(lookup_grid_results, points, candidates)
+    if not pending:
+        return results
     
-    if actual_distance and actual_duration:
-        distance = actual_distance
-        truck_factor = 2.0
-        total_minutes = int(actual_duration * truck_factor)
-    else:
-        # 使用估算方法
-        road_distance_factor = 1.4
-        distance = round(straight_dist * road_distance_factor, 1)
-        avg_speed = 25
-        total_minutes = int((distance / avg_speed) * 60)
-    
-    # 格式化时间字符串
-    hours = total_minutes // 60
-    mins = total_minutes % 60
-    
-    if hours > 0:
-        time_str = f"{hours}時間{mins}分" if mins > 0 else f"{hours}時間"
-    else:
-        time_str = f"{mins}分"
+    # 只对未命中的（地点, 港口）请求 OSRM：其他请求正在查询的组合等待其结果，
+    # 其余组合合并为一次 table 请求
+    waiters = {}
+    new_pairs = {}
+    for i, port in pending:
+        key = (points[i][0], points[i][1], port["code"])
+        if key in waiters or key in new_pairs:
+            continue
+        waiter = ROUTE_FLIGHTS.join(key)
+        if waiter:
+            waiters[key] = waiter
+        else:
+            new_pairs[key] = port
+    if new_pairs:
+        waiters[None] = ROUTE_FLIGHTS.start(list(new_pairs), fetch_route_pairs_async, new_pairs)
     
+    # 每个 join / start 得到的等待方都要 wait 一次（同一请求的多个等待方共用结果）
+    routes = {}
+    for pair_routes in await asyncio.gather(*(waiter.wait() for waiter in waiters.values())):
+        routes.update(pair_routes)
+    for i, port in pending:
+        lat, lng = points[i]
+        route = routes.get((lat, lng, port["code"]), (None, None))
+        results[i][port["code"]] = port_result_from_route(lat, lng, port, *route)
+    return results
+
+
+async def fetch_route_pairs_async(pairs):
+    """
+    一次 OSRM table 请求获取多个（地点, 港口）组合的道路距离和时间（相同坐标合并为一行）
+    :param pairs: {(lat, lng, 港口代码): port}
+    :return: {(lat, lng, 港口代码): (distance_km, duration_minutes)}
+    """
+    sources = list(dict.fromkeys((lat, lng) for lat, lng, _ in pairs))
+    ports = {}
+    for (_, _, code), port in pairs.items():
+        ports.setdefault(code, port)
+    codes = list(ports)
+    table = await get_route_table_async(sources, [(ports[c]["lat"], ports[c]["lng"]) for c in codes])
+    row_pos = {point: n for n, point in enumerate(sources)}
+    col_pos = {c: n for n, c in enumerate(codes)}
     return {
-        "name": port["name"],
-        "code": port["code"],
-        "distance": distance,
-        "time": time_str,
-        "minutes": total_minutes  # 用于排序
+        (lat, lng, code): table[row_pos[(lat, lng)]][col_pos[code]]
+        for lat, lng, code in pairs
     }
 
 
+def resolve_port_results(points, candidates):
+    """同步版本（见 resolve_port_results_async）"""
+    return run_sync(resolve_port_results_async(points, candidates))
+
+
+def find_nearest_port(lat, lng, major_only=False):
+    """
+    直线距离最近的港口
+    :param major_only: 只在主要港口（type: main）中查找
+    :return: 港口配置 dict
+    """
+    return PORT_INDEX.nearest(lat, lng, port_type="main" if major_only else None)[0][0]
+
+
 def get_nearest_port(lat, lng):
     """获取最近的港口"""
-    distances = [(p, haversine(lat, lng, p["lat"], p["lng"])) for p in PORTS]
-    nearest = min(distances, key=lambda x: x[1])
-    port = nearest[0]
-    
-    return calculate_port_distance(lat, lng, port)
+    return calculate_port_distance(lat, lng, find_nearest_port(lat, lng))
 
 
 def get_nearest_major_port(lat, lng):
@@ -117,15 +224,59 @@ def get_nearest_major_port(lat, lng):
     获取最近的主要港口信息
     :return: dict with port info
     """
-    # 筛选主要港口
-    major_ports = [p for p in PORTS if p.get("type") == "main"]
-    
-    # 找到直线距离最近的主要港口
-    distances = [(p, haversine(lat, lng, p["lat"], p["lng"])) for p in major_ports]
-    nearest = min(distances, key=lambda x: x[1])
-    port = nearest[0]
+    return calculate_port_distance(lat, lng, find_nearest_port(lat, lng, major_only=True))
+
+
+async def get_nearest_ports_batch_async(points):
+    """
+    批量计算多个地点的最近港口和最近主要港口
+    网格未命中的部分只发一次 OSRM table 请求；最近港口本身就是主要港口时不重复计算
+    :param points: [(lat, lng), ...]
+    :return: 与 points 顺序一致的 [(port_info, nearest_major_port), ...]
+    """
+    nearest_all, nearest_major = await asyncio.gather(
+        asyncio.to_thread(PORT_INDEX.nearest_batch, points),
+        asyncio.to_thread(PORT_INDEX.nearest_batch, points, port_type="main"),
+    )
+    pairs = [(a[0][0], b[0][0]) for a, b in zip(nearest_all, nearest_major)]
+    resolved = await resolve_port_results_async(points, pairs)
     
-    return calculate_port_distance(lat, lng, port)
+    results = []
+    for (nearest, major), infos in zip(pairs, resolved):
+        port_info = infos[nearest["code"]]
+        if major["code"] == nearest["code"]:
+            major_info = dict(port_info)
+        else:
+            major_info = infos[major["code"]]
+        results.append((port_info, major_info))
+    return results
+
+
+def get_nearest_ports_batch(points):
+    """同步版本（见 get_nearest_ports_batch_async）"""
+    return run_sync(get_nearest_ports_batch_async(points))
+
+
+async def get_top_ports_batch_async(points, k=3, port_type=None):
+    """
+    批量获取每个地点预估牵引时间最短的 k 个港口
+    先用港口索引取直线距离最近的 2k 个候选，再比较实际牵引时间（网格 + 一次 OSRM table 请求）
+    :param points: [(lat, lng), ...]
+    :param k: 返回的港口数
+    :param port_type: 只在指定类型（main / local）中查找
+    :return: 与 points 顺序一致的 [[port_info, ...], ...]（按牵引时间升序）
+    """
+    nearest = await asyncio.to_thread(PORT_INDEX.nearest_batch, points, k * 2, port_type)
+    candidates = [[p for p, _ in row] for row in nearest]
+    resolved = await resolve_port_results_async(points, candidates)
+    return [sorted(infos.values(), key=lambda x: x["minutes"])[:k] for infos in resolved]
+
+
+def get_top_ports_batch(points, k=3, port_type=None):
+    """同步版本（见 get_top_ports_batch_async）"""
+    return run_sync(get_top_ports_batch_async(points, k, port_type))
+
+
 # 新增：运行时调试（临时加，成功后删）
 @app.errorhandler(404)
 def not_found(error):
@@ -146,140 +297,609 @@ except ImportError as e:
 def index():
     return render_template("index.html")
 
-@app.route("/check", methods=["POST"])
-def check():
-    """API：批量/单地址检查（返回日文 JSON）。"""
-    try:
-        addresses = request.json.get("addresses", [])  # 支持批量（list）
-        vehicle_type = request.json.get("vehicle_type", "40ft")  # 车辆类型，默认40ft
-        
-        if isinstance(addresses, str):
-            addresses = [addresses.strip()]  # 单地址转为 list
-        
-        if not addresses:
-            return jsonify({"error": "住所を入力してください"})
-        
-        results = []
-        for addr in addresses:
-            if not addr.strip():
-                continue
-            
-            # 0. 预检查：是否只有公司名（没有具体地址）
-            company_only_keywords = ["株式会社", "有限会社", "合同会社", "Co.,Ltd", "Corporation", "Inc."]
-            is_company_name = any(keyword in addr for keyword in company_only_keywords)
-            
-            # 检查是否有具体地址信息（都道府县、市区町村、番地等）
-            has_location = any(suffix in addr for suffix in ["都", "道", "府", "県", "市", "区", "町", "村", "丁目", "番地", "-"])
-            
-            # 如果只有公司名，先尝试地理编码（可能在 POI 数据库中）
-            # 如果找不到，再提示需要详细地址
-            
-            # 1. NLP 地址解析
-            parsed = {"full": addr, "prefecture": "", "city": "", "town": "", "rest": ""}
-            try:
-                parsed.update(parse(addr)._asdict())
-            except:
-                pass
-            
-            # 2. 地图：地理编码
-            lat, lng, used_address = geocode(addr)
-            if not lat:
-                # 地理编码失败
-                if is_company_name and not has_location:
-                    # 只有公司名，且找不到位置
-                    # 检查是否包含设施类型关键词
-                    facility_keywords = {
-                        "倉庫": "倉庫施設",
-                        "物流センター": "物流施設",
-                        "配送センター": "配送施設",
-                        "工場": "工場施設",
-                        "事業所": "事業所",
-                        "本社": "本社",
-                        "支店": "支店",
-                        "営業所": "営業所"
-                    }
-                    
-                    facility_type = None
-                    for keyword, ftype in facility_keywords.items():
-                        if keyword in addr:
-                            facility_type = ftype
-                            break
-                    
-                    # 判断设施类型是否通常可达
-                    accessible_facilities = ["倉庫施設", "物流施設", "配送施設", "工場施設"]
-                    likely_accessible = facility_type in accessible_facilities
-                    
-                    if likely_accessible:
-                        reason = f"会社名のみ（{facility_type}）で位置情報が見つかりません。以下をお試しください：\n1. 正確な会社名を確認して再入力\n2. 詳細住所（都道府県・市区町村・番地）を追加\n※ {facility_type}は通常コンテナ車対応可能な施設です。"
-                    else:
-                        reason = "会社名のみで位置情報が見つかりません。以下をお試しください：\n1. 正確な会社名を確認して再入力\n2. 詳細住所（都道府県・市区町村・番地）を追加"
-                    
-                    results.append({
-                        "address": addr,
-                        "can_access": False,
-                        "reason": reason,
-                        "error": "住所不明確"
-                    })
-                else:
-                    # 普通地址找不到
-                    results.append({
-                        "address": addr,
-                        "can_access": False,
-                        "reason": "座標解析不可、住所を確認してください",
-                        "error": "座標解析不可"
-                    })
-                continue
+@app.route("/cache/stats")
+def cache_stats():
+    """API：缓存命中统计"""
+    stats = {
+        "geocode": geocode_cache_stats(),
+        # 合并到进行中请求的次数（singleflight）
+        "coalesced": {"overpass": OVERPASS_FLIGHTS.stats(), "osrm": ROUTE_FLIGHTS.stats()},
+    }
+    if RESULT_CACHE:
+        stats["result"] = RESULT_CACHE.stats()
+    return jsonify(stats)
+
+@app.route("/metrics")
+def metrics():
+    """API：各阶段耗时直方图（Prometheus 文本格式）"""
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
+
+# /check 最终结果缓存（见 config/settings.yaml 的 result_cache）
+RESULT_CACHE = create_result_cache()
+
+def address_key(addr):
+    """
+    判断两个输入地址是否相同（批次内去重、结果缓存键）
+    规则会检查建筑物名称、楼层等信息，所以地址只合并空白，不使用 normalize_address
+    """
+    return " ".join(addr.split())
+
+def result_cache_key(addr, vehicle_type, all_vehicles=False):
+    """
+    结果缓存键：地址 + 车辆类型 + 规则配置版本 + 港口配置版本
+    """
+    mode = "all" if all_vehicles else "one"
+    return "|".join([rules_version(), PORTS_VERSION, vehicle_type, mode, address_key(addr)])
+
+async def prepare_address_async(addr):
+    """
+    单个地址的解析 + 地理编码
+    :param addr: 原始地址
+    :return: dict；地理编码成功时含 address / parsed / lat / lng / used_address，
+             失败时含 "result"（直接返回给前端的错误结果）
+    """
+    # 0. 预检查：是否只有公司名（没有具体地址）
+    company_only_keywords = ["株式会社", "有限会社", "合同会社", "Co.,Ltd", "Corporation", "Inc."]
+    is_company_name = any(keyword in addr for keyword in company_only_keywords)
+    
+    # 检查是否有具体地址信息（都道府县、市区町村、番地等）
+    has_location = any(suffix in addr for suffix in ["都", "道", "府", "県", "市", "区", "町", "村", "丁目", "番地", "-"])
+    
+    # 如果只有公司名，先尝试地理编码（可能在 POI 数据库中）
+    # 如果找不到，再提示需要详细地址
+    
+    # 1. NLP 地址解析（分词结果在进程内缓存，地理编码的标准化 / 候选地址生成直接复用）
+    parsed = {"full": addr, "prefecture": "", "city": "", "town": "", "rest": ""}
+    with timer("parse"):
+        try:
+            parsed.update(tokenize_address(addr).parsed._asdict())
+        except:
+            pass
+    
+    # 2. 地图：地理编码
+    with timer("geocode"):
+        lat, lng, used_address = await geocode_async(addr)
+    if not lat:
+        # 地理编码失败
+        if is_company_name and not has_location:
+            # 只有公司名，且找不到位置
+            # 检查是否包含设施类型关键词
+            facility_keywords = {
+                "倉庫": "倉庫施設",
+                "物流センター": "物流施設",
+                "配送センター": "配送施設",
+                "工場": "工場施設",
+                "事業所": "事業所",
+                "本社": "本社",
+                "支店": "支店",
+                "営業所": "営業所"
+            }
             
-            # 3. 地图：OSM 道路
-            roads = query_osm_roads(lat, lng)
+            facility_type = None
+            for keyword, ftype in facility_keywords.items():
+                if keyword in addr:
+                    facility_type = ftype
+                    break
             
-            # 4. 规则：可达性判断（传入车辆类型和原始地址）
-            can_access, reason = can_access_fcl(roads, parsed, vehicle_type, original_address=addr)
+            # 判断设施类型是否通常可达
+            accessible_facilities = ["倉庫施設", "物流施設", "配送施設", "工場施設"]
+            likely_accessible = facility_type in accessible_facilities
             
-            # 5. 最近港口（所有港口中最近的）
-            port_info = get_nearest_port(lat, lng)
+            if likely_accessible:
+                reason = f"会社名のみ（{facility_type}）で位置情報が見つかりません。以下をお試しください：\n1. 正確な会社名を確認して再入力\n2. 詳細住所（都道府県・市区町村・番地）を追加\n※ {facility_type}は通常コンテナ車対応可能な施設です。"
+            else:
+                reason = "会社名のみで位置情報が見つかりません。以下をお試しください：\n1. 正確な会社名を確認して再入力\n2. 詳細住所（都道府県・市区町村・番地）を追加"
             
-            # 6. 最近的主要港口
-            nearest_major_port = get_nearest_major_port(lat, lng)
+            return {"result": {
+                "address": addr,
+                "can_access": False,
+                "reason": reason,
+                "error": "住所不明確"
+            }}
+        # 普通地址找不到
+        return {"result": {
+            "address": addr,
+            "can_access": False,
+            "reason": "座標解析不可、住所を確認してください",
+            "error": "座標解析不可"
+        }}
+    
+    return {"address": addr, "parsed": parsed, "lat": lat, "lng": lng, "used_address": used_address}
+
+
+def prepare_address(addr):
+    """同步版本（见 prepare_address_async）"""
+    return run_sync(prepare_address_async(addr))
+
+
+def vehicle_matrix(verdicts):
+    """
+    所有车辆类型的判断结果
+    :param verdicts: evaluate_all_vehicles 的返回值
+    :return: ({车辆类型: {name, can_access, reason}}, 可进入的最大车辆类型或 None)
+    """
+    vehicles = get_rules().vehicles
+    matrix = {
+        vt: {"name": vehicles[vt]["name"], "can_access": ok, "reason": reason}
+        for vt, (ok, reason) in verdicts.items()
+    }
+    # vehicles.yaml 按车辆从大到小排列
+    largest = next((vt for vt, (ok, _) in verdicts.items() if ok), None)
+    return matrix, largest
+
+
+def build_result(ctx, roads, vehicle_type, ports=None, all_vehicles=False):
+    """
+    根据地理编码结果和周边道路生成单个地址的检查结果
+    :param ctx: prepare_address_async 的返回值（地理编码成功）
+    :param roads: 周边道路列表
+    :param vehicle_type: 车辆类型
+    :param ports: 预先批量计算好的 (最近港口, 最近主要港口)；None 时单独计算
+    :param all_vehicles: 同时判断所有车辆类型（结果加入 vehicles / largest_vehicle）
+    :return: 结果 dict
+    """
+    addr = ctx["address"]
+    lat, lng, used_address = ctx["lat"], ctx["lng"], ctx["used_address"]
+    
+    # 4. 规则：可达性判断（传入车辆类型和原始地址）
+    with timer("rules"):
+        verdicts = evaluate_all_vehicles(roads, ctx["parsed"], original_address=addr) if all_vehicles else {}
+        if vehicle_type in verdicts:
+            can_access, reason = verdicts[vehicle_type]
+        else:
+            can_access, reason = can_access_fcl(roads, ctx["parsed"], vehicle_type, original_address=addr)
+    
+    if ports:
+        port_info, nearest_major_port = ports
+    else:
+        # 5. 最近港口（所有港口中最近的）
+        port_info = get_nearest_port(lat, lng)
+        
+        # 6. 最近的主要港口
+        nearest_major_port = get_nearest_major_port(lat, lng)
+    
+    # 检查是否可能是区域中心点（缺少精确门牌号定位）
+    location_note = None
+    if used_address and addr != used_address:
+        # 如果原地址有门牌号，但解析后的地址看起来像区域级别
+        has_house_number_in_input = bool(re.search(r'\b\d+-\d+', addr))
+        has_house_number_in_result = bool(re.search(r'\d+-\d+', used_address))
+        
+        if has_house_number_in_input and has_house_number_in_result:
+            # 检查是否只有区域名称（如：鳥取県大山町八重）
+            if not any(keyword in used_address for keyword in ["丁目", "番地", "号"]):
+                location_note = "※ 表示位置は地区の中心点です。正確な位置はGoogle Mapsで確認してください。"
+    
+    result = {
+        "address": addr,
+        "used_address": used_address if used_address != addr else None,  # 实际使用的地址
+        "can_access": can_access,
+        "reason": reason,  # 日文理由
+        "nearest_port": f"{port_info['name']}（{port_info['code']}）",
+        "distance": f"約{port_info['distance']}km",
+        "estimated_time": f"{port_info['time']}",
+        "time_estimated": port_info["estimated"],  # True = 直线距离估算（非实际道路路线）
+        "time_source": port_info["source"],  # grid / osrm / estimate
+        "nearest_major_port": nearest_major_port,  # 最近的主要港口
+        "lat": lat,  # 纬度
+        "lng": lng,  # 经度
+        "location_note": location_note  # 位置说明
+    }
+    if all_vehicles:
+        result["vehicles"], result["largest_vehicle"] = vehicle_matrix(verdicts)
+    return result
+
+
+def lookup_cached_results(addresses, vehicle_type, all_vehicles=False):
+    """
+    读取结果缓存，生成每个地址的处理上下文
+    :return: [{"address", "result"（未命中为 None）, "cache_key", "spans"}, ...]
+    """
+    contexts = []
+    for addr in addresses:
+        cache_key = result_cache_key(addr, vehicle_type, all_vehicles) if RESULT_CACHE else None
+        cached = RESULT_CACHE.get(cache_key) if cache_key else None
+        contexts.append({"address": addr, "result": cached, "cache_key": cache_key, "spans": []})
+    return contexts
+
+
+def build_results(located, roads_list, ports_list, batch_spans, vehicle_type, all_vehicles=False):
+    """
+    对已定位的地址执行规则判断并写入结果缓存（结果保存在 ctx["result"]）
+    :param batch_spans: 整批共用的道路 / 港口耗时
+    """
+    for ctx, roads, ports in zip(located, roads_list, ports_list):
+        ctx["spans"].extend(batch_spans)
+        with collect_spans(ctx["spans"]):
+            ctx["result"] = build_result(ctx, roads, vehicle_type, ports, all_vehicles)
+        # 道路数据获取失败时不缓存（下次重新查询）
+        if ctx["cache_key"] and roads:
+            RESULT_CACHE.set(ctx["cache_key"], ctx["result"])
+
+
+async def finish_batch_async(contexts, vehicle_type="40ft", all_vehicles=False, top_ports=0):
+    """
+    对一批已完成地理编码的地址查询道路 / 港口并判断规则（结果保存在 ctx["result"]）
+    :param contexts: lookup_cached_results + prepare_address_async 之后的上下文；
+                     已有结果的（缓存命中、地理编码失败）只补充前 N 个港口
+    """
+    located = [ctx for ctx in contexts if not ctx["result"]]
+    points = [(ctx["lat"], ctx["lng"]) for ctx in located]
+    # 缓存命中的地址也需要前 N 个港口
+    answered = [ctx for ctx in contexts if ctx["result"] and ctx["result"].get("lat") is not None]
+    top_points = [(ctx["result"]["lat"], ctx["result"]["lng"]) for ctx in answered] + points
+    
+    # 3. 地图：OSM 道路（所有地址合并为少量 Overpass 请求）
+    # 5-6. 最近港口 / 最近主要港口（所有地址一次 OSRM table 请求）
+    # 两者互不依赖，同时执行
+    tasks = [
+        timed("roads", query_osm_roads_batch_async(points)),
+        timed("ports", get_nearest_ports_batch_async(points)),
+    ]
+    # 可选：牵引时间最短的前 N 个港口（也与道路 / 港口查询同时执行）
+    if top_ports > 0:
+        tasks.append(timed("top_ports", get_top_ports_batch_async(top_points, top_ports)))
+    with collect_spans() as batch_spans:
+        roads_list, ports_list, *ranked = await asyncio.gather(*tasks)
+    
+    # 4. 规则判断，汇总结果（CPU 计算和缓存写入在线程池中执行，不阻塞共享事件循环）
+    await asyncio.to_thread(build_results, located, roads_list, ports_list, batch_spans, vehicle_type, all_vehicles)
+    
+    # 可选：牵引时间最短的前 N 个港口
+    if ranked:
+        for ctx, ports in zip(answered + located, ranked[0]):
+            ctx["result"]["top_ports"] = ports
+
+
+async def check_batch_async(addresses, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """
+    批量检查地址（解析 → 地理编码 → 道路 / 港口 → 规则）
+    所有外部请求在共享事件循环中并发执行（不占用线程）：地理编码同时最多 check.parallelism 个地址，
+    道路查询和港口距离计算只依赖坐标，同时进行
+    :param addresses: 地址列表（已去除空行）
+    :param vehicle_type: 车辆类型
+    :param all_vehicles: 同时判断所有车辆类型
+    :param top_ports: 大于 0 时额外返回牵引时间最短的前 N 个港口
+    :param timings: 结果中加入各阶段耗时（timings，毫秒；道路 / 港口为整批共用的耗时）
+    :return: 与 addresses 顺序一致的结果列表
+    """
+    started = time.perf_counter()
+    # 批次内去重：同一地址（同一收货人的多个订单）只处理一次，结果按原顺序分发给每个重复项
+    keys = [address_key(addr) for addr in addresses]
+    unique = {}
+    for addr, key in zip(addresses, keys):
+        unique.setdefault(key, addr)
+    if len(unique) < len(addresses):
+        results = await check_batch_async(list(unique.values()), vehicle_type, all_vehicles, top_ports, timings)
+        by_key = dict(zip(unique, results))
+        return [dict(by_key[key], address=addr) for addr, key in zip(addresses, keys)]
+    
+    # 0. 结果缓存（命中时跳过后续所有步骤；共享缓存为 SQLite，在线程池中读取）
+    contexts = await asyncio.to_thread(lookup_cached_results, addresses, vehicle_type, all_vehicles)
+    
+    # 1-2. 解析 + 地理编码（并发，结果按输入顺序；每个地址分别记录耗时）
+    misses = [ctx for ctx in contexts if not ctx["result"]]
+    prepared_list = await gather_limited(
+        [collect_async(prepare_address_async(ctx["address"])) for ctx in misses], get_setting("check.parallelism", 4)
+    )
+    for ctx, (prepared, spans) in zip(misses, prepared_list):
+        prepared.setdefault("result", None)
+        ctx.update(prepared)
+        ctx["spans"] = spans
+    
+    await finish_batch_async(contexts, vehicle_type, all_vehicles, top_ports)
+    
+    elapsed = time.perf_counter() - started
+    METRICS.observe("check", elapsed)
+    if timings:
+        # 缓存命中的地址只有 total
+        for ctx in contexts:
+            ctx["result"]["timings"] = summarize(ctx["spans"], elapsed)
+    
+    return [ctx["result"] for ctx in contexts]
+
+
+def check_batch(addresses, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """同步版本（见 check_batch_async）"""
+    return run_sync(check_batch_async(addresses, vehicle_type, all_vehicles, top_ports, timings))
+
+
+async def check_one_async(addr, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """
+    检查单个地址；出错时返回该地址的错误结果（流式响应、批量任务中不影响其他地址）
+    :return: 结果 dict
+    """
+    try:
+        return (await check_batch_async([addr], vehicle_type, all_vehicles, top_ports, timings))[0]
+    except Exception as e:
+        return error_result(addr, e)
+
+
+def error_result(addr, e):
+    """单个地址处理出错时的结果（输出日志，不影响其他地址）"""
+    import traceback
+    print(f"Error while checking {addr}: {traceback.format_exc()}")
+    return {
+        "address": addr,
+        "can_access": False,
+        "error": "処理中にエラーが発生しました",
+        "reason": str(e),
+    }
+
+
+def check_one(addr, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """同步版本（见 check_one_async）"""
+    return run_sync(check_one_async(addr, vehicle_type, all_vehicles, top_ports, timings))
+
+
+async def check_stream_async(addresses, on_result, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """
+    流式检查：每个地址分别解析和地理编码（同时最多 check.parallelism 个），已完成地理编码的地址
+    合并为一批查询道路 / 港口并判断规则（瓦片、OSRM 请求按批合并）；一批进行中时，
+    之后完成地理编码的地址累积为下一批。每批完成后立即回调，不等待整个请求
+    :param addresses: 地址列表（已去重）
+    :param on_result: 回调 on_result(下标, 结果 dict)，每个地址调用一次
+    """
+    started = time.perf_counter()
+    limit = asyncio.Semaphore(max(1, get_setting("check.parallelism", 4)))
+    ready = asyncio.Queue()
+    
+    async def prepare(index, addr):
+        try:
+            ctx = (await asyncio.to_thread(lookup_cached_results, [addr], vehicle_type, all_vehicles))[0]
+            if not ctx["result"]:
+                async with limit:
+                    prepared, spans = await collect_async(prepare_address_async(addr))
+                prepared.setdefault("result", None)
+                ctx.update(prepared)
+                ctx["spans"] = spans
+        except Exception as e:
+            ctx = {"address": addr, "result": error_result(addr, e), "spans": [], "failed": True}
+        ready.put_nowait((index, ctx))
+    
+    tasks = [asyncio.create_task(prepare(index, addr)) for index, addr in enumerate(addresses)]
+    try:
+        remaining = len(addresses)
+        while remaining:
+            # 取出目前所有已完成地理编码的地址作为一批
+            batch = [await ready.get()]
+            while not ready.empty():
+                batch.append(ready.get_nowait())
+            remaining -= len(batch)
             
-            # 检查是否可能是区域中心点（缺少精确门牌号定位）
-            location_note = None
-            if used_address and addr != used_address:
-                # 如果原地址有门牌号，但解析后的地址看起来像区域级别
-                import re
-                has_house_number_in_input = bool(re.search(r'\b\d+-\d+', addr))
-                has_house_number_in_result = bool(re.search(r'\d+-\d+', used_address))
-                
-                if has_house_number_in_input and has_house_number_in_result:
-                    # 检查是否只有区域名称（如：鳥取県大山町八重）
-                    if not any(keyword in used_address for keyword in ["丁目", "番地", "号"]):
-                        location_note = "※ 表示位置は地区の中心点です。正確な位置はGoogle Mapsで確認してください。"
+            contexts = [ctx for _, ctx in batch if not ctx.get("failed")]
+            try:
+                if contexts:
+                    await finish_batch_async(contexts, vehicle_type, all_vehicles, top_ports)
+            except Exception as e:
+                for ctx in contexts:
+                    ctx["result"] = error_result(ctx["address"], e)
+                    ctx["failed"] = True
             
-            results.append({
-                "address": addr,
-                "used_address": used_address if used_address != addr else None,  # 实际使用的地址
-                "can_access": can_access,
-                "reason": reason,  # 日文理由
-                "nearest_port": f"{port_info['name']}（{port_info['code']}）",
-                "distance": f"約{port_info['distance']}km",
-                "estimated_time": f"{port_info['time']}",
-                "nearest_major_port": nearest_major_port,  # 最近的主要港口
-                "lat": lat,  # 纬度
-                "lng": lng,  # 经度
-                "location_note": location_note  # 位置说明
-            })
+            elapsed = time.perf_counter() - started
+            for index, ctx in batch:
+                if timings and not ctx.get("failed"):
+                    ctx["result"]["timings"] = summarize(ctx["spans"], elapsed)
+                on_result(index, ctx["result"])
+        METRICS.observe("check", time.perf_counter() - started)
+    finally:
+        # 客户端断开时取消尚未完成的地址
+        for task in tasks:
+            task.cancel()
+
+
+def iter_check_results(addresses, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """
+    流式检查（见 check_stream_async），按输入顺序逐个返回结果（流式响应用）
+    :return: 生成器，依次产生 (序号, 结果 dict)
+    """
+    # 重复的地址共用一次检查
+    keys = [address_key(addr) for addr in addresses]
+    unique = {}
+    for addr, key in zip(addresses, keys):
+        unique.setdefault(key, addr)
+    unique_keys = list(unique)
+    
+    finished = queue.Queue()
+    future = submit(check_stream_async(
+        list(unique.values()), lambda i, result: finished.put((unique_keys[i], result)),
+        vehicle_type, all_vehicles, top_ports, timings,
+    ))
+    # 结束（含出错）后放入 None，避免一直等待
+    future.add_done_callback(lambda _: finished.put(None))
+    
+    results = {}
+    try:
+        for index, (addr, key) in enumerate(zip(addresses, keys)):
+            while key not in results:
+                item = finished.get()
+                if item is None:
+                    future.result()  # 抛出流水线中的错误
+                    raise RuntimeError("流式检查提前结束")
+                results[item[0]] = item[1]
+            yield index, dict(results[key], address=addr)
+    finally:
+        future.cancel()
+
+
+def stream_check_results(addresses, vehicle_type="40ft", all_vehicles=False, top_ports=0, timings=False):
+    """
+    NDJSON 流式响应：每处理完一个地址输出一行 {"index", "total", "result"}，最后输出 {"done": true}
+    """
+    def generate():
+        total = len(addresses)
+        for index, result in iter_check_results(addresses, vehicle_type, all_vehicles, top_ports, timings):
+            yield json.dumps({"index": index, "total": total, "result": result}, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True, "total": total}) + "\n"
     
-        return jsonify({"results": results})
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/check", methods=["POST"])
+def check():
+    """
+    API：批量/单地址检查（返回日文 JSON）。
+    请求中 "stream": true 时以 NDJSON 流式返回，每个地址处理完立即输出
+    """
+    try:
+        try:
+            addresses, options = parse_check_request(request.json)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        if not addresses:
+            return jsonify({"error": "住所を入力してください"})
+        
+        if request.json.get("stream"):
+            return stream_check_results(addresses, **options)
+        
+        return jsonify({"results": check_batch(addresses, **options)})
     
     except Exception as e:
         # 捕获所有错误，返回 JSON 格式的错误信息
-        import traceback
-        error_detail = traceback.format_exc()
-        print(f"Error in check(): {error_detail}")
-        return jsonify({
-            "error": "処理中にエラーが発生しました",
-            "detail": str(e)
-        }), 500
+        return jsonify(check_error(e)), 500
+
+def parse_check_request(data):
+    """
+    解析 POST /check 的 JSON 请求（Flask 视图和 ASGI 入口 api/asgi.py 共用）
+    :return: (地址列表, check_batch 的选项 dict)
+    :raise ValueError: 选项的值无效时（如 top_ports 不是 0 以上的整数）
+    """
+    addresses = data.get("addresses", [])  # 支持批量（list）
+    if isinstance(addresses, str):
+        addresses = [addresses.strip()]  # 单地址转为 list
+    addresses = [addr for addr in addresses if addr.strip()]
+    options = {
+        "vehicle_type": data.get("vehicle_type", "40ft"),  # 车辆类型，默认40ft
+        "all_vehicles": bool(data.get("all_vehicles", False)),  # 同时判断所有车辆类型
+        "top_ports": parse_top_ports(data.get("top_ports")),  # 可选：牵引时间最短的前 N 个港口
+        "timings": bool(data.get("timings", False)),  # 可选：各阶段耗时明细
+    }
+    return addresses, options
+
+def parse_top_ports(value):
+    """
+    解析请求中的 top_ports
+    :param value: 请求中的值（JSON 数字或字符串、表单字符串；未指定时为 None）
+    :return: 0 以上的整数（未指定时为 0）
+    :raise ValueError: 不是 0 以上的整数时（视图返回 400）
+    """
+    try:
+        top_ports = int(value or 0)
+    except (TypeError, ValueError):
+        top_ports = -1
+    if top_ports < 0:
+        raise ValueError("top_ports は0以上の整数で指定してください")
+    return top_ports
+
+def check_error(e):
+    """/check 处理出错时输出日志并返回错误信息"""
+    import traceback
+    error_detail = traceback.format_exc()
+    print(f"Error in check(): {error_detail}")
+    return {
+        "error": "処理中にエラーが発生しました",
+        "detail": str(e)
+    }
+
+def parse_job_request():
+    """
+    解析 POST /jobs 的请求：JSON {"addresses": [...]} 或 CSV 文件上传（表单字段 file，第一列为地址）
+    :return: (地址列表, 选项 dict)
+    :raise ValueError: 选项的值无效时
+    """
+    upload = request.files.get("file")
+    if upload:
+        raw = upload.read()
+        try:
+            text = raw.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            text = raw.decode("cp932")  # Excel 导出的日文 CSV
+        rows = [row for row in csv.reader(io.StringIO(text)) if row and row[0].strip()]
+        # 跳过表头
+        if rows and rows[0][0].strip().lower() in ("address", "addresses", "住所"):
+            rows = rows[1:]
+        addresses = [row[0].strip() for row in rows]
+        params = request.form
+    else:
+        params = request.get_json(silent=True) or {}
+        addresses = params.get("addresses", [])
+        if isinstance(addresses, str):
+            addresses = addresses.splitlines()
+        addresses = [addr.strip() for addr in addresses if addr.strip()]
+    
+    options = {
+        "vehicle_type": params.get("vehicle_type", "40ft"),
+        "all_vehicles": str(params.get("all_vehicles", "")).lower() in ("1", "true"),
+        "top_ports": parse_top_ports(params.get("top_ports")),
+    }
+    return addresses, options
+
+
+# 异步批量任务（见 config/settings.yaml 的 jobs）
+def check_job_chunk(addresses, options):
+    """
+    批量任务处理一批地址：整批出错时改为逐个地址检查，出错的地址各自记录 error_result，任务继续执行
+    :return: 与 addresses 顺序一致的结果列表
+    """
+    try:
+        return check_batch(addresses, **options)
+    except Exception as e:
+        print(f"批量检查失败，改为逐个地址检查: {e}")
+        return [check_one(addr, **options) for addr in addresses]
+
+
+JOBS = JobManager(check_job_chunk)
+
+
+def start_job_workers():
+    """
+    启动钩子：继续执行未完成的异步批量任务（jobs.resume_on_start）
+    不在导入时执行；本地运行时由 __main__ 调用，gunicorn 等在 post_worker_init 钩子中调用
+    任务按租约认领，多个进程同时调用时同一任务只会执行一次
+    :return: 检查的未完成任务数
+    """
+    if not get_setting("jobs.resume_on_start", True):
+        return 0
+    return JOBS.resume()
+
+
+@app.route("/jobs", methods=["POST"])
+def create_job():
+    """API：创建异步批量检查任务，返回任务 ID"""
+    try:
+        addresses, options = parse_job_request()
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not addresses:
+        return jsonify({"error": "住所を入力してください"}), 400
+    max_addresses = get_setting("jobs.max_addresses", 10000)
+    if len(addresses) > max_addresses:
+        return jsonify({"error": f"住所は最大{max_addresses}件までです"}), 400
+    
+    job_id = JOBS.submit(addresses, options)
+    return jsonify({"job_id": job_id, "status": "queued", "total": len(addresses)}), 202
+
+
+@app.route("/jobs/<job_id>")
+def get_job(job_id):
+    """
+    API：任务进度和分页结果
+    查询参数 offset / limit（默认 0 / 100，最多 1000）
+    """
+    job = JOBS.store.get(job_id)
+    if not job:
+        return jsonify({"error": "ジョブが見つかりません"}), 404
+    offset = max(0, request.args.get("offset", 0, type=int))
+    limit = min(max(1, request.args.get("limit", 100, type=int)), 1000)
+    items = JOBS.store.results(job_id, offset, limit)
+    job["results"] = items
+    job["next_offset"] = offset + len(items) if offset + len(items) < job["total"] else None
+    return jsonify(job)
 
 # ============ Vercel 部署配置 ============
 # Vercel 会自动识别 Flask app 对象，无需额外配置
@@ -292,6 +912,7 @@ if __name__ == "__main__":
     print("FCL Checker 启动中...")
     print("访问地址: http://localhost:5000")
     print("=" * 50)
+    start_job_workers()
     app.run(debug=True, host="0.0.0.0", port=5000)
 
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+地址解析微基准：逐个都道府県 startswith / in + 多次正则（旧实现） vs 共用分词器（utils/address_tokenizer.py）
+
+用法：
+    python scripts/bench_address_parser.py [--repeat 2000]
+
+对每个示例地址执行 parse + extract_address + normalize_address + simplify_address，
+先确认两种实现的输出完全一致，再打印每个地址的平均耗时和加速比
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import address_tokenizer
+
+SAMPLES = [
+    "神奈川県横浜市鶴見区大黒ふ頭2丁目1番地",
+    "東京都中央区銀座4-6-16 銀座三越ビル5F",
+    "〒650-0004 兵庫県神戸市中央区中山手通6-1-1",
+    "千葉県印西市師戸2300",
+    "鳥取県西伯郡大山町末長1234",
+    "大阪府大阪市住之江区南港北1-3-5",
+    "北海道札幌市中央区北1条西2丁目1",
+    "愛知県名古屋市港区金城ふ頭２丁目７番１",
+    "株式会社サンプル物流センター 埼玉県川口市領家5-14-35",
+    "横浜市鶴見区大黒町",
+    "東京都府中市宮町1-50",
+    "福岡県福岡市東区箱崎ふ頭6-1-1 物流倉庫内",
+]
+
+LEGACY_PREFECTURES = (
+    "北海道|東京都|大阪府|神奈川県|愛知県|埼玉県|千葉県|兵庫県|広島県|福岡県|静岡県|茨城県|"
+    "栃木県|群馬県|新潟県|長野県|岐阜県|三重県|京都府|奈良県|沖縄県|"
+    "青森県|岩手県|宮城県|秋田県|山形県|福島県|富山県|石川県|福井県|山梨県|"
+    "滋賀県|和歌山県|鳥取県|島根県|岡山県|山口県|徳島県|香川県|愛媛県|高知県|"
+    "佐賀県|長崎県|熊本県|大分県|宮崎県|鹿児島県"
+).split("|")
+
+
+def legacy_parse(address):
+    """旧实现：utils/jp_address_parser_simple.py"""
+    addr = address.strip()
+    prefecture = city = town = ""
+    rest = addr
+    for pref in LEGACY_PREFECTURES:
+        if addr.startswith(pref):
+            prefecture = pref
+            addr = addr[len(pref):]
+            break
+    m = re.match(r"(.+?[市区町村])", addr)
+    if m:
+        city = m.group(1)
+        addr = addr[m.end():]
+    m = re.search(r"(.+?)(?:[0-9一二三四五六七八九十丁目番地])", addr)
+    if m:
+        town = m.group(1)
+        rest = addr[m.end():]
+    else:
+        town = addr
+    return address_tokenizer.ParsedAddress(prefecture, city, town, rest, address.strip())
+
+
+def legacy_extract_address(text):
+    """旧实现：utils/address_extractor.py"""
+    for pref in address_tokenizer.PREFECTURES:
+        if pref in text:
+            idx = text.index(pref)
+            return re.split(r'[\s　(（]', text[idx:])[0]
+    match = re.search(r'([^\s　]+?[市区町村郡])', text)
+    if match:
+        return match.group(1)
+    return text
+
+
+def legacy_normalize_address(address):
+    """旧实现：utils/geocoder.py normalize_address"""
+    addr = address.replace('〒', '')
+    addr = addr.translate(str.maketrans('０１２３４５６７８９', '0123456789'))
+    addr = addr.replace('－', '-').replace('ー', '-')
+    addr = re.sub(r'[　\s]+(.*?(ビル|タワー|マンション|階|F|内|近く|付近).*)$', '', addr)
+
+    def add_chome(match):
+        prefix, num1, rest = match.group(1), match.group(2), match.group(3)
+        if len(num1) == 3 and len(rest.split('-')[0]) == 4:
+            return match.group(0)
+        if '丁目' not in prefix[-3:]:
+            return f"{prefix}{num1}丁目{rest}"
+        return match.group(0)
+
+    addr = re.sub(r'([^\d丁目])(\d+)-(\d+[-\d]*)', add_chome, addr)
+    return addr.strip()
+
+
+def legacy_simplify_address(address):
+    """旧实现：utils/geocoder.py simplify_address"""
+    normalized = legacy_normalize_address(address)
+    candidates = [normalized]
+    if address != normalized and address not in candidates:
+        candidates.append(address)
+    base_addr = normalized
+    for pattern in (r'[　\s]+.*?(ビル|タワー|マンション|階|F).*$', r'[0-9０-９]+番地?$', r'[-−ー][0-9０-９]+号?$'):
+        addr = re.sub(pattern, '', base_addr)
+        if addr != base_addr and addr not in candidates:
+            candidates.append(addr)
+    for pattern in (r'(.*?[0-9０-９]+丁目[0-9０-９]+)', r'(.*?[0-9０-９]+丁目)'):
+        match = re.search(pattern, base_addr)
+        if match and match.group(1) not in candidates:
+            candidates.append(match.group(1))
+    addr = re.sub(r'[0-9０-９]+丁目.*$', '', base_addr)
+    if addr != base_addr and len(addr) > 5 and addr not in candidates:
+        candidates.append(addr)
+    match = re.search(r'(.*?[都道府県][^市区町村]+[市区町村])', base_addr)
+    if match and match.group(1) not in candidates:
+        candidates.append(match.group(1))
+    return candidates
+
+
+def legacy_all(address):
+    return (legacy_parse(address), legacy_extract_address(address),
+            legacy_normalize_address(address), legacy_simplify_address(address))
+
+
+def tokenizer_all(address):
+    tokens = address_tokenizer.tokenize(address)
+    return tokens.parsed, address_tokenizer.extract_address(address), tokens.normalized, tokens.candidates
+
+
+def bench(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for address in SAMPLES:
+            func(address)
+    return (time.perf_counter() - start) / (repeat * len(SAMPLES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="地址解析微基准")
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    for address in SAMPLES:
+        if legacy_all(address) != tokenizer_all(address):
+            sys.exit(f"输出不一致: {address}\n  旧: {legacy_all(address)}\n  新: {tokenizer_all(address)}")
+
+    legacy = bench(legacy_all, args.repeat)
+    tokenized = bench(tokenizer_all, args.repeat)
+
+    print(f"示例地址 {len(SAMPLES)} 个 × {args.repeat} 次（parse + extract_address + normalize + simplify）")
+    print(f"  旧实现:   {legacy * 1e6:8.2f} µs / 地址")
+    print(f"  分词器:   {tokenized * 1e6:8.2f} µs / 地址")
+    print(f"  加速比: {legacy / tokenized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
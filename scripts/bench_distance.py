@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+道路距离计算微基准：逐节点 haversine（旧实现） vs 向量化线段距离（calculate_min_distances）
+
+用法：
+    python scripts/bench_distance.py [--ways 300] [--nodes 20] [--repeat 20]
+
+使用模拟的 Overpass 响应（默认约 6000 个节点），结果会打印两种实现的平均耗时和加速比
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.osm_roads import calculate_min_distances
+
+
+def legacy_min_distance(target_lat, target_lng, geometry):
+    """旧实现：逐节点 haversine（只计算到节点的距离）"""
+    min_distance = float('inf')
+    for node in geometry:
+        node_lat = node.get("lat")
+        node_lng = node.get("lon")
+        if node_lat is None or node_lng is None:
+            continue
+        lat_diff = math.radians(node_lat - target_lat)
+        lng_diff = math.radians(node_lng - target_lng)
+        a = (math.sin(lat_diff / 2) ** 2 +
+             math.cos(math.radians(target_lat)) *
+             math.cos(math.radians(node_lat)) *
+             math.sin(lng_diff / 2) ** 2)
+        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        distance = 6371000 * c
+        if distance < min_distance:
+            min_distance = distance
+    return min_distance if min_distance != float('inf') else None
+
+
+def make_geometries(lat, lng, ways, nodes, seed=0):
+    """在目标点周围约 1km 范围内生成随机折线"""
+    rng = random.Random(seed)
+    geometries = []
+    for _ in range(ways):
+        node_lat = lat + rng.uniform(-0.005, 0.005)
+        node_lng = lng + rng.uniform(-0.005, 0.005)
+        geometry = []
+        for _ in range(nodes):
+            geometry.append({"lat": node_lat, "lon": node_lng})
+            node_lat += rng.uniform(-0.0005, 0.0005)
+            node_lng += rng.uniform(-0.0005, 0.0005)
+        geometries.append(geometry)
+    return geometries
+
+
+def bench(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="道路距离计算微基准")
+    parser.add_argument("--ways", type=int, default=300)
+    parser.add_argument("--nodes", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    lat, lng = 34.7125, 135.2950
+    geometries = make_geometries(lat, lng, args.ways, args.nodes)
+
+    legacy = bench(lambda: [legacy_min_distance(lat, lng, g) for g in geometries], args.repeat)
+    vectorized = bench(lambda: calculate_min_distances(lat, lng, geometries), args.repeat)
+
+    print(f"道路 {args.ways} 条 × 节点 {args.nodes} 个 = {args.ways * args.nodes} 个节点")
+    print(f"  逐节点 haversine: {legacy * 1000:8.2f} ms")
+    print(f"  向量化线段距离:   {vectorized * 1000:8.2f} ms")
+    print(f"  加速比: {legacy / vectorized:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+构建本地地址索引（离线地理编码，geocode 在访问 GSI / Nominatim 之前先查询）
+
+用法：
+    # 国土交通省 位置参照情報（https://nlftp.mlit.go.jp/isj/）各都道府県的 CSV
+    # 街区レベル（街区 / 地番）与 大字・町丁目レベル 可同时指定，按表头自动识别
+    python scripts/build_address_index.py data/japan_addresses.fcladdr 13000-21.0a.csv 13000-16.0b.csv ...
+
+每个街区保存一个代表坐标（同一街区多条记录取平均），丁目 / 町域 / 市区町村的坐标取其下所有点的平均值
+"""
+import argparse
+import csv
+import io
+import os
+import re
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.address_index import canonical_address, write_address_index
+
+
+def read_csv_rows(path):
+    """读取 CSV（UTF-8 或 Shift_JIS）"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("cp932")
+    return csv.reader(io.StringIO(text))
+
+
+def places(path):
+    """
+    读取位置参照情報 CSV
+    :return: 生成 (都道府県, 市区町村, 大字・丁目名, 街区符号（大字・町丁目レベル为 ""）, lat, lng)
+    """
+    rows = read_csv_rows(path)
+    header = next(rows)
+    town_col = "大字・丁目名" if "大字・丁目名" in header else "大字町丁目名"
+    try:
+        i_pref, i_city, i_town = header.index("都道府県名"), header.index("市区町村名"), header.index(town_col)
+        i_lat, i_lng = header.index("緯度"), header.index("経度")
+    except ValueError:
+        sys.exit(f"不是位置参照情報的 CSV: {path}")
+    i_block = header.index("街区符号・地番") if "街区符号・地番" in header else None
+    for row in rows:
+        try:
+            lat, lng = float(row[i_lat]), float(row[i_lng])
+        except (ValueError, IndexError):
+            continue
+        block = row[i_block] if i_block is not None else ""
+        yield row[i_pref], row[i_city], row[i_town], block, lat, lng
+
+
+def collect(paths):
+    """
+    按 市区町村 / 町域 / 丁目 / 街区 汇总坐标
+    :return: {(都道府県, 市区町村, 市区町村之后的部分): (lat, lng)}
+    """
+    sums = {}
+
+    def add(key, lat, lng):
+        entry = sums.setdefault(key, [0.0, 0.0, 0])
+        entry[0] += lat
+        entry[1] += lng
+        entry[2] += 1
+
+    for path in paths:
+        for pref, city, town, block, lat, lng in places(path):
+            pref, city = canonical_address(pref), canonical_address(city)
+            prefix_len = len(pref) + len(city)
+            oaza = canonical_address(pref + city + town)[prefix_len:]
+            add((pref, city, ""), lat, lng)
+            add((pref, city, oaza), lat, lng)
+            # 丁目之前的町域（銀座4丁目 → 銀座）
+            town_only = re.sub(r'\d+丁目$', '', oaza)
+            if town_only != oaza:
+                add((pref, city, town_only), lat, lng)
+            if block:
+                add((pref, city, canonical_address(pref + city + town + block)[prefix_len:]), lat, lng)
+
+    return {key: (s_lat / n, s_lng / n) for key, (s_lat, s_lng, n) in sums.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建本地地址索引")
+    parser.add_argument("output", help="输出 .fcladdr 文件")
+    parser.add_argument("sources", nargs="+", help="位置参照情報 CSV（街区レベル / 大字・町丁目レベル）")
+    args = parser.parse_args()
+
+    points = collect(args.sources)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    count = write_address_index(args.output, points, source=", ".join(os.path.basename(p) for p in args.sources))
+    print(f"完成：{count} 条地址记录 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
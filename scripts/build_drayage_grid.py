@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+预计算港口牵引时间网格（供 calculate_port_distance 直接查表）
+
+用法：
+    # 推荐使用自建 OSRM（docker osrm-backend + 日本数据），不受公共服务限流
+    python scripts/build_drayage_grid.py --osrm-url http://localhost:5000 --table-size 1000
+
+    # 只用直线距离估算生成网格（不访问 OSRM，用于测试）
+    python scripts/build_drayage_grid.py --estimate-only --ports JPTYO,JPYOK
+
+对每个港口，在半径 --radius-km 范围内按 --cell-size 间隔计算网格点 → 港口的道路距离和卡车牵引时间
+（OSRM 时间 × 2.0；OSRM 无结果的网格点按直线距离 × 1.4、25km/h 估算并标记为估算值）
+输出 data/drayage_grid.json / .npy / _routed.npy
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.port_routes import get_route_table, haversine, port_result_from_route
+from utils.rules import load_ports
+
+
+def grid_window(port, radius_km, cell_size):
+    """港口周边网格范围 (south, west, ny, nx)"""
+    dlat = radius_km / 111.32
+    dlng = radius_km / (111.32 * math.cos(math.radians(port["lat"])))
+    south = math.floor((port["lat"] - dlat) / cell_size) * cell_size
+    west = math.floor((port["lng"] - dlng) / cell_size) * cell_size
+    ny = int(math.ceil(2 * dlat / cell_size)) + 2
+    nx = int(math.ceil(2 * dlng / cell_size)) + 2
+    return south, west, ny, nx
+
+
+def build_port(port, radius_km, cell_size, estimate_only, osrm_url=None, table_size=None):
+    """
+    计算单个港口的网格
+    :param osrm_url: OSRM 服务地址（默认 osrm.base_url）
+    :param table_size: 每次 table 请求最多坐标数（默认 osrm.max_table_size）
+    :return: (meta, values (ny*nx, 2), routed (ny*nx,))
+    """
+    south, west, ny, nx = grid_window(port, radius_km, cell_size)
+    values = np.full((ny * nx, 2), np.nan, dtype=np.float32)
+    routed = np.zeros(ny * nx, dtype=np.uint8)
+
+    # 只计算半径内的网格点
+    nodes = []
+    for y in range(ny):
+        for x in range(nx):
+            lat, lng = south + y * cell_size, west + x * cell_size
+            if haversine(lat, lng, port["lat"], port["lng"]) <= radius_km:
+                nodes.append((y * nx + x, lat, lng))
+
+    points = [(lat, lng) for _, lat, lng in nodes]
+    if estimate_only:
+        routes = [(None, None)] * len(points)
+    else:
+        table = get_route_table(points, [(port["lat"], port["lng"])], timeout=60,
+                                base_url=osrm_url, max_table_size=table_size)
+        routes = [row[0] for row in table]
+
+    for (index, lat, lng), (distance, duration) in zip(nodes, routes):
+        info = port_result_from_route(lat, lng, port, distance, duration)
+        values[index] = (info["distance"], info["minutes"])
+        routed[index] = 0 if info["estimated"] else 1
+
+    meta = {"lat": port["lat"], "lng": port["lng"], "south": south, "west": west, "ny": ny, "nx": nx}
+    print(f"  {port['name']}（{port['code']}）: {len(nodes)} 个网格点，实际路线 {int(routed.sum())} 个")
+    return meta, values, routed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="预计算港口牵引时间网格")
+    parser.add_argument("--output", default="data/drayage_grid", help="输出路径前缀")
+    parser.add_argument("--cell-size", type=float, default=0.01, help="网格间隔（度，默认 0.01 ≈ 1km）")
+    parser.add_argument("--radius-km", type=float, default=200, help="每个港口的计算半径（公里）")
+    parser.add_argument("--ports", help="只计算指定港口代码（逗号分隔）")
+    parser.add_argument("--osrm-url", help="OSRM 服务地址（默认使用 config/settings.yaml 的 osrm.base_url）")
+    parser.add_argument("--table-size", type=int, help="每次 table 请求最多坐标数")
+    parser.add_argument("--estimate-only", action="store_true", help="不访问 OSRM，只用直线距离估算")
+    args = parser.parse_args()
+
+    osrm_url = args.osrm_url.rstrip("/") if args.osrm_url else None
+    codes = set(args.ports.split(",")) if args.ports else None
+    ports = [p for p in load_ports() if codes is None or p["code"] in codes]
+
+    metas, all_values, all_routed = {}, [], []
+    offset = 0
+    for port in ports:
+        meta, values, routed = build_port(port, args.radius_km, args.cell_size, args.estimate_only,
+                                          osrm_url, args.table_size)
+        meta["offset"] = offset
+        offset += len(values)
+        metas[port["code"]] = meta
+        all_values.append(values)
+        all_routed.append(routed)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    np.save(f"{args.output}.npy", np.concatenate(all_values))
+    np.save(f"{args.output}_routed.npy", np.concatenate(all_routed))
+    with open(f"{args.output}.json", "w", encoding="utf-8") as f:
+        json.dump({"cell_size": args.cell_size, "ports": metas}, f, ensure_ascii=False, indent=2)
+    print(f"完成：{len(ports)} 个港口，{offset} 个网格点 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
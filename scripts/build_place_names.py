@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+构建罗马字地名词典（英文地址 → 日文地名，供 GSI / 本地地址索引查询英文地址）
+
+用法：
+    # 日本邮政 KEN_ALL.CSV（https://www.post.japanpost.jp/zipcode/download.html）
+    python scripts/build_place_names.py KEN_ALL.CSV data/place_names.fclnames
+
+收录所有市区町村（政令市的区另外收录所属的政令市，郡内町村另外收录郡）和町域；
+键为读音的罗马字（romaji_key，去掉 市 / 区 / 町 / 村 / 郡 后缀），同一个键可以对应多个地名
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from build_postal_index import clean_town, ken_all_rows
+from utils.place_names import Place, parent_suffix, place_key, split_municipality, write_place_names
+from utils.romaji import kana_to_romaji, romaji_key
+
+
+def _common_prefix(words):
+    first, last = min(words), max(words)
+    i = 0
+    while i < min(len(first), len(last)) and first[i] == last[i]:
+        i += 1
+    return first[:i]
+
+
+def split_reading(parent, readings):
+    """
+    政令市 / 郡的读音：取其下所有区 / 町村读音的公共前缀，在最后一个 shi / gun 处截断
+    （只有一个区 / 町村时在第一个 shi / gun 处截断）
+    :param parent: 政令市 / 郡名（横浜市）
+    :param readings: 其下各 市区町村 的完整读音（yokohamashitsurumiku, ...）
+    :return: 政令市 / 郡的读音（yokohamashi）；无法确定时返回 ""
+    """
+    suffix = parent_suffix(parent)
+    if len(readings) > 1:
+        prefix = _common_prefix(readings)
+        pos = prefix.rfind(suffix)
+    else:
+        pos = next(iter(readings)).find(suffix)
+    return "" if pos <= 0 else next(iter(readings))[:pos + len(suffix)]
+
+
+def collect(path):
+    """
+    :return: 生成 (键, Place)
+    """
+    cities = {}  # (都道府県, 市区町村) → 读音
+    towns = set()
+    for _, pref, city, town, _, city_kana, town_kana in ken_all_rows(path):
+        cities[(pref, city)] = romaji_key(kana_to_romaji(city_kana))
+        town, town_kana = clean_town(town, town_kana)
+        if town:
+            towns.add((pref, city, town, romaji_key(kana_to_romaji(town_kana))))
+
+    children = {}  # (都道府県, 政令市 / 郡) → {市区町村: 读音}
+    for (pref, city), reading in cities.items():
+        parent, _ = split_municipality(city)
+        if parent:
+            children.setdefault((pref, parent), {})[city] = reading
+
+    for (pref, parent), members in children.items():
+        parent_reading = split_reading(parent, set(members.values()))
+        if not parent_reading:
+            print(f"  ⚠️ 无法确定读音，跳过: {pref}{parent}")
+            continue
+        yield place_key(parent, parent_reading), Place("city", parent, pref, "")
+        for city, reading in members.items():
+            if reading.startswith(parent_reading):
+                _, own = split_municipality(city)
+                yield place_key(own, reading[len(parent_reading):]), Place("city", city, pref, parent)
+
+    for (pref, city), reading in cities.items():
+        if not split_municipality(city)[0]:
+            yield place_key(city, reading), Place("city", city, pref, "")
+
+    for pref, city, town, reading in towns:
+        yield place_key(town, reading), Place("town", town, pref, city)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建罗马字地名词典")
+    parser.add_argument("ken_all", help="KEN_ALL.CSV")
+    parser.add_argument("output", help="输出 .fclnames 文件")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    count = write_place_names(args.output, collect(args.ken_all), source=os.path.basename(args.ken_all))
+    print(f"完成：{count} 条地名 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+构建离线邮编索引（供地理编码的邮编校验 / 坐标兜底使用）
+
+用法：
+    # 日本邮政 KEN_ALL.CSV（https://www.post.japanpost.jp/zipcode/download.html）
+    # + 国土交通省 位置参照情報（大字・町丁目レベル，可指定多个都道府県文件）提供代表坐标
+    python scripts/build_postal_index.py KEN_ALL.CSV data/japan_postal.fclpost --coords 13000-xx.csv 14000-xx.csv
+
+    # 不带 --coords 时只有地名（仍可用于校验候选地址，但不能提供坐标）
+    python scripts/build_postal_index.py KEN_ALL.CSV data/japan_postal.fclpost
+
+町域名中的括号注释（含跨多行的注释）会被去掉；"以下に掲載がない場合"、"…の次に番地がくる場合"、
+"…一円" 视为整个市区町村。代表坐标取名称匹配的大字・町丁目的平均值，没有匹配时取市区町村中心
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+from bisect import bisect_left
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.postal_index import write_postal_index
+from utils.romaji import kana_to_romaji
+
+
+def read_csv_rows(path):
+    """读取 CSV（UTF-8 或 Shift_JIS）"""
+    with open(path, "rb") as f:
+        raw = f.read()
+    try:
+        text = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = raw.decode("cp932")
+    return list(csv.reader(io.StringIO(text)))
+
+
+def clean_town(town, kana):
+    """
+    町域名整理
+    :return: (町域, 町域读音)；代表整个市区町村时为 ("", "")
+    """
+    if town == "以下に掲載がない場合" or "の次に番地がくる場合" in town:
+        return "", ""
+    if town.endswith("一円") and town != "一円":
+        return "", ""
+    return town.split("（")[0], kana.split("(")[0]
+
+
+def ken_all_rows(path):
+    """
+    读取 KEN_ALL.CSV，合并跨多行的町域名
+    :return: 生成 (邮编, 都道府県, 市区町村, 町域, 都道府県读音, 市区町村读音, 町域读音)
+    """
+    pending = None
+    for row in read_csv_rows(path):
+        if len(row) < 9:
+            continue
+        code, pref_kana, city_kana, town_kana, pref, city, town = row[2], row[3], row[4], row[5], row[6], row[7], row[8]
+        if pending:
+            # 上一行的括号未闭合：本行是町域名的续行
+            if pending[0] == code:
+                pending[3] += town
+                pending[6] += town_kana
+                if "）" not in town:
+                    continue
+                code, pref, city, town, pref_kana, city_kana, town_kana = pending
+            else:
+                yield tuple(pending)
+            pending = None
+        if "（" in town and "）" not in town:
+            pending = [code, pref, city, town, pref_kana, city_kana, town_kana]
+            continue
+        yield code, pref, city, town, pref_kana, city_kana, town_kana
+    if pending:
+        yield tuple(pending)
+
+
+def load_coords(paths):
+    """
+    读取位置参照情報（大字・町丁目レベル）
+    :return: {(都道府県, 市区町村): ([大字町丁目名（升序）], [(lat, lng)])}
+    """
+    places = {}
+    for path in paths:
+        rows = read_csv_rows(path)
+        header = rows[0]
+        try:
+            i_pref, i_city = header.index("都道府県名"), header.index("市区町村名")
+            i_town, i_lat, i_lng = header.index("大字町丁目名"), header.index("緯度"), header.index("経度")
+        except ValueError:
+            sys.exit(f"不是位置参照情報（大字・町丁目レベル）的 CSV: {path}")
+        for row in rows[1:]:
+            try:
+                lat, lng = float(row[i_lat]), float(row[i_lng])
+            except (ValueError, IndexError):
+                continue
+            places.setdefault((row[i_pref], row[i_city]), []).append((row[i_town], lat, lng))
+
+    indexed = {}
+    for key, items in places.items():
+        items.sort()
+        indexed[key] = ([name for name, _, _ in items], [(lat, lng) for _, lat, lng in items])
+    return indexed
+
+
+def representative_point(coords, pref, city, town):
+    """
+    代表坐标
+    :return: (lat, lng, level)；level 为 town / city，没有数据时为 (None, None, "")
+    """
+    place = coords.get((pref, city))
+    if not place:
+        return None, None, ""
+    names, points = place
+    level = "city"
+    selected = points
+    if town:
+        # 名称相同或以町域名开头的大字・町丁目（芝浦 → 芝浦一丁目 ~ 芝浦四丁目）
+        start = bisect_left(names, town)
+        end = start
+        while end < len(names) and names[end].startswith(town):
+            end += 1
+        if end > start:
+            selected = points[start:end]
+            level = "town"
+    lat = sum(p[0] for p in selected) / len(selected)
+    lng = sum(p[1] for p in selected) / len(selected)
+    return lat, lng, level
+
+
+def entries(ken_all, coords):
+    seen = set()
+    for code, pref, city, town, pref_kana, city_kana, town_kana in ken_all_rows(ken_all):
+        town, town_kana = clean_town(town, town_kana)
+        if (code, pref, city, town) in seen:
+            continue
+        seen.add((code, pref, city, town))
+        lat, lng, level = representative_point(coords, pref, city, town)
+        yield {
+            "postal_code": code,
+            "prefecture": pref,
+            "city": city,
+            "town": town,
+            "prefecture_romaji": kana_to_romaji(pref_kana),
+            "city_romaji": kana_to_romaji(city_kana),
+            "town_romaji": kana_to_romaji(town_kana),
+            "level": level,
+            "lat": lat,
+            "lng": lng,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建离线邮编索引")
+    parser.add_argument("ken_all", help="日本邮政 KEN_ALL.CSV")
+    parser.add_argument("output", help="输出 .fclpost 文件")
+    parser.add_argument("--coords", nargs="*", default=[], help="位置参照情報（大字・町丁目レベル）CSV")
+    args = parser.parse_args()
+
+    coords = load_coords(args.coords)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    count = write_postal_index(args.output, entries(args.ken_all, coords), source=os.path.basename(args.ken_all))
+    print(f"完成：{count} 条邮编记录 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+构建离线道路索引（供 roads.backend: offline 使用）
+
+用法：
+    # 从 Geofabrik 等下载的日本 OSM 数据（需要 pip install osmium）
+    python scripts/build_road_index.py japan-latest.osm.pbf data/japan_roads.fclroads
+
+    # 从 Overpass 导出的 JSON（out geom 格式，适合小范围测试）
+    python scripts/build_road_index.py --from-json overpass.json data/japan_roads.fclroads
+
+只保留机动车可通行的 highway 道路及规则引擎用到的标签（highway / width / lanes / name）
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.offline_roads import write_road_index
+from utils.osm_roads import NON_VEHICLE_TYPES
+
+
+def ways_from_pbf(path):
+    """从 PBF 文件读取道路（流式处理，避免一次性载入内存）"""
+    try:
+        import osmium
+    except ImportError:
+        sys.exit("读取 PBF 需要 osmium：pip install osmium")
+
+    collected = []
+
+    class HighwayHandler(osmium.SimpleHandler):
+        def way(self, w):
+            highway = w.tags.get("highway")
+            if not highway or highway in NON_VEHICLE_TYPES:
+                return
+            points = [(n.lat, n.lon) for n in w.nodes if n.location.valid()]
+            if not points:
+                return
+            tags = {k: w.tags.get(k) for k in ("highway", "width", "lanes", "name", "name:ja") if k in w.tags}
+            collected.append((w.id, tags, points))
+
+    HighwayHandler().apply_file(path, locations=True, idx="flex_mem")
+    return collected
+
+
+def ways_from_json(path):
+    """从 Overpass JSON（out geom）读取道路"""
+    with open(path, encoding="utf-8") as f:
+        elements = json.load(f).get("elements", [])
+    for e in elements:
+        tags = e.get("tags", {})
+        highway = tags.get("highway")
+        if e.get("type", "way") != "way" or not highway or highway in NON_VEHICLE_TYPES:
+            continue
+        points = [(g["lat"], g["lon"]) for g in e.get("geometry", []) if g]
+        if points:
+            yield e["id"], tags, points
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建离线道路索引")
+    parser.add_argument("source", help="OSM PBF 文件或 Overpass JSON 文件")
+    parser.add_argument("output", help="输出 .fclroads 文件")
+    parser.add_argument("--from-json", action="store_true", help="输入为 Overpass JSON")
+    parser.add_argument("--cell-size", type=float, default=0.01, help="网格大小（度，默认 0.01 ≈ 1km）")
+    args = parser.parse_args()
+
+    ways = ways_from_json(args.source) if args.from_json else ways_from_pbf(args.source)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    count = write_road_index(args.output, ways, cell_size=args.cell_size)
+    print(f"完成：{count} 条道路 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+地址变换的黄金数据检查（不访问网络）：带 LRU 缓存的字符串函数与缓存之前的实现结果一致
+
+用法：
+    python scripts/check_address_transforms.py
+
+scripts/fixtures/address_transforms_golden.json 中为固定随机种子生成的日文 / 英文地址（300 条），
+期望值由 LRU 缓存和合并正则引入之前的 normalize_address、simplify_address、simplify_english_address、
+translate_romaji_to_japanese、fix_chome_in_address 生成。每个地址调用两次（未命中 / 命中缓存），
+并修改第一次返回的列表，确认缓存结果不受调用方修改影响
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import geocoder
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "address_transforms_golden.json")
+FIX_CHOME_BASE = "東京都中央区銀座四丁目"
+
+
+def call_twice(name, *args):
+    """调用两次（第二次命中缓存）；第一次的列表结果被修改后，第二次仍应返回原结果"""
+    func = getattr(geocoder, name)
+    with contextlib.redirect_stdout(io.StringIO()):
+        first = func(*args)
+        if isinstance(first, list):
+            snapshot = list(first)
+            first.append("(调用方修改)")
+            first = snapshot
+        second = func(*args)
+    return first, second
+
+
+def main():
+    with open(FIXTURE, encoding="utf-8") as f:
+        cases = json.load(f)["cases"]
+    for cached in geocoder._MEMOIZED.values():
+        cached.cache_clear()
+
+    failures = []
+    checked = 0
+    for case in cases:
+        address = case["address"]
+        for name, expected in case.items():
+            if name == "address":
+                continue
+            args = (FIX_CHOME_BASE, address) if name == "fix_chome_in_address" else (address,)
+            first, second = call_twice(name, *args)
+            if first != expected or second != expected:
+                failures.append((name, address, expected, first, second))
+            checked += 1
+
+    for name, address, expected, first, second in failures[:20]:
+        print(f"✗ {name}({address!r})")
+        print(f"    期望: {expected}")
+        print(f"    第一次: {first}")
+        print(f"    第二次: {second}")
+    if failures:
+        sys.exit(f"{len(failures)} / {checked} 个结果与黄金数据不一致")
+
+    stats = geocoder.memo_stats()
+    if not all(stats[name]["hits"] for name in ("normalize_address", "simplify_address", "simplify_english_address",
+                                                "translate_romaji_to_japanese", "fix_chome_in_address")):
+        sys.exit(f"✗ 第二次调用应命中缓存: {stats}")
+    print(f"✓ {len(cases)} 个地址、{checked} 个结果与黄金数据一致（第二次调用命中缓存）")
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
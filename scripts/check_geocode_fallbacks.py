@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+地理编码降级顺序检查（不访问网络）：本地地址索引 / GSI / Nominatim 的结果精度
+
+用法：
+    python scripts/check_geocode_fallbacks.py
+
+在临时目录中构建小型本地地址索引，用固定的假 GSI / Nominatim 响应替换网络请求，
+确认粗略的结果（市区町村中心等）不会抢在更详细的结果之前返回
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import geocoder, place_names
+from utils.address_index import AddressIndex, write_address_index
+from utils.async_http import run_sync
+
+CHUO_CITY = (35.6707, 139.7720)
+GINZA_TOWN = (35.6717, 139.7650)
+GINZA_4_6 = (35.6712, 139.7651)
+GSI_POINT = (35.67125, 139.76525)
+
+
+class FakeServices:
+    """按地址返回固定结果的 GSI / Nominatim，并记录请求"""
+
+    def __init__(self, gsi=None, nominatim=None, nominatim_default=(None, None, None)):
+        self.gsi = gsi or {}
+        self.nominatim = nominatim or {}
+        self.nominatim_default = nominatim_default
+        self.calls = []
+
+    async def geocode_gsi_async(self, address, timeout=8):
+        self.calls.append(("gsi", address))
+        return self.gsi.get(address, (None, None))
+
+    async def geocode_nominatim_async(self, address, country_code="jp", timeout=8):
+        self.calls.append(("nominatim", address))
+        return self.nominatim.get(address, self.nominatim_default)
+
+
+def geocode_with(index, services, address, postal_entries=()):
+    geocoder.get_address_index = lambda: index
+    geocoder.lookup_postal_code = lambda code: list(postal_entries)
+    geocoder.geocode_gsi_async = services.geocode_gsi_async
+    geocoder.geocode_nominatim_async = services.geocode_nominatim_async
+    return run_sync(geocoder._geocode_uncached_async(address))
+
+
+def postal_entry(level, town, point):
+    return {"prefecture": "東京都", "city": "中央区", "town": town, "prefecture_romaji": "tokyoto",
+            "city_romaji": "chuoku", "town_romaji": "ginza" if town else "", "level": level,
+            "lat": point[0], "lng": point[1]}
+
+
+def build_index(tmp, name, points):
+    path = os.path.join(tmp, name)
+    write_address_index(path, points, source="check")
+    return AddressIndex(path)
+
+
+def check(name, result, expected):
+    if tuple(result[:2]) != tuple(expected):
+        sys.exit(f"✗ {name}: 期望 {expected}，实际 {result}")
+    print(f"✓ {name}")
+
+
+def main():
+    address = "東京都中央区銀座四丁目6番16号 銀座ビル5F"
+    with tempfile.TemporaryDirectory() as tmp:
+        full = build_index(tmp, "full.fcladdr", {
+            ("東京都", "中央区", ""): CHUO_CITY,
+            ("東京都", "中央区", "銀座"): GINZA_TOWN,
+            ("東京都", "中央区", "銀座4丁目6"): GINZA_4_6,
+        })
+        town_only = build_index(tmp, "town.fcladdr", {
+            ("東京都", "中央区", ""): CHUO_CITY,
+            ("東京都", "中央区", "銀座"): GINZA_TOWN,
+        })
+        city_only = build_index(tmp, "city.fcladdr", {("東京都", "中央区", ""): CHUO_CITY})
+
+        # 门牌号没有记录：截断到街区（銀座4丁目6），不降到市区町村中心
+        check("门牌号截断到街区", geocode_with(full, FakeServices(), address), GINZA_4_6)
+        check("街区级本地命中优先于 GSI", geocode_with(full, FakeServices(gsi={
+            geocoder.simplify_address(address)[0]: GSI_POINT}), address), GINZA_4_6)
+
+        # 本地只有町域：更详细的候选先查询 GSI
+        dashed = "東京都中央区銀座4-6-16 銀座ビル5F"
+        check("详细的 GSI 结果优先于町域级本地结果", geocode_with(town_only, FakeServices(gsi={
+            "東京都中央区銀座4丁目6": GSI_POINT}), dashed), GSI_POINT)
+        check("GSI 失败时使用町域级本地结果", geocode_with(town_only, FakeServices(), dashed), GINZA_TOWN)
+
+        # 本地只有市区町村中心：不作为结果
+        check("不使用本地市区町村中心", geocode_with(city_only, FakeServices(), address), (None, None))
+
+        # 罗马字地名词典只解析到市区町村：不查询 GSI，由 Nominatim 按完整英文地址查询
+        names_path = os.path.join(tmp, "names.fclnames")
+        place_names.write_place_names(names_path, [
+            ("chuo", place_names.Place("city", "中央区", "東京都", "")),
+            ("ginza", place_names.Place("town", "銀座", "東京都", "中央区")),
+        ])
+        place_names._names = place_names.PlaceNames(names_path)
+        english = "Chuo-ku, Tokyo"
+        services = FakeServices(gsi={"東京都中央区": CHUO_CITY},
+                                nominatim={english: GSI_POINT + ("東京都中央区",)})
+        check("市区町村级的罗马字地名交给 Nominatim", geocode_with(None, services, english), GSI_POINT)
+        if any(kind == "gsi" for kind, _ in services.calls):
+            sys.exit(f"✗ 市区町村级的罗马字地名不应查询 GSI: {services.calls}")
+        check("町域级的罗马字地名查询 GSI", geocode_with(None, FakeServices(gsi={
+            "東京都中央区銀座4-6-16": GSI_POINT}), "4-6-16 Ginza, Chuo-ku, Tokyo"), GSI_POINT)
+
+    # 邮编代表坐标：只使用町域级的条目，且排在 Nominatim 之后
+    postal_address = "〒104-0061 東京都中央区銀座4-6-16"
+    town_entry = postal_entry("town", "銀座", GINZA_TOWN)
+    check("Nominatim 优先于邮编町域代表坐标", geocode_with(None, FakeServices(
+        nominatim_default=GSI_POINT + ("東京都中央区銀座",)), postal_address, [town_entry]), GSI_POINT)
+    check("在线查询都失败时使用邮编町域代表坐标",
+          geocode_with(None, FakeServices(), postal_address, [town_entry]), GINZA_TOWN)
+    check("不使用市区町村级的邮编代表坐标", geocode_with(None, FakeServices(), postal_address,
+                                                   [postal_entry("city", "", CHUO_CITY)]), (None, None))
+    print("全部通过")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+FCL 规则判断的黄金数据检查（不访问网络）
+
+用法：
+    python scripts/check_rules_golden.py
+
+scripts/fixtures/rules_golden.json 中每条用例为 (地址, 周边道路) → 各车辆类型的 (可达, 理由)，
+期望值由关键词自动机和 config/rules.yaml 引入之前的规则引擎（逐个关键词列表扫描、阈值写在代码中）生成。
+确认 can_access_fcl 和 evaluate_all_vehicles 的判断与之完全一致；
+另外在临时目录的 rules.yaml 副本上确认热加载（修改后重新编译、配置有错误时继续使用旧规则）
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import rules
+from utils.jp_address_parser_simple import parse
+from utils.rules import can_access_fcl, evaluate_all_vehicles
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rules_golden.json")
+
+
+def parse_address(address):
+    """与 api/index.py 的 prepare_address_async 相同的解析结果格式"""
+    parsed = {"full": address, "prefecture": "", "city": "", "town": "", "rest": ""}
+    parsed.update(parse(address)._asdict())
+    return parsed
+
+
+def main():
+    with open(FIXTURE, encoding="utf-8") as f:
+        golden = json.load(f)
+    road_sets = golden["road_sets"]
+
+    failures = []
+    checked = 0
+    for case in golden["cases"]:
+        address, roads = case["address"], road_sets[case["roads"]]
+        parsed = parse_address(address)
+        # 规则引擎会输出道路宽度等调试信息
+        with contextlib.redirect_stdout(io.StringIO()):
+            all_verdicts = evaluate_all_vehicles(roads, parsed, original_address=address)
+            for vehicle_type, expected in case["expected"].items():
+                expected = tuple(expected)
+                single = can_access_fcl(roads, parsed, vehicle_type, original_address=address)
+                if single != expected or all_verdicts.get(vehicle_type) != expected:
+                    failures.append((address, case["roads"], vehicle_type, expected, single,
+                                     all_verdicts.get(vehicle_type)))
+                checked += 1
+
+    for address, roads, vehicle_type, expected, single, batch in failures[:20]:
+        print(f"✗ {address} / {roads} / {vehicle_type}")
+        print(f"    期望: {expected}")
+        print(f"    can_access_fcl: {single}")
+        print(f"    evaluate_all_vehicles: {batch}")
+    if failures:
+        sys.exit(f"{len(failures)} / {checked} 个判断与黄金数据不一致")
+    print(f"✓ {len(golden['cases'])} 条用例、{checked} 个判断与黄金数据一致")
+
+    check_hot_reload(road_sets["residential_5_5"])
+    print("全部通过")
+
+
+def reload_rules():
+    """跳过 rules.check_interval 的等待，立即检查配置文件"""
+    rules._rules_checked_at = float("-inf")
+    with contextlib.redirect_stdout(io.StringIO()):
+        return rules.get_rules()
+
+
+def check_hot_reload(roads):
+    address = "埼玉県川口市領家4-5-1"
+    parsed = parse_address(address)
+    original_path, original_rules = rules.RULES_PATH, rules._rules
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "rules.yaml")
+        shutil.copyfile(original_path, path)
+        rules.RULES_PATH = path
+        try:
+            before = reload_rules().version
+            with contextlib.redirect_stdout(io.StringIO()):
+                denied = can_access_fcl(roads, parsed, "40ft", original_address=address)
+
+            # 40ft 的住宅区道路最低宽度 6.0m → 5.0m：5.5m 的住宅区道路不再因宽度不足被拒绝
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text.replace("40ft: {min_width: 6.0", "40ft: {min_width: 5.0", 1))
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+            reloaded = reload_rules()
+            with contextlib.redirect_stdout(io.StringIO()):
+                changed = can_access_fcl(roads, parsed, "40ft", original_address=address)
+            if reloaded.version == before or changed == denied:
+                sys.exit(f"✗ 修改 rules.yaml 后没有重新加载: {denied} → {changed}")
+            print(f"✓ 修改 rules.yaml 后自动重新编译（版本 {before} → {reloaded.version}）")
+
+            # 配置有错误时继续使用旧规则
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("keywords: [\n")
+            os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2 * 10 ** 9))
+            if reload_rules() is not reloaded:
+                sys.exit("✗ rules.yaml 有错误时应继续使用旧规则")
+            print("✓ rules.yaml 有错误时继续使用旧规则")
+        finally:
+            rules.RULES_PATH = original_path
+            rules._rules = original_rules
+            rules._rules_mtimes = rules._config_mtimes()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+# utils/address_index.py
+# 功能：本地地址索引（离线地理编码，由 scripts/build_address_index.py 从 位置参照情報 预先转换）
+# 都道府県 → 市区町村 → 町域 → 丁目 → 街区 的代表坐标，不发送任何网络请求
+# 文件通过 mmap 打开、按键二分查找，加载时不读入整个文件
+#
+# 文件格式（.fcladdr，小端序）：
+#   b"FCLADDRS" + uint32 版本号
+#   uint32 头部长度 + 头部 JSON {"records", "text_bytes", "cities": [[都道府県, 市区町村], ...], "source"}
+#   records × (uint32 市区町村下标, uint32 文本偏移, int32 纬度, int32 经度)   按 (市区町村下标, 文本) 升序，坐标单位 1e-7 度
+#   文本区：UTF-8，每条记录在市区町村之后的部分（如 "銀座4丁目6"；市区町村本身为空串），按记录顺序连续存放
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+import unicodedata
+
+from utils.settings import get_setting
+
+MAGIC = b"FCLADDRS"
+VERSION = 1
+COORD_SCALE = 1e7
+RECORD = struct.Struct("<IIii")
+
+_KANJI_DIGITS = {"〇": 0, "一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+_KANJI_NUMBER = re.compile(r'([〇一二三四五六七八九十]+)(丁目|条)')
+_DASH = re.compile(r'(?<=\d)[-−‐‑–—―ー－](?=\d)')
+_POSTAL = re.compile(r'〒?\d{3}-\d{4}')
+# 数字之后的建筑物名、楼层等（丁目 / 条 / 门牌号继续保留）
+_TAIL = re.compile(r'(?<=\d)(?!丁目|条|-|\d).*$')
+
+
+def _kanji_to_int(text):
+    total, digit = 0, 0
+    for ch in text:
+        if ch == "十":
+            total += (digit or 1) * 10
+            digit = 0
+        else:
+            digit = _KANJI_DIGITS[ch]
+    return total + digit
+
+
+def canonical_address(address: str) -> str:
+    """
+    地址 → 索引键（建索引和查询使用同一规则）
+    例："〒104-0061 東京都中央区銀座四丁目６番１６号 銀座ビル" → "東京都中央区銀座4丁目6-16"
+    """
+    addr = unicodedata.normalize("NFKC", address)
+    addr = _DASH.sub("-", addr)
+    addr = _POSTAL.sub("", addr)
+    addr = re.sub(r'\s+', '', addr)
+    addr = re.sub(r'^日本国?', '', addr)
+    addr = addr.replace("大字", "").replace("ヶ", "ケ").replace("ヵ", "カ")
+    addr = _KANJI_NUMBER.sub(lambda m: f"{_kanji_to_int(m.group(1))}{m.group(2)}", addr)
+    # 6番16号 / 6番地16 / 6の16 → 6-16
+    addr = re.sub(r'(\d)(?:番地?|の)(?=\d)', r'\1-', addr)
+    addr = re.sub(r'(\d)(?:番地?|号)', r'\1', addr)
+    return _TAIL.sub("", addr)
+
+
+def write_address_index(path, points, source=""):
+    """
+    写入本地地址索引文件
+    :param path: 输出文件路径
+    :param points: {(都道府県, 市区町村, 市区町村之后的部分): (lat, lng)}，均为 canonical_address 后的形式
+    :param source: 数据来源说明（写入头部）
+    :return: 写入的条数
+    """
+    cities = sorted({(pref, city) for pref, city, _ in points})
+    city_ids = {c: i for i, c in enumerate(cities)}
+    keys = sorted(((city_ids[(pref, city)], rest.encode("utf-8")), (pref, city, rest))
+                  for pref, city, rest in points)
+
+    text = bytearray()
+    records = []
+    for (city_id, rest_bytes), key in keys:
+        lat, lng = points[key]
+        records.append((city_id, len(text), round(lat * COORD_SCALE), round(lng * COORD_SCALE)))
+        text += rest_bytes
+
+    header = json.dumps({"records": len(records), "text_bytes": len(text),
+                         "cities": [list(c) for c in cities], "source": source},
+                        ensure_ascii=False).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", VERSION))
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(text)
+    return len(records)
+
+
+class AddressIndex:
+    """
+    本地地址索引（mmap + 二分查找）
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC or struct.unpack_from("<I", mm, len(MAGIC))[0] != VERSION:
+            mm.close()
+            raise ValueError(f"不支持的地址索引文件: {path}")
+        header_len = struct.unpack_from("<I", mm, len(MAGIC) + 4)[0]
+        start = len(MAGIC) + 8
+        header = json.loads(mm[start:start + header_len].decode("utf-8"))
+        self.count = header["records"]
+        self._text_bytes = header["text_bytes"]
+        self._records = start + header_len
+        self._text = self._records + self.count * RECORD.size
+
+        # 市区町村名 → 下标（带都道府県 / 不带都道府県，后者可能重名）
+        self._cities = {}
+        self._short_cities = {}
+        for i, (pref, city) in enumerate(header["cities"]):
+            self._cities[pref + city] = i
+            self._short_cities.setdefault(city, []).append(i)
+        self._max_city_len = max((len(k) for k in self._cities), default=0)
+        print(f"本地地址索引已加载: {self.count} 条（{path}）")
+
+    def _key_at(self, i):
+        city_id, offset = struct.unpack_from("<II", self._mm, self._records + i * RECORD.size)
+        if i + 1 < self.count:
+            end = struct.unpack_from("<I", self._mm, self._records + (i + 1) * RECORD.size + 4)[0]
+        else:
+            end = self._text_bytes
+        return city_id, self._mm[self._text + offset:self._text + end]
+
+    def _find(self, city_id, rest):
+        key = (city_id, rest.encode("utf-8"))
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._key_at(lo) == key:
+            _, _, lat, lng = RECORD.unpack_from(self._mm, self._records + lo * RECORD.size)
+            return lat / COORD_SCALE, lng / COORD_SCALE
+        return None
+
+    def lookup(self, address: str, allow_city=True):
+        """
+        精确查询（只匹配索引中存在的层级：市区町村 / 町域 / 丁目 / 街区，不做模糊匹配）
+        门牌号没有记录时截断到街区再查询（銀座4丁目6-16 → 銀座4丁目6），不会再降到丁目 / 町域
+        :param address: 地址（省略都道府県时市区町村名须唯一）
+        :param allow_city: 是否接受只匹配到市区町村（代表坐标为市区町村中心）的结果
+        :return: (lat, lng)；没有记录返回 None
+        """
+        key = canonical_address(address)
+        # 从长到短匹配市区町村名（横浜市鶴見区 优先于更短的名称）
+        for n in range(min(len(key), self._max_city_len), 1, -1):
+            prefix = key[:n]
+            city_id = self._cities.get(prefix)
+            if city_id is None:
+                ids = self._short_cities.get(prefix, [])
+                city_id = ids[0] if len(ids) == 1 else None
+            if city_id is None:
+                continue
+            rest = key[n:]
+            if not rest and not allow_city:
+                continue
+            while True:
+                point = self._find(city_id, rest)
+                if point:
+                    return point
+                # 6-16 → 6（只去掉街区之后的号码）
+                head, sep, _ = rest.rpartition("-")
+                if not sep or not head[-1:].isdigit():
+                    break
+                rest = head
+        return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_address_index():
+    """
+    获取本地地址索引（首次调用时打开，文件路径见 geocode.local_index.path）
+    :return: AddressIndex；未启用、文件不存在或格式错误时返回 None
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            if not get_setting("geocode.local_index.enabled", True):
+                _index = False
+                return None
+            path = get_setting("geocode.local_index.path", "data/japan_addresses.fcladdr")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            try:
+                _index = AddressIndex(path)
+            except (OSError, ValueError) as e:
+                print(f"本地地址索引加载失败: {e}")
+                _index = False  # 不再重复尝试加载
+        return _index or None
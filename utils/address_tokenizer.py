@@ -0,0 +1,237 @@
+# utils/address_tokenizer.py
+# 功能：日文地址分词（parse / extract_address / normalize_address / simplify_address 共用）
+# - 都道府県：47 个名称构建前缀树，再编译为一个按公共前缀合并的正则（一次扫描找出所有出现位置）
+# - 其余规则全部预编译；tokenize() 一次得到解析结果、标准化地址和完整的降级候选列表
+# 各函数的输出与原实现逐字一致（见 scripts/bench_address_parser.py）
+
+import re
+from collections import namedtuple
+
+# 定义一个兼容旧接口的 NamedTuple
+ParsedAddress = namedtuple('ParsedAddress', ['prefecture', 'city', 'town', 'rest', 'full'])
+AddressTokens = namedtuple('AddressTokens', ['parsed', 'normalized', 'candidates'])
+
+# 顺序即 extract_address 的优先级（文本中出现多个都道府県时取排在前面的）
+PREFECTURES = [
+    "北海道", "青森県", "岩手県", "宮城県", "秋田県", "山形県", "福島県",
+    "茨城県", "栃木県", "群馬県", "埼玉県", "千葉県", "東京都", "神奈川県",
+    "新潟県", "富山県", "石川県", "福井県", "山梨県", "長野県", "岐阜県",
+    "静岡県", "愛知県", "三重県", "滋賀県", "京都府", "大阪府", "兵庫県",
+    "奈良県", "和歌山県", "鳥取県", "島根県", "岡山県", "広島県", "山口県",
+    "徳島県", "香川県", "愛媛県", "高知県", "福岡県", "佐賀県", "長崎県",
+    "熊本県", "大分県", "宮崎県", "鹿児島県", "沖縄県"
+]
+_PREFECTURE_RANK = {pref: i for i, pref in enumerate(PREFECTURES)}
+
+
+def _build_trie(words):
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = word
+    return trie
+
+
+def _trie_pattern(node):
+    """前缀树 → 正则（公共前缀只比较一次，如 福(?:島県|井県|岡県)）"""
+    branches = []
+    for ch in sorted(k for k in node if k):
+        branches.append(re.escape(ch) + _trie_pattern(node[ch]))
+    if "" in node:
+        # 47 个名称互不为前缀，终止节点没有子节点
+        return ""
+    if len(branches) == 1:
+        return branches[0]
+    return "(?:" + "|".join(branches) + ")"
+
+
+_PREFECTURE_RE = re.compile(_trie_pattern(_build_trie(PREFECTURES)))
+
+# parse
+_CITY_RE = re.compile(r"(.+?[市区町村])")
+_TOWN_RE = re.compile(r"(.+?)(?:[0-9一二三四五六七八九十丁目番地])")
+
+# extract_address
+_ADDRESS_END_RE = re.compile(r'[\s　(（]')
+_CITY_IN_TEXT_RE = re.compile(r'([^\s　]+?[市区町村郡])')
+
+# normalize
+_NORMALIZE_TABLE = str.maketrans({
+    '〒': None,
+    **{chr(0xFF10 + i): str(i) for i in range(10)},  # 全角数字 → 半角
+    '－': '-', 'ー': '-',
+})
+_TRAILING_BUILDING_RE = re.compile(r'[　\s]+(.*?(ビル|タワー|マンション|階|F|内|近く|付近).*)$')
+_CHOME_DASH_RE = re.compile(r'([^\d丁目])(\d+)-(\d+[-\d]*)')
+
+# simplify
+_BUILDING_RE = re.compile(r'[　\s]+.*?(ビル|タワー|マンション|階|F).*$')
+_BANCHI_RE = re.compile(r'[0-9０-９]+番地?$')
+_LAST_NUMBER_RE = re.compile(r'[-−ー][0-9０-９]+号?$')
+_CHOME_BLOCK_RE = re.compile(r'(.*?[0-9０-９]+丁目[0-9０-９]+)')
+_CHOME_RE = re.compile(r'(.*?[0-9０-９]+丁目)')
+_AFTER_CHOME_RE = re.compile(r'[0-9０-９]+丁目.*$')
+_MUNICIPALITY_RE = re.compile(r'(.*?[都道府県][^市区町村]+[市区町村])')
+
+
+def match_prefecture(text: str):
+    """
+    开头的都道府県
+    :return: 都道府県名；不是以都道府県开头时返回 ""
+    """
+    m = _PREFECTURE_RE.match(text)
+    return m.group(0) if m else ""
+
+
+def find_prefecture(text: str):
+    """
+    文本中的都道府県（多个时按 PREFECTURES 的顺序取第一个）
+    :return: (都道府県名, 首次出现的位置)；没有时返回 ("", -1)
+    """
+    best, best_pos = "", -1
+    for m in _PREFECTURE_RE.finditer(text):
+        pref = m.group(0)
+        if not best or _PREFECTURE_RANK[pref] < _PREFECTURE_RANK[best]:
+            best, best_pos = pref, m.start()
+    return best, best_pos
+
+
+def parse(address: str):
+    """
+    地址 → 都道府県 / 市区町村 / 町名 / 其余部分
+    :return: ParsedAddress
+    """
+    addr = address.strip()
+    full = addr
+    town = ""
+    rest = addr
+
+    # 提取都道府县
+    prefecture = match_prefecture(addr)
+    addr = addr[len(prefecture):]
+
+    # 提取市/区/町/村
+    city = ""
+    m = _CITY_RE.match(addr)
+    if m:
+        city = m.group(1)
+        addr = addr[m.end():]
+
+    # 提取町名（到数字或丁目前）
+    m = _TOWN_RE.search(addr)
+    if m:
+        town = m.group(1)
+        rest = addr[m.end():]
+    else:
+        town = addr
+
+    return ParsedAddress(prefecture, city, town, rest, full)
+
+
+def extract_address(text: str) -> str:
+    """
+    从文本中提取地址部分（都道府県开始到空格 / 括号之前；没有都道府県时取第一个市区町村郡）
+    :return: 提取的地址字符串；都没找到时返回原文本
+    """
+    pref, pos = find_prefecture(text)
+    if pref:
+        return _ADDRESS_END_RE.split(text[pos:], 1)[0]
+    match = _CITY_IN_TEXT_RE.search(text)
+    if match:
+        return match.group(1)
+    return text
+
+
+def _add_chome(match):
+    prefix = match.group(1)
+    num1 = match.group(2)
+    rest = match.group(3)
+
+    # 检查是否是邮编格式（3位数字-4位数字）
+    if len(num1) == 3 and len(rest.split('-')[0]) == 4:
+        return match.group(0)  # 保持原样
+
+    # 检查前面是否已经有丁目
+    if '丁目' not in prefix[-3:]:
+        return f"{prefix}{num1}丁目{rest}"
+    return match.group(0)
+
+
+def normalize(address: str) -> str:
+    """
+    标准化日本地址格式（东京都中央区銀座4-6-16 → 東京都中央区銀座4丁目6-16）
+    """
+    # 移除 〒，全角数字 / 连字符转为半角
+    addr = address.translate(_NORMALIZE_TABLE)
+    # 移除建筑物名称（在空格或全角空格后的内容）
+    addr = _TRAILING_BUILDING_RE.sub('', addr)
+    # X-Y-Z → X丁目Y-Z（不转换邮编格式 650-0004）
+    addr = _CHOME_DASH_RE.sub(_add_chome, addr)
+    return addr.strip()
+
+
+def simplification_ladder(address: str, normalized: str):
+    """
+    从详细到简略的候选地址
+    :param address: 原地址
+    :param normalized: normalize(address) 的结果
+    :return: 候选地址列表（不重复）
+    """
+    candidates = [normalized]
+    seen = {normalized}
+
+    def add(addr):
+        if addr not in seen:
+            seen.add(addr)
+            candidates.append(addr)
+
+    # 如果原地址不同，也添加
+    add(address)
+
+    # 移除建筑物名称、楼层等
+    addr = _BUILDING_RE.sub('', normalized)
+    if addr != normalized:
+        add(addr)
+
+    # 移除番地号（1番地等）
+    addr = _BANCHI_RE.sub('', normalized)
+    if addr != normalized:
+        add(addr)
+
+    # 移除最后的号码部分（-16、16号等）
+    addr = _LAST_NUMBER_RE.sub('', normalized)
+    if addr != normalized:
+        add(addr)
+
+    # 只保留到丁目+第一个号码（例如：4丁目6）
+    match = _CHOME_BLOCK_RE.search(normalized)
+    if match:
+        add(match.group(1))
+
+    # 只保留到丁目
+    match = _CHOME_RE.search(normalized)
+    if match:
+        add(match.group(1))
+
+    # 移除丁目后的所有内容
+    addr = _AFTER_CHOME_RE.sub('', normalized)
+    if addr != normalized and len(addr) > 5:
+        add(addr)
+
+    # 只保留到区/市/町/村
+    match = _MUNICIPALITY_RE.search(normalized)
+    if match:
+        add(match.group(1))
+
+    return candidates
+
+
+def tokenize(address: str):
+    """
+    一次得到解析结果、标准化地址和降级候选列表
+    :return: AddressTokens(parsed, normalized, candidates)
+    """
+    normalized = normalize(address)
+    return AddressTokens(parse(address), normalized, simplification_ladder(address, normalized))
@@ -0,0 +1,151 @@
+# utils/async_http.py
+# 功能：异步外部 API 客户端（httpx）+ 进程内共享的事件循环
+# - 所有异步网络请求都在一个后台事件循环中执行，一个进程可同时保持大量外部请求，
+#   不再每个进行中的请求占用一个工作线程
+# - 同步代码通过 run_sync() 提交协程并等待结果（保留原有同步函数作为兼容封装）
+# - 限流（utils/ratelimit.py 的令牌桶）、并发上限、重试策略见 utils/http_client.py
+
+import asyncio
+import threading
+
+import httpx
+
+from utils.http_client import RETRY_STATUS, USER_AGENT, HttpConfig
+from utils.ratelimit import get_limiter
+
+_loop = None
+_loop_thread = None
+_loop_lock = threading.Lock()
+
+def get_loop():
+    """
+    获取共享事件循环（首次调用时在后台守护线程中启动）
+    :return: asyncio 事件循环
+    """
+    global _loop, _loop_thread
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _loop_thread = threading.Thread(target=_loop.run_forever, name="fcl-async-loop", daemon=True)
+            _loop_thread.start()
+        return _loop
+
+
+def submit(coro):
+    """
+    把协程提交到共享事件循环，立即返回（协程在调用方 contextvars 的副本中执行）
+    :return: concurrent.futures.Future（cancel() 会取消对应的任务）
+    """
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro):
+    """
+    在共享事件循环中执行协程并等待结果（供同步代码调用）
+    :return: 协程的返回值
+    :raises: RuntimeError（在共享事件循环线程内调用，会造成死锁）
+    """
+    if threading.current_thread() is _loop_thread:
+        coro.close()
+        raise RuntimeError("不能在共享事件循环内同步等待，请改用对应的 async 函数")
+    return submit(coro).result()
+
+
+async def on_shared_loop(coro):
+    """
+    在共享事件循环中执行协程（供其他事件循环中的异步代码调用，如 ASGI 服务器）
+    """
+    if asyncio.get_running_loop() is get_loop():
+        return await coro
+    return await asyncio.wrap_future(submit(coro))
+
+
+class AsyncHttpClient(HttpConfig):
+    """
+    进程内共享的异步 HTTP 客户端（每个服务一个 httpx.AsyncClient 连接池）
+    配置（重试、退避、并发上限）见 utils/http_client.py 的 HttpConfig
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._clients = {}
+        self._async_semaphores = {}
+
+    def _client(self, service):
+        # 只在共享事件循环中调用，无需加锁
+        if service not in self._clients:
+            self._clients[service] = httpx.AsyncClient(
+                headers={"User-Agent": USER_AGENT},
+                limits=httpx.Limits(max_connections=self.pool_maxsize, max_keepalive_connections=self.pool_maxsize),
+                follow_redirects=True,
+            )
+            self._async_semaphores[service] = asyncio.Semaphore(self.concurrency_limit(service))
+        return self._clients[service], self._async_semaphores[service]
+
+    async def request(self, method: str, url: str, **kwargs):
+        """
+        发送请求（params / data / headers / timeout）
+        :return: httpx.Response（调用方自行 raise_for_status）
+        :raises: httpx.HTTPError（重试耗尽后）
+        """
+        if asyncio.get_running_loop() is not get_loop():
+            return await on_shared_loop(self.request(method, url, **kwargs))
+
+        # data=字符串 对应 httpx 的 content
+        if isinstance(kwargs.get("data"), (str, bytes)):
+            kwargs["content"] = kwargs.pop("data")
+
+        service = self.service_name(url)
+        client, semaphore = self._client(service)
+        limiter = get_limiter(service)
+
+        for attempt in range(self.max_retries + 1):
+            if limiter:
+                wait = limiter.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+            try:
+                async with semaphore:
+                    resp = await client.request(method, url, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                if attempt >= self.max_retries:
+                    raise
+                await asyncio.sleep(self.backoff_delay(attempt))
+                continue
+
+            if resp.status_code in RETRY_STATUS and attempt < self.max_retries:
+                print(f"  {service} 返回 {resp.status_code}，重试中 ({attempt + 1}/{self.max_retries})")
+                await asyncio.sleep(self.backoff_delay(attempt, resp))
+                continue
+            return resp
+
+
+_async_client = None
+_async_client_lock = threading.Lock()
+
+def get_async_client():
+    """获取全局共享的 AsyncHttpClient"""
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            _async_client = AsyncHttpClient()
+        return _async_client
+
+async def async_http_get(url: str, **kwargs):
+    return await get_async_client().request("GET", url, **kwargs)
+
+async def async_http_post(url: str, **kwargs):
+    return await get_async_client().request("POST", url, **kwargs)
+
+
+async def gather_limited(coros, limit):
+    """
+    并发执行多个协程（同时最多 limit 个），结果与输入顺序一致
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
@@ -0,0 +1,199 @@
+# utils/cache.py
+# 功能：本地持久化缓存（SQLite），支持 TTL 过期、按条数 LRU 淘汰、命中统计
+# 同一个数据库文件可被多个 worker 进程共享（WAL 模式），进程重启后数据仍在
+# 读取只执行 SELECT（不占用写锁）；访问时间和命中统计先记在进程内，在写入时的定期淘汰中批量写回
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from utils.settings import get_cache_dir
+
+
+class SQLiteCache:
+    """
+    基于 SQLite 的键值缓存
+    同一数据库文件内用 namespace 区分不同用途的缓存（如正向/负向地理编码结果）
+    """
+
+    def __init__(self, namespace: str, ttl=86400, max_entries=10000, path=None):
+        """
+        :param namespace: 缓存命名空间
+        :param ttl: 过期时间（秒），None 表示永不过期
+        :param max_entries: 最大条数，超出后淘汰最久未访问的条目
+        :param path: 数据库文件路径，默认 <cache_dir>/cache.sqlite3
+        """
+        self.namespace = namespace
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path or os.path.join(get_cache_dir(), "cache.sqlite3")
+        self._local = threading.local()
+        self._writes = 0
+        self._lock = threading.Lock()
+        # 尚未写回数据库的访问时间和命中统计（见 flush）
+        self._accessed = {}
+        self._hits = 0
+        self._misses = 0
+
+    def _connect(self):
+        """每个线程使用独立连接（sqlite3 连接不能跨线程共享）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL,"
+                " created REAL NOT NULL, accessed REAL NOT NULL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (namespace, accessed)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_stats ("
+                " namespace TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0,"
+                " misses INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str, default=None):
+        """
+        读取缓存
+        :param key: 缓存键
+        :param default: 未命中或已过期时的返回值
+        :return: 缓存值（JSON 反序列化后）
+        """
+        entry = self.get_entry(key)
+        return default if entry is None else entry[0]
+
+    def get_entry(self, key: str):
+        """
+        读取缓存及其写入时间（两级缓存按写入时间计算剩余有效期）
+        :param key: 缓存键
+        :return: (缓存值, 写入时间 time.time())；未命中或已过期时返回 None
+        """
+        try:
+            conn = self._connect()
+            now = time.time()
+            row = conn.execute(
+                "SELECT value, created FROM cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row and (self.ttl is None or now - row[1] <= self.ttl):
+                with self._lock:
+                    self._accessed[key] = now
+                    self._hits += 1
+                return json.loads(row[0]), row[1]
+
+            # 未命中或已过期（过期条目由 evict 删除）
+            with self._lock:
+                self._misses += 1
+        except sqlite3.Error as e:
+            print(f"  缓存读取失败（{self.namespace}）: {e}")
+        return None
+
+    def set(self, key: str, value):
+        """
+        写入缓存（值需可 JSON 序列化）
+        """
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            conn.commit()
+
+            # 每写入 100 次检查一次容量，避免每次都 COUNT
+            with self._lock:
+                self._writes += 1
+                need_evict = self._writes % 100 == 1
+            if need_evict:
+                self.evict()
+        except sqlite3.Error as e:
+            print(f"  缓存写入失败（{self.namespace}）: {e}")
+
+    def delete(self, key: str):
+        try:
+            conn = self._connect()
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"  缓存删除失败（{self.namespace}）: {e}")
+
+    def flush(self):
+        """
+        把进程内记录的访问时间和命中统计写回数据库（由 evict 调用，读取时不写数据库）
+        """
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+            hits, misses = self._hits, self._misses
+            self._hits = self._misses = 0
+        conn = self._connect()
+        if accessed:
+            conn.executemany(
+                "UPDATE cache SET accessed = MAX(accessed, ?) WHERE namespace = ? AND key = ?",
+                [(at, self.namespace, key) for key, at in accessed.items()],
+            )
+        if hits or misses:
+            conn.execute("INSERT OR IGNORE INTO cache_stats (namespace) VALUES (?)", (self.namespace,))
+            conn.execute(
+                "UPDATE cache_stats SET hits = hits + ?, misses = misses + ? WHERE namespace = ?",
+                (hits, misses, self.namespace),
+            )
+        conn.commit()
+
+    def evict(self):
+        """
+        清理过期条目，并按最近访问时间淘汰超出 max_entries 的条目（LRU）
+        淘汰前先写回进程内记录的访问时间（flush）
+        """
+        self.flush()
+        conn = self._connect()
+        if self.ttl is not None:
+            conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND created < ?",
+                (self.namespace, time.time() - self.ttl),
+            )
+        if self.max_entries:
+            count = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+            overflow = count - self.max_entries
+            if overflow > 0:
+                conn.execute(
+                    "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                    " SELECT key FROM cache WHERE namespace = ? ORDER BY accessed ASC LIMIT ?)",
+                    (self.namespace, self.namespace, overflow),
+                )
+        conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self._hits = self._misses = 0
+        conn = self._connect()
+        conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+        conn.execute("DELETE FROM cache_stats WHERE namespace = ?", (self.namespace,))
+        conn.commit()
+
+    def stats(self):
+        """
+        命中统计（所有共享该数据库文件的进程已写回的累计，加上本进程尚未写回的部分）
+        :return: {"hits": int, "misses": int, "entries": int}
+        """
+        try:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT hits, misses FROM cache_stats WHERE namespace = ?", (self.namespace,)
+            ).fetchone() or (0, 0)
+            entries = conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+            with self._lock:
+                hits, misses = row[0] + self._hits, row[1] + self._misses
+            return {"hits": hits, "misses": misses, "entries": entries}
+        except sqlite3.Error as e:
+            print(f"  缓存统计失败（{self.namespace}）: {e}")
+            return {"hits": 0, "misses": 0, "entries": 0}
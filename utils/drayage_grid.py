@@ -0,0 +1,89 @@
+# utils/drayage_grid.py
+# 功能：预计算的港口牵引时间网格（由 scripts/build_drayage_grid.py 离线生成）
+# 每个港口周边一定范围内按固定间隔的网格点预先计算道路距离和卡车牵引时间，
+# 查询时 O(1) 定位网格 + 双线性插值，无需访问 OSRM
+#
+# 文件：
+#   <path>.json        元数据 {"cell_size", "ports": {code: {lat, lng, south, west, ny, nx, offset}}}
+#   <path>.npy         float32 (N, 2)：道路距离（km）、卡车牵引时间（分钟），无数据为 NaN
+#   <path>_routed.npy  uint8 (N,)：1 = OSRM 实际路线，0 = 直线距离估算
+
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+from utils.settings import get_setting
+
+
+class DrayageGrid:
+    """
+    按港口划分的牵引时间网格（numpy 内存映射，加载几乎不占内存）
+    """
+
+    def __init__(self, path):
+        with open(f"{path}.json", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.cell_size = meta["cell_size"]
+        self.ports = meta["ports"]
+        self.values = np.load(f"{path}.npy", mmap_mode="r")
+        self.routed = np.load(f"{path}_routed.npy", mmap_mode="r")
+        print(f"牵引时间网格已加载: {len(self.ports)} 个港口（{path}）")
+
+    def has_port(self, port):
+        """网格是否包含该港口（港口坐标变更后旧网格失效）"""
+        meta = self.ports.get(port["code"])
+        return bool(meta) and abs(meta["lat"] - port["lat"]) < 1e-6 and abs(meta["lng"] - port["lng"]) < 1e-6
+
+    def lookup(self, lat, lng, port):
+        """
+        查询地点到港口的道路距离和牵引时间（周围 4 个网格点双线性插值）
+        :return: (distance_km, truck_minutes, routed)；超出网格范围或无数据时返回 None
+        """
+        if not self.has_port(port):
+            return None
+        meta = self.ports[port["code"]]
+        fy = (lat - meta["south"]) / self.cell_size
+        fx = (lng - meta["west"]) / self.cell_size
+        y0, x0 = int(math.floor(fy)), int(math.floor(fx))
+        if y0 < 0 or x0 < 0 or y0 + 1 >= meta["ny"] or x0 + 1 >= meta["nx"]:
+            return None
+
+        base = meta["offset"]
+        nx = meta["nx"]
+        corners = [base + (y0 + dy) * nx + (x0 + dx) for dy in (0, 1) for dx in (0, 1)]
+        values = np.asarray(self.values[corners], dtype=float)
+        if np.isnan(values).any():
+            return None
+
+        ty, tx = fy - y0, fx - x0
+        weights = np.array([(1 - ty) * (1 - tx), (1 - ty) * tx, ty * (1 - tx), ty * tx])
+        distance, minutes = weights @ values
+        routed = bool(np.all(self.routed[corners]))
+        return round(float(distance), 1), int(minutes), routed
+
+
+_grid = None
+_grid_lock = threading.Lock()
+
+def get_drayage_grid():
+    """
+    获取牵引时间网格（首次调用时加载，路径见 drayage_grid.path）
+    :return: DrayageGrid；未启用或文件不存在时返回 None
+    """
+    global _grid
+    if not get_setting("drayage_grid.enabled", True):
+        return None
+    with _grid_lock:
+        if _grid is None:
+            path = get_setting("drayage_grid.path", "data/drayage_grid")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            try:
+                _grid = DrayageGrid(path)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"牵引时间网格未加载: {e}")
+                _grid = False  # 不再重复尝试加载
+        return _grid or None
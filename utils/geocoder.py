@@ -2,13 +2,117 @@
 # 功能：使用日本国土地理院（GSI）API 进行地理编码（免费，NLP/地图集成）
 # 将地址转为经纬度（Lat, Lng）
 # API 文档：https://msearch.gsi.go.jp/address-search/AddressSearch
+# 网络请求函数均为 async（xxx_async，在共享事件循环中执行），同名同步函数为兼容封装
 
-import requests
-import time
+import asyncio
+import functools
+import inspect
 import re
-from utils.address_extractor import extract_address
+import contextvars
+import httpx
+from utils import address_tokenizer
+from utils.async_http import async_http_get, run_sync
+from utils.address_index import get_address_index
+from utils.cache import SQLiteCache
+from utils.http_client import USER_AGENT
+from utils.place_names import prefecture_from_romaji, resolve_places
+from utils.port_routes import haversine
+from utils.postal_index import lookup_postal_code
+from utils.romaji import SUFFIX_ROMAJI, romaji_key, strip_suffix
+from utils.singleflight import SingleFlight
+from utils.timing import timer
+from utils.settings import get_setting
 
-def geocode_gsi(address: str, timeout=8):
+# 地理编码持久化缓存：成功结果 / 无法解析的地址（负向缓存）分开保存
+GEOCODE_CACHE = SQLiteCache(
+    "geocode",
+    ttl=get_setting("geocode_cache.ttl", 2592000),
+    max_entries=get_setting("geocode_cache.max_entries", 50000),
+)
+GEOCODE_NEGATIVE_CACHE = SQLiteCache(
+    "geocode_negative",
+    ttl=get_setting("geocode_cache.negative_ttl", 86400),
+    max_entries=get_setting("geocode_cache.negative_max_entries", 10000),
+)
+
+# 记录本次 geocode() 过程中是否发生网络错误（有错误时不写负向缓存）
+_network_errors = contextvars.ContextVar("geocode_network_errors", default=None)
+
+def _note_network_error():
+    errors = _network_errors.get()
+    if errors is not None:
+        errors.append(1)
+
+# 进行中的相同查询只发送一次（批量中多个地址常简化为同一个候选地址）
+GEOCODE_FLIGHTS = SingleFlight()
+
+def _coalesced(func):
+    """
+    合并进行中的相同查询（按 timeout 以外的参数）
+    请求中发生的网络错误同样记录到每个等待方的 geocode_async()；每次调用的耗时按函数名记录（utils/timing.py）
+    """
+    signature = inspect.signature(func)
+    stage = func.__name__.removesuffix("_async")
+
+    async def run(args, kwargs):
+        errors = []
+        _network_errors.set(errors)  # 共享任务有独立的上下文副本
+        return await func(*args, **kwargs), bool(errors)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (func.__name__,) + tuple(v for name, v in bound.arguments.items() if name != "timeout")
+        query = ",".join(str(v) for name, v in bound.arguments.items() if name in ("address", "lat", "lng"))
+        with timer(stage, query):
+            result, failed = await GEOCODE_FLIGHTS.do(key, run, args, kwargs)
+        if failed:
+            _note_network_error()
+        return result
+
+    return wrapper
+
+# 纯字符串函数（地址标准化、候选地址生成等）的 LRU 缓存
+MEMO_SIZE = get_setting("geocode.memo_size", 10000)
+_MEMOIZED = {}
+
+def _memoized(func):
+    """
+    按参数缓存纯函数的结果（LRU，最多 geocode.memo_size 条），命中统计见 memo_stats()
+    列表结果缓存为元组，每次返回新的列表，调用方修改不影响缓存
+    """
+    @functools.lru_cache(maxsize=MEMO_SIZE)
+    def cached(*args, **kwargs):
+        result = func(*args, **kwargs)
+        return tuple(result) if isinstance(result, list) else result
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        result = cached(*args, **kwargs)
+        # namedtuple 结果原样返回（其中的列表须由被缓存的函数自行转为元组）
+        return list(result) if type(result) is tuple else result
+
+    wrapper.cache_info = cached.cache_info
+    wrapper.cache_clear = cached.cache_clear
+    _MEMOIZED[func.__name__] = cached
+    return wrapper
+
+
+def memo_stats():
+    """
+    字符串函数缓存的命中统计
+    :return: {函数名: {"hits", "misses", "size", "maxsize"}}
+    """
+    stats = {}
+    for name, cached in _MEMOIZED.items():
+        info = cached.cache_info()
+        stats[name] = {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+    return stats
+
+
+@_coalesced
+async def geocode_gsi_async(address: str, timeout=8):
     """
     地理编码：地址 → 经纬度（日本国土地理院 API）
     :param address: 日本地址字符串
@@ -17,7 +121,7 @@ def geocode_gsi(address: str, timeout=8):
     """
     url = "https://msearch.gsi.go.jp/address-search/AddressSearch"
     try:
-        resp = requests.get(url, params={"q": address}, timeout=timeout)
+        resp = await async_http_get(url, params={"q": address}, timeout=timeout)
         resp.raise_for_status()
         data = resp.json()
         
@@ -34,17 +138,26 @@ def geocode_gsi(address: str, timeout=8):
             return float(coord[1]), float(coord[0])  # lat, lng
         
         return None, None
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         print(f"GSI 超时: {address}")
+        _note_network_error()
         return None, None
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         print(f"GSI 网络错误: {e}")
+        _note_network_error()
         return None, None
     except Exception as e:
         print(f"GSI 错误: {e}")
+        _note_network_error()
         return None, None
 
-def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
+def geocode_gsi(address: str, timeout=8):
+    """同步版本（见 geocode_gsi_async）"""
+    return run_sync(geocode_gsi_async(address, timeout))
+
+
+@_coalesced
+async def reverse_geocode_nominatim_async(lat: float, lng: float, timeout=8):
     """
     反向地理编码：经纬度 → 日文地址
     :param lat: 纬度
@@ -54,7 +167,7 @@ def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
     """
     url = "https://nominatim.openstreetmap.org/reverse"
     headers = {
-        "User-Agent": "FCL-Checker/1.0 (https://github.com/your-repo)",
+        "User-Agent": USER_AGENT,
         "Accept-Language": "ja"  # 只要日文
     }
     
@@ -67,7 +180,7 @@ def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
     }
     
     try:
-        resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+        resp = await async_http_get(url, params=params, headers=headers, timeout=timeout)
         resp.raise_for_status()
         result = resp.json()
         
@@ -103,16 +216,8 @@ def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
                     "JP-45": "宮崎県", "JP-46": "鹿児島県", "JP-47": "沖縄県"
                 }
                 
-                # 英文名称映射
-                name_map = {
-                    "Tokyo": "東京都", "Osaka": "大阪府", "Kyoto": "京都府",
-                    "Hokkaido": "北海道", "Kanagawa": "神奈川県", "Chiba": "千葉県",
-                    "Saitama": "埼玉県", "Aichi": "愛知県", "Hyogo": "兵庫県",
-                    "Fukuoka": "福岡県", "Miyagi": "宮城県", "Hiroshima": "広島県"
-                }
-                
-                # 先尝试 ISO 代码，再尝试英文名称
-                prefecture = iso_map.get(prefecture, name_map.get(prefecture, prefecture))
+                # 先尝试 ISO 代码，再尝试英文名称（47 个都道府県，见 utils/place_names.py）
+                prefecture = iso_map.get(prefecture, prefecture_from_romaji(prefecture) or prefecture)
                 parts.append(prefecture)
             
             # 市区町村
@@ -162,54 +267,65 @@ def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
         return None
 
 
+def reverse_geocode_nominatim(lat: float, lng: float, timeout=8):
+    """同步版本（见 reverse_geocode_nominatim_async）"""
+    return run_sync(reverse_geocode_nominatim_async(lat, lng, timeout))
+
+
+# 常见地名的罗马字到日文映射
+_ROMAJI_MAP = {
+    # 千叶县地名
+    'Moroto': '師戸',
+    'Inzai': '印西',
+    'Chiba': '千葉',
+    'Funabashi': '船橋',
+    'Shirai': '白井',
+    # 兵庫県神戸市地名
+    'Fukaehama': '深江浜',
+    'Higashinada': '東灘',
+    'Nakayamate': '中山手',
+    'Kobe': '神戸',
+    # 其他常见地名
+    'Tokyo': '東京',
+    'Osaka': '大阪',
+    'Kyoto': '京都',
+    'Yokohama': '横浜',
+    'Nagoya': '名古屋',
+    'Fukuoka': '福岡',
+    'Sapporo': '札幌',
+    'Hiroshima': '広島',
+    # 行政区划
+    'shi': '市',
+    'ken': '県',
+    'ku': '区',
+    'machi': '町',
+    'cho': '町',
+    'dori': '通',
+}
+# 所有罗马字合并为一个正则（单词边界匹配，避免部分匹配），一次扫描完成替换
+_ROMAJI_RE = re.compile(r'\b(?:' + '|'.join(map(re.escape, _ROMAJI_MAP)) + r')\b', re.IGNORECASE)
+# 忽略大小写匹配到的非 ASCII 字符（如 ſ、开尔文符号 K）按 casefold 归一；
+# İ / ı 的 casefold 不是 i，先单独替换
+_DOTTED_I = str.maketrans({"İ": "i", "ı": "i"})
+_ROMAJI_LOOKUP = {romaji.casefold(): japanese for romaji, japanese in _ROMAJI_MAP.items()}
+
+
+def _romaji_replacement(match):
+    return _ROMAJI_LOOKUP[match.group(0).translate(_DOTTED_I).casefold()]
+
+
+@_memoized
 def translate_romaji_to_japanese(address: str):
     """
     将英文罗马字地名转换为日文
     :param address: 包含罗马字的地址
     :return: 转换后的地址
     """
-    # 常见地名的罗马字到日文映射
-    romaji_map = {
-        # 千叶县地名
-        'Moroto': '師戸',
-        'Inzai': '印西',
-        'Chiba': '千葉',
-        'Funabashi': '船橋',
-        'Shirai': '白井',
-        # 兵庫県神戸市地名
-        'Fukaehama': '深江浜',
-        'Higashinada': '東灘',
-        'Nakayamate': '中山手',
-        'Kobe': '神戸',
-        # 其他常见地名
-        'Tokyo': '東京',
-        'Osaka': '大阪',
-        'Kyoto': '京都',
-        'Yokohama': '横浜',
-        'Nagoya': '名古屋',
-        'Fukuoka': '福岡',
-        'Sapporo': '札幌',
-        'Hiroshima': '広島',
-        # 行政区划
-        'shi': '市',
-        'ken': '県',
-        'ku': '区',
-        'machi': '町',
-        'cho': '町',
-        'dori': '通',
-    }
-    
-    translated = address
-    for romaji, japanese in romaji_map.items():
-        # 使用单词边界匹配，避免部分匹配
-        import re
-        pattern = r'\b' + re.escape(romaji) + r'\b'
-        translated = re.sub(pattern, japanese, translated, flags=re.IGNORECASE)
-    
-    return translated
+    return _ROMAJI_RE.sub(_romaji_replacement, address)
 
 
-def geocode_nominatim(address: str, country_code="jp", timeout=8):
+@_coalesced
+async def geocode_nominatim_async(address: str, country_code="jp", timeout=8):
     """
     备用地理编码：使用 OpenStreetMap Nominatim API
     :param address: 地址字符串（支持日文或英文）
@@ -219,7 +335,7 @@ def geocode_nominatim(address: str, country_code="jp", timeout=8):
     """
     url = "https://nominatim.openstreetmap.org/search"
     headers = {
-        "User-Agent": "FCL-Checker/1.0 (https://github.com/your-repo)",
+        "User-Agent": USER_AGENT,
         "Accept-Language": "ja,en"  # 优先返回日文
     }
     
@@ -248,7 +364,7 @@ def geocode_nominatim(address: str, country_code="jp", timeout=8):
             params["countrycodes"] = country_code
         
         try:
-            resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+            resp = await async_http_get(url, params=params, headers=headers, timeout=timeout)
             resp.raise_for_status()
             data = resp.json()
             if data and len(data) > 0:
@@ -314,7 +430,7 @@ def geocode_nominatim(address: str, country_code="jp", timeout=8):
                 # 如果地址不完整（少于3个组件），尝试反向地理编码获取更完整的地址
                 if not japanese_address or len(japanese_address) < 10:
                     print(f"  地址不完整，尝试反向地理编码...")
-                    reverse_addr = reverse_geocode_nominatim(lat, lng, timeout=timeout)
+                    reverse_addr = await reverse_geocode_nominatim_async(lat, lng, timeout=timeout)
                     if reverse_addr:
                         japanese_address = reverse_addr
                 
@@ -323,60 +439,49 @@ def geocode_nominatim(address: str, country_code="jp", timeout=8):
                     japanese_address = result.get("display_name", None)
                 
                 return lat, lng, japanese_address
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             print(f"  Nominatim 超时: {addr_to_try}")
+            _note_network_error()
             continue
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"  Nominatim 网络错误: {e}")
+            _note_network_error()
             continue
         except Exception as e:
             print(f"  Nominatim 错误: {e}")
+            _note_network_error()
             continue
     
     # 所有尝试都失败
     return None, None, None
 
 
+def geocode_nominatim(address: str, country_code="jp", timeout=8):
+    """同步版本（见 geocode_nominatim_async）"""
+    return run_sync(geocode_nominatim_async(address, country_code, timeout))
+
+
+@_memoized
+def tokenize_address(address: str):
+    """
+    地址分词：解析结果、标准化地址和降级候选一次得到（每个地址只分词一次，
+    prepare_address_async 的解析、normalize_address、simplify_address 共用）
+    :return: AddressTokens(parsed, normalized, candidates)，candidates 为元组
+    """
+    tokens = address_tokenizer.tokenize(address)
+    return tokens._replace(candidates=tuple(tokens.candidates))
+
+
+@_memoized
 def normalize_address(address: str):
     """
     标准化日本地址格式
     例如：東京都中央区銀座4-6-16 → 東京都中央区銀座4丁目6-16
     """
-    # 移除邮编符号 〒
-    addr = address.replace('〒', '')
-    
-    # 转换全角数字为半角数字
-    full_to_half = str.maketrans('０１２３４５６７８９', '0123456789')
-    addr = addr.translate(full_to_half)
-    
-    # 转换全角连字符为半角
-    addr = addr.replace('－', '-').replace('ー', '-')
-    
-    # 移除建筑物名称（在空格或全角空格后的内容）
-    addr = re.sub(r'[　\s]+(.*?(ビル|タワー|マンション|階|F|内|近く|付近).*)$', '', addr)
-    
-    # 转换 X-Y-Z 格式为 X丁目Y-Z（如果前面没有丁目，且不是邮编）
-    # 例如：銀座4-6-16 → 銀座4丁目6-16
-    # 但不转换：650-0004（邮编格式：3位-4位）
-    def add_chome(match):
-        prefix = match.group(1)
-        num1 = match.group(2)
-        rest = match.group(3)
-        
-        # 检查是否是邮编格式（3位数字-4位数字）
-        if len(num1) == 3 and len(rest.split('-')[0]) == 4:
-            return match.group(0)  # 保持原样
-        
-        # 检查前面是否已经有丁目
-        if '丁目' not in prefix[-3:]:
-            return f"{prefix}{num1}丁目{rest}"
-        return match.group(0)
-    
-    addr = re.sub(r'([^\d丁目])(\d+)-(\d+[-\d]*)', add_chome, addr)
-    
-    return addr.strip()
+    return tokenize_address(address).normalized
 
 
+@_memoized
 def simplify_address(address: str):
     """
     逐步简化日本地址，生成多个候选地址
@@ -388,63 +493,7 @@ def simplify_address(address: str):
         "神奈川県横浜市鶴見区",
     ]
     """
-    # 先标准化地址
-    normalized = normalize_address(address)
-    candidates = []
-    
-    # 添加标准化后的地址
-    if normalized not in candidates:
-        candidates.append(normalized)
-    
-    # 如果原地址不同，也添加
-    if address != normalized and address not in candidates:
-        candidates.append(address)
-    
-    # 基于标准化地址生成简化版本
-    base_addr = normalized
-    
-    # 移除建筑物名称、楼层等
-    addr = re.sub(r'[　\s]+.*?(ビル|タワー|マンション|階|F).*$', '', base_addr)
-    if addr != base_addr and addr not in candidates:
-        candidates.append(addr)
-    
-    # 移除番地号（1番地等）
-    addr = re.sub(r'[0-9０-９]+番地?$', '', base_addr)
-    if addr != base_addr and addr not in candidates:
-        candidates.append(addr)
-    
-    # 移除最后的号码部分（-16、16号等）
-    addr = re.sub(r'[-−ー][0-9０-９]+号?$', '', base_addr)
-    if addr != base_addr and addr not in candidates:
-        candidates.append(addr)
-    
-    # 只保留到丁目+第一个号码（例如：4丁目6）
-    match = re.search(r'(.*?[0-9０-９]+丁目[0-9０-９]+)', base_addr)
-    if match:
-        addr = match.group(1)
-        if addr not in candidates:
-            candidates.append(addr)
-    
-    # 只保留到丁目
-    match = re.search(r'(.*?[0-9０-９]+丁目)', base_addr)
-    if match:
-        addr = match.group(1)
-        if addr not in candidates:
-            candidates.append(addr)
-    
-    # 移除丁目后的所有内容
-    addr = re.sub(r'[0-9０-９]+丁目.*$', '', base_addr)
-    if addr != base_addr and len(addr) > 5 and addr not in candidates:
-        candidates.append(addr)
-    
-    # 只保留到区/市/町/村
-    match = re.search(r'(.*?[都道府県][^市区町村]+[市区町村])', base_addr)
-    if match:
-        addr = match.group(1)
-        if addr not in candidates:
-            candidates.append(addr)
-    
-    return candidates
+    return list(tokenize_address(address).candidates)
 
 
 def extract_postal_code(address: str):
@@ -473,110 +522,114 @@ def extract_postal_code(address: str):
     return None
 
 
-def geocode_by_postal_code(postal_code: str, timeout=8):
+def _place_keys(name: str, romaji: str):
     """
-    使用邮编进行地理编码
-    优先使用 GSI API，备用 Nominatim
-    :param postal_code: 日本邮编（格式：XXX-XXXX）
-    :return: (lat, lng, japanese_address) 或 (None, None, None)
+    地名读音的比较键：去掉行政后缀，并在 市 / 郡 处拆开
+    例：横浜市鶴見区 / yokohamashitsurumiku → ["yokohamashitsurumi", "yokohama", "tsurumi"]
     """
-    # 方法1: 尝试 GSI API（日本国土地理院）
-    try:
-        gsi_url = "https://msearch.gsi.go.jp/address-search/AddressSearch"
-        resp = requests.get(gsi_url, params={"q": postal_code}, timeout=timeout)
-        resp.raise_for_status()
-        data = resp.json()
-        
-        if isinstance(data, list) and len(data) > 0:
-            feature = data[0]
-            if "geometry" in feature and "coordinates" in feature["geometry"]:
-                coord = feature["geometry"]["coordinates"]
-                lat = float(coord[1])
-                lng = float(coord[0])
-                
-                # 提取日文地址
-                japanese_address = None
-                if "properties" in feature:
-                    props = feature["properties"]
-                    # GSI 返回完整的日文地址
-                    if "title" in props:
-                        japanese_address = props["title"]
-                
-                if japanese_address:
-                    print(f"  GSI 邮编查询成功: {postal_code} → {japanese_address}")
-                    return lat, lng, japanese_address
-    except Exception as e:
-        print(f"  GSI 邮编查询失败: {e}")
+    key = strip_suffix(name, romaji_key(romaji))
+    keys = [key]
+    rest = key
+    for ch in name[:-1]:
+        if ch in "市郡":
+            head, sep, tail = rest.partition(SUFFIX_ROMAJI[ch][0])
+            if sep:
+                keys.append(head)
+                rest = tail
+    if rest != key:
+        keys.append(rest)
+    return [k for k in keys if len(k) >= 3]
+
+
+def match_postal_entry(entries, address: str, is_japanese: bool):
+    """
+    从离线邮编索引的条目中选出与地址地名一致的一条（町域一致优先于市区町村一致）
+    日文地址比较汉字，英文地址比较读音（如 FUKAEHAMA ↔ ﾌｶｴﾊﾏﾁｮｳ）
+    :param entries: lookup_postal_code() 的结果
+    :return: 条目；没有一致的条目返回 None
+    """
+    address_key = romaji_key(address)
+    best, best_score = None, 0
+    for entry in entries:
+        if is_japanese:
+            town_match = bool(entry["town"]) and entry["town"] in address
+            parts = [p for p in re.findall(r'[^市区郡]+(?:[市区郡]|$)', entry["city"]) if len(p) >= 2]
+            city_match = any(p in address for p in parts + [entry["city"]])
+        else:
+            town_match = bool(entry["town"]) and any(
+                k in address_key for k in _place_keys(entry["town"], entry["town_romaji"]))
+            city_match = any(k in address_key for k in _place_keys(entry["city"], entry["city_romaji"]))
+        score = 2 * town_match + city_match
+        if score > best_score:
+            best, best_score = entry, score
+    return best
+
+
+def postal_address(entry) -> str:
+    """邮编条目 → 日文地址（都道府県 + 市区町村 + 町域）"""
+    return f"{entry['prefecture']}{entry['city']}{entry['town']}"
+
+
+def _postal_area_check(entry):
+    """
+    GSI 结果的位置校验：须在邮编町域代表坐标附近（geocode.postal_index.max_distance_km）
+    :return: accept(lat, lng) -> bool；没有町域级坐标时返回 None（不校验）
+    """
+    if not entry or entry["level"] != "town":
+        return None
+    max_km = get_setting("geocode.postal_index.max_distance_km", 10)
+    return lambda lat, lng: haversine(lat, lng, entry["lat"], entry["lng"]) <= max_km
+
+
+def extract_street_number(address: str):
+    """
+    提取英文地址中的门牌号
+    :return: X-X-X 格式的门牌号（排除邮编）；或 "数字 地名" 格式中的数字（如 "2300 Moroto"）；没有返回 None
+    """
+    # 方法1: 提取 X-X-X 格式的门牌号
+    street_matches = re.findall(r'\b(\d{1,4}-\d{1,3}(?:-\d{1,3})?)\b', address)
+    for match in street_matches:
+        # 排除邮编格式（3位-4位）
+        if re.match(r'^\d{3}-\d{4}$', match):
+            continue
+        return match
     
-    # 方法2: 备用 Nominatim
-    try:
-        url = "https://nominatim.openstreetmap.org/search"
-        headers = {
-            "User-Agent": "FCL-Checker/1.0 (https://github.com/your-repo)",
-            "Accept-Language": "ja"
-        }
-        
-        # 尝试多种查询方式（必须限定在日本）
-        queries = [
-            {"q": f"{postal_code}, Japan", "countrycodes": "jp"},
-            {"postalcode": postal_code, "countrycodes": "jp"},
-        ]
-        
-        for params in queries:
-            params.update({"format": "json", "limit": 1, "addressdetails": 1})
-            
-            resp = requests.get(url, params=params, headers=headers, timeout=timeout)
-            resp.raise_for_status()
-            data = resp.json()
-            
-            if data and len(data) > 0:
-                result = data[0]
-                
-                # 验证是否在日本
-                if "address" in result:
-                    country = result["address"].get("country_code", "").upper()
-                    if country != "JP":
-                        print(f"  跳过非日本结果: {country}")
-                        continue
-                
-                lat = float(result["lat"])
-                lng = float(result["lon"])
-                
-                # 提取日文地址
-                japanese_address = None
-                if "address" in result:
-                    addr_parts = result["address"]
-                    parts = []
-                    
-                    # 构建日文地址（按日本地址格式）
-                    for key in ["state", "city", "town", "village", "city_district", "suburb", "neighbourhood", "quarter"]:
-                        if key in addr_parts:
-                            val = addr_parts[key]
-                            # 转换 ISO 代码为日文
-                            if key == "state" and val.startswith("JP-"):
-                                iso_map = {
-                                    "JP-31": "鳥取県", "JP-28": "兵庫県", "JP-13": "東京都",
-                                    "JP-27": "大阪府", "JP-26": "京都府", "JP-01": "北海道"
-                                }
-                                val = iso_map.get(val, val)
-                            parts.append(val)
-                    
-                    if parts:
-                        japanese_address = "".join(parts)
-                
-                if not japanese_address:
-                    japanese_address = result.get("display_name", None)
-                
-                if japanese_address:
-                    print(f"  Nominatim 邮编查询成功: {postal_code} → {japanese_address}")
-                    return lat, lng, japanese_address
-        
-        return None, None, None
-    except Exception as e:
-        print(f"  Nominatim 邮编查询失败: {e}")
-        return None, None, None
+    # 方法2: 如果没有找到 X-X 格式，尝试提取 "数字 地名" 格式中的数字
+    pure_number_match = re.search(r'\b(\d{1,4})\s+[A-Za-z]', address)
+    if pure_number_match:
+        return pure_number_match.group(1)
+    return None
+
+
+def postal_candidates(entry, original_address: str):
+    """
+    英文地址 → 邮编对应的日文候选地址（带门牌号 / 不带门牌号），用于 GSI 查询
+    """
+    base = postal_address(entry)
+    street_number = extract_street_number(original_address)
+    candidates = [f"{base}{street_number}"] if street_number else []
+    candidates.append(base)
+    return candidates
+
+
+@_memoized
+def romaji_candidates(address: str):
+    """
+    英文地址 → 罗马字地名词典解析出的日文候选地址（带门牌号 / 不带门牌号），用于 GSI 查询
+    :return: 候选列表；无法确定町域时返回 []（只有市区町村时 GSI 会返回市役所等的坐标，交给 Nominatim 按完整地址查询）
+    """
+    resolved = resolve_places(address)
+    if not resolved or not resolved[2]:
+        return []
+    pref, city, town = resolved
+    base = f"{pref}{city}{town}"
+    street_number = extract_street_number(address)
+    candidates = [f"{base}{street_number}"] if street_number else []
+    candidates.append(base)
+    return candidates
 
 
+@_memoized
 def simplify_english_address(address: str):
     """
     简化英文日本地址
@@ -798,6 +851,13 @@ def simplify_english_address(address: str):
     return candidates
 
 
+_STREET_NUMBER_RE = re.compile(r'\b(\d+)-(\d+)(?:-(\d+))?\b')
+# 数字到日文的映射；匹配模式：一丁目、二丁目、...、九丁目
+_CHOME_KANJI = {1: "一", 2: "二", 3: "三", 4: "四", 5: "五", 6: "六", 7: "七", 8: "八", 9: "九"}
+_KANJI_CHOME_RE = re.compile(r'[一二三四五六七八九]丁目')
+
+
+@_memoized
 def fix_chome_in_address(japanese_addr: str, original_english_addr: str) -> str:
     """
     修正日文地址中的丁目信息
@@ -806,10 +866,8 @@ def fix_chome_in_address(japanese_addr: str, original_english_addr: str) -> str:
     :param original_english_addr: 原始英文地址（如：2-15-2, Ginza）
     :return: 修正后的日文地址
     """
-    import re
-    
     # 提取英文地址中的门牌号（X-Y-Z 格式）
-    street_match = re.search(r'\b(\d+)-(\d+)(?:-(\d+))?\b', original_english_addr)
+    street_match = _STREET_NUMBER_RE.search(original_english_addr)
     if not street_match:
         return japanese_addr
     
@@ -819,20 +877,12 @@ def fix_chome_in_address(japanese_addr: str, original_english_addr: str) -> str:
     if len(first_num) == 1 and first_num.isdigit():
         chome_num = int(first_num)
         
-        # 数字到日文的映射
-        num_to_jp = {
-            1: "一", 2: "二", 3: "三", 4: "四", 5: "五",
-            6: "六", 7: "七", 8: "八", 9: "九"
-        }
-        
-        if chome_num in num_to_jp:
-            jp_chome = num_to_jp[chome_num]
+        if chome_num in _CHOME_KANJI:
+            jp_chome = _CHOME_KANJI[chome_num]
             
             # 替换日文地址中的丁目（如：四丁目 → 二丁目）
-            # 匹配模式：一丁目、二丁目、...、九丁目
-            chome_pattern = r'[一二三四五六七八九]丁目'
-            if re.search(chome_pattern, japanese_addr):
-                corrected_addr = re.sub(chome_pattern, f'{jp_chome}丁目', japanese_addr, count=1)
+            if _KANJI_CHOME_RE.search(japanese_addr):
+                corrected_addr = _KANJI_CHOME_RE.sub(f'{jp_chome}丁目', japanese_addr, count=1)
                 if corrected_addr != japanese_addr:
                     print(f"  修正丁目: {japanese_addr} → {corrected_addr}")
                     return corrected_addr
@@ -840,9 +890,103 @@ def fix_chome_in_address(japanese_addr: str, original_english_addr: str) -> str:
     return japanese_addr
 
 
+async def race_gsi_candidates_async(candidates, max_workers=None, accept=None):
+    """
+    并发查询 GSI 候选地址，按优先级顺序取第一个成功的结果
+    结果与逐个顺序查询完全一致：只有当所有更高优先级的候选都失败后，才采用后面的候选；
+    一旦确定结果，其余请求（排队中或进行中）会被取消
+    :param candidates: 候选地址列表（从详细到简略）
+    :param max_workers: 并发数上限（默认读取 geocode.gsi_max_workers）
+    :param accept: 结果校验函数 accept(lat, lng) -> bool（如邮编区域校验），不通过视为失败
+    :return: (lat, lng, used_address)；全部失败返回 (None, None, None)
+    """
+    if not candidates:
+        return None, None, None
+    max_workers = max_workers or get_setting("geocode.gsi_max_workers", 4)
+    semaphore = asyncio.Semaphore(min(max_workers, len(candidates)))
+
+    async def attempt(addr):
+        async with semaphore:
+            return await geocode_gsi_async(addr, 6)
+
+    # 子任务继承当前上下文，网络错误记录对 geocode_async() 可见
+    tasks = [asyncio.create_task(attempt(addr)) for addr in candidates]
+    try:
+        for i, (addr, task) in enumerate(zip(candidates, tasks), 1):
+            print(f"[GSI {i}/{len(candidates)}] {addr}")
+            lat, lng = await task
+            if lat and lng and (accept is None or accept(lat, lng)):
+                return lat, lng, addr
+            if lat and lng:
+                print(f"  ✗ 结果不在邮编区域内，跳过")
+        return None, None, None
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def race_gsi_candidates(candidates, max_workers=None, accept=None):
+    """同步版本（见 race_gsi_candidates_async）"""
+    return run_sync(race_gsi_candidates_async(candidates, max_workers, accept))
+
+
+async def geocode_async(address: str):
+    """
+    智能地理编码（带持久化缓存）
+    以 normalize_address 的结果为键：命中成功缓存直接返回；命中负向缓存说明该地址
+    之前已确认无法解析，直接返回失败，不再重复走 GSI → Nominatim 的网络降级流程
+    :param address: 地址字符串（日文或英文）
+    :return: (lat, lng, used_address) 元组；若失败，返回 (None, None, None)
+    """
+    if not get_setting("geocode_cache.enabled", True):
+        return await _geocode_uncached_async(address)
+
+    cache_key = normalize_address(address)
+    # SQLite 读写在线程池中执行，不阻塞共享事件循环
+    cached = await asyncio.to_thread(GEOCODE_CACHE.get, cache_key)
+    if cached:
+        print(f"[缓存命中] {address}")
+        return cached[0], cached[1], cached[2]
+    if await asyncio.to_thread(GEOCODE_NEGATIVE_CACHE.get, cache_key):
+        print(f"[负向缓存命中] {address}")
+        return None, None, None
+
+    errors = []
+    token = _network_errors.set(errors)
+    try:
+        lat, lng, used_address = await _geocode_uncached_async(address)
+    finally:
+        _network_errors.reset(token)
+
+    if lat and lng:
+        await asyncio.to_thread(GEOCODE_CACHE.set, cache_key, [lat, lng, used_address])
+    elif not errors:
+        # 所有服务都正常响应但都没有结果 → 确认无法解析
+        await asyncio.to_thread(GEOCODE_NEGATIVE_CACHE.set, cache_key, True)
+    return lat, lng, used_address
+
+
 def geocode(address: str):
+    """同步版本（见 geocode_async）"""
+    return run_sync(geocode_async(address))
+
+
+def geocode_cache_stats():
+    """
+    地理编码缓存命中统计
+    :return: {"positive": {...}, "negative": {...}, "coalesced": {...}, "memo": {...}}
     """
-    智能地理编码：优先邮编，然后 GSI，支持地址降级策略
+    return {
+        "positive": GEOCODE_CACHE.stats(),
+        "negative": GEOCODE_NEGATIVE_CACHE.stats(),
+        "coalesced": GEOCODE_FLIGHTS.stats(),
+        "memo": memo_stats(),
+    }
+
+
+async def _geocode_uncached_async(address: str):
+    """
+    智能地理编码：离线邮编索引校验 / 兜底，本地地址索引，GSI，然后 Nominatim，支持地址降级策略
     如果详细地址找不到，自动尝试简化版本
     :param address: 地址字符串（日文或英文）
     :return: (lat, lng, used_address) 元组；若失败，返回 (None, None, None)
@@ -850,147 +994,91 @@ def geocode(address: str):
     """
     original_address = address
     
-    # 策略0: 检测邮编但不单独使用，而是结合地址信息
-    postal_code = extract_postal_code(address)
-    postal_result = None
-    
-    # 如果有邮编，优先尝试"地址 + 邮编"的组合查询
-    # 而不是单独使用邮编（避免邮编数据库错误）
-    if postal_code and False:  # 暂时禁用单独邮编查询
-        print(f"检测到邮编: {postal_code}")
-        lat, lng, japanese_addr = geocode_by_postal_code(postal_code, timeout=6)
-        if lat and lng:
-            # 尝试使用反向地理编码获取更完整的地址
-            reverse_addr = reverse_geocode_nominatim(lat, lng, timeout=6)
-            if reverse_addr and len(reverse_addr) > len(japanese_addr or ""):
-                japanese_addr = reverse_addr
-                
-                # 去除重复的町名（如：深江浜町深江浜町 → 深江浜町）
-                # 查找重复的町名模式
-                japanese_addr = re.sub(r'([^市区町村]{2,}町)\1', r'\1', japanese_addr)
-                
-                print(f"  使用反向地理编码获取完整地址: {japanese_addr}")
-            
-            # 验证邮编结果是否合理：检查地址中的地名是否匹配
-            # 提取原地址中的主要地名（城市、区等）
-            address_upper = address.upper()
-            location_keywords = []
-            
-            # 提取可能的地名关键词
-            for part in address.split(','):
-                part = part.strip().upper()
-                # 跳过邮编、门牌号、国家名
-                if re.search(r'\d{3}-?\d{4}|^\d+-\d+|JAPAN', part):
-                    continue
-                # 移除 NO., -KU, -MACHI 等后缀
-                part = re.sub(r'\bNO\.\s*|\b-?(KU|MACHI|CHO|SHI|GUN)\b', '', part).strip()
-                if len(part) > 2:
-                    location_keywords.append(part)
-            
-            # 检查日文地址是否包含这些关键词的日文翻译
-            # 简单验证：如果原地址包含 TOTTORI，日文地址应该包含 鳥取
-            location_map = {
-                # 都道府県
-                'TOTTORI': '鳥取', 'CHIBA': '千葉', 'TOKYO': '東京', 'OSAKA': '大阪',
-                'KYOTO': '京都', 'KANAGAWA': '神奈川', 'AICHI': '愛知', 'HYOGO': '兵庫',
-                'FUKUOKA': '福岡', 'HOKKAIDO': '北海道', 'MIYAGI': '宮城',
-                # 市区町村
-                'KOBE': '神戸', 'YOKOHAMA': '横浜', 'NAGOYA': '名古屋',
-                'INZAI': '印西', 'SHIRAI': '白井', 'FUNABASHI': '船橋',
-                'DAISEN': '大山', 'SAIHAKU': '西伯', 'HIGASHINADA': '東灘',
-                # 町名
-                'FUKAEHAMA': '深江浜', 'MOROTO': '師戸'
-            }
-            
-            is_valid = False
-            for keyword in location_keywords:
-                if keyword in location_map:
-                    japanese_keyword = location_map[keyword]
-                    if japanese_keyword in (japanese_addr or ''):
-                        is_valid = True
-                        break
-            
-            # 如果没有找到匹配的关键词，可能是邮编查询返回了错误位置
-            if not is_valid and location_keywords:
-                print(f"  ⚠️ 邮编查询结果可能不准确（地名不匹配），将尝试完整地址查询")
-                postal_result = None  # 不使用邮编结果
-            else:
-                # 如果地址中有门牌号，尝试添加到日文地址中（排除邮编）
-                if japanese_addr:
-                    street_matches = re.findall(r'\b(\d{1,4}-\d{1,3}(?:-\d{1,3})?)\b', address)
-                    for street_number in street_matches:
-                        # 排除邮编格式（3位-4位）
-                        if re.match(r'^\d{3}-\d{4}$', street_number):
-                            continue
-                        # 检查日文地址中是否已经包含门牌号
-                        if street_number not in japanese_addr:
-                            # 将门牌号添加到日文地址末尾
-                            japanese_addr = f"{japanese_addr}{street_number}"
-                            print(f"  添加门牌号: {street_number}")
-                            break
-                
-                print(f"  ✓ 邮编查询成功")
-                postal_result = (lat, lng, japanese_addr if japanese_addr else original_address)
-        
-        time.sleep(0.3)
-    
-    # 如果邮编查询成功且验证通过，直接返回
-    if postal_result:
-        return postal_result
-    
     # 检查是否为日文地址
     is_japanese = any('\u3040' <= c <= '\u309F' or  # 平假名
                      '\u30A0' <= c <= '\u30FF' or  # 片假名
                      '\u4E00' <= c <= '\u9FFF'     # 汉字
                      for c in address)
     
+    # 策略0: 离线邮编索引（KEN_ALL，无网络请求）
+    # 只采用地名与地址一致的条目：GSI 结果须在邮编区域附近；英文地址先按邮编对应的日文地址查询 GSI；
+    # 所有在线查询都失败时才使用邮编町域的代表坐标
+    postal = None
+    postal_code = extract_postal_code(address)
+    if postal_code:
+        entries = lookup_postal_code(postal_code)
+        postal = match_postal_entry(entries, address, is_japanese)
+        if postal:
+            print(f"检测到邮编: {postal_code} → {postal_address(postal)}")
+        elif entries:
+            print(f"  ⚠️ 邮编 {postal_code} 与地址中的地名不一致，不使用邮编数据")
+    accept = _postal_area_check(postal)
+    
     # 生成地址候选列表（从详细到简略）
     if is_japanese:
         address_candidates = simplify_address(address)
         print(f"日文地址候选: {len(address_candidates)} 个")
+        gsi_candidates = address_candidates
     else:
         address_candidates = simplify_english_address(address)
         print(f"英文地址候选: {len(address_candidates)} 个")
+        # 有一致的邮编时按邮编对应的日文地址，否则按罗马字地名词典解析
+        gsi_candidates = postal_candidates(postal, original_address) if postal else romaji_candidates(original_address)
+        if gsi_candidates and not postal:
+            print(f"罗马字地名: {gsi_candidates[-1]}")
     
-    # 策略1: 逐级尝试 GSI（日本国土地理院，仅日文）
-    if is_japanese:
-        for i, addr in enumerate(address_candidates, 1):
-            print(f"[GSI {i}/{len(address_candidates)}] {addr}")
-            lat, lng = geocode_gsi(addr, timeout=6)
-            if lat and lng:
+    # 策略1: 本地地址索引（离线，无网络请求），与 GSI 使用相同的候选地址和降级顺序
+    # 只接受町域 / 丁目 / 街区级的记录（不使用市区町村中心）；本地命中的候选之前、更详细的候选仍先查询 GSI，
+    # 粗略的本地结果不会抢在详细的 GSI 结果之前
+    local_hit = None
+    local_index = get_address_index()
+    if local_index and gsi_candidates:
+        with timer("geocode_local"):
+            for i, addr in enumerate(gsi_candidates):
+                point = local_index.lookup(addr, allow_city=False)
+                if point and (accept is None or accept(*point)):
+                    local_hit = point[0], point[1], addr
+                    gsi_candidates = gsi_candidates[:i]
+                    print(f"[本地地址索引] ✓ {addr}")
+                    break
+    
+    # 策略2: 逐级尝试 GSI（日本国土地理院，仅日文；英文地址使用邮编 / 罗马字地名词典对应的日文地址）
+    if gsi_candidates and get_setting("geocode.concurrent_candidates", True):
+        lat, lng, addr = await race_gsi_candidates_async(gsi_candidates, accept=accept)
+        if lat and lng:
+            if addr != original_address:
+                print(f"  ✓ 使用简化地址成功: {addr}")
+            else:
+                print(f"  ✓ 成功")
+            return lat, lng, addr
+    elif gsi_candidates:
+        for i, addr in enumerate(gsi_candidates, 1):
+            print(f"[GSI {i}/{len(gsi_candidates)}] {addr}")
+            lat, lng = await geocode_gsi_async(addr, timeout=6)
+            if lat and lng and (accept is None or accept(lat, lng)):
                 if addr != original_address:
                     print(f"  ✓ 使用简化地址成功: {addr}")
                 else:
                     print(f"  ✓ 成功")
                 return lat, lng, addr
-            time.sleep(0.2)
+            if lat and lng:
+                print(f"  ✗ 结果不在邮编 {postal_code} 的区域内，跳过")
+    
+    # 更详细的候选 GSI 都失败：使用本地地址索引的结果
+    if local_hit:
+        return local_hit
     
-    # 策略2: 逐级尝试 Nominatim（所有候选地址）
+    # 策略3: 逐级尝试 Nominatim（所有候选地址）
     for i, addr in enumerate(address_candidates, 1):
         print(f"[Nominatim {i}/{len(address_candidates)}] {addr}")
-        lat, lng, japanese_addr = geocode_nominatim(addr, country_code="jp", timeout=6)
+        lat, lng, japanese_addr = await geocode_nominatim_async(addr, country_code="jp", timeout=6)
         if lat and lng:
             # 如果输入是英文，返回日文地址；如果输入是日文，返回简化后的地址
             used_address = japanese_addr if (japanese_addr and not is_japanese) else addr
             
             # 如果是英文地址且有日文地址，尝试添加门牌号（排除邮编）
             if not is_japanese and japanese_addr:
-                street_number = None
-                
-                # 方法1: 提取 X-X-X 格式的门牌号
-                street_matches = re.findall(r'\b(\d{1,4}-\d{1,3}(?:-\d{1,3})?)\b', original_address)
-                for match in street_matches:
-                    # 排除邮编格式（3位-4位）
-                    if re.match(r'^\d{3}-\d{4}$', match):
-                        continue
-                    street_number = match
-                    break
-                
-                # 方法2: 如果没有找到 X-X 格式，尝试提取 "数字 地名" 格式中的数字（如 "2300 Moroto"）
-                if not street_number:
-                    pure_number_match = re.search(r'\b(\d{1,4})\s+[A-Za-z]', original_address)
-                    if pure_number_match:
-                        street_number = pure_number_match.group(1)
+                street_number = extract_street_number(original_address)
                 
                 # 修正丁目信息（如果需要）
                 japanese_addr = fix_chome_in_address(japanese_addr, original_address)
@@ -1007,11 +1095,11 @@ def geocode(address: str):
             else:
                 print(f"  ✓ 成功")
             return lat, lng, used_address
-        time.sleep(0.3)
+        # Nominatim 请求间隔由共享限流器控制（utils/http_client.py）
     
-    # 策略3: Nominatim 全球搜索（最后尝试）
+    # 策略4: Nominatim 全球搜索
     print(f"[Nominatim 全球] {original_address}")
-    lat, lng, japanese_addr = geocode_nominatim(original_address, country_code=None, timeout=6)
+    lat, lng, japanese_addr = await geocode_nominatim_async(original_address, country_code=None, timeout=6)
     if lat and lng:
         print(f"  ✓ Nominatim 全球成功")
         # 如果输入是英文且获取到日文地址，返回日文地址
@@ -1022,22 +1110,7 @@ def geocode(address: str):
             # 修正丁目信息
             japanese_addr = fix_chome_in_address(japanese_addr, original_address)
             
-            street_number = None
-            
-            # 方法1: 提取 X-X-X 格式的门牌号
-            street_matches = re.findall(r'\b(\d{1,4}-\d{1,3}(?:-\d{1,3})?)\b', original_address)
-            for match in street_matches:
-                # 排除邮编格式（3位-4位）
-                if re.match(r'^\d{3}-\d{4}$', match):
-                    continue
-                street_number = match
-                break
-            
-            # 方法2: 如果没有找到 X-X 格式，尝试提取 "数字 地名" 格式中的数字（如 "2300 Moroto"）
-            if not street_number:
-                pure_number_match = re.search(r'\b(\d{1,4})\s+[A-Za-z]', original_address)
-                if pure_number_match:
-                    street_number = pure_number_match.group(1)
+            street_number = extract_street_number(original_address)
             
             # 添加门牌号到日文地址
             if street_number and street_number not in japanese_addr:
@@ -1046,5 +1119,14 @@ def geocode(address: str):
         
         return lat, lng, used_address
     
+    # 策略5: 邮编町域的代表坐标（离线，无网络请求；市区町村级的条目只有市区町村中心，不作为地址坐标）
+    if postal and postal["level"] == "town" and postal["lat"] is not None:
+        used_address = postal_address(postal)
+        street_number = None if is_japanese else extract_street_number(original_address)
+        if street_number:
+            used_address = f"{used_address}{street_number}"
+        print(f"  ✓ 使用邮编町域代表坐标: {used_address}")
+        return postal["lat"], postal["lng"], used_address
+    
     print(f"  ✗ 所有尝试失败: {original_address}")
     return None, None, None
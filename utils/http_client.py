@@ -0,0 +1,65 @@
+# utils/http_client.py
+# 功能：外部 API 客户端的共享配置（GSI / Nominatim / Overpass / OSRM 共用，客户端见 utils/async_http.py）
+# - host → 服务名，每个服务独立的令牌桶限流（utils/ratelimit.py）和并发上限
+# - 连接池大小、连接失败 / 429 / 5xx 时带随机抖动的指数退避重试
+
+import random
+from urllib.parse import urlparse
+
+from utils.settings import get_setting
+
+# 所有外部请求的 User-Agent（Nominatim / Overpass 使用政策要求能识别应用，部署时在 http.user_agent 中加入联系方式）
+USER_AGENT = get_setting("http.user_agent", "jp-fcl-checker/1.0")
+
+# host → 服务名（限流、并发配置按服务名查找，可在 http.services 中覆盖）
+DEFAULT_SERVICES = {
+    "msearch.gsi.go.jp": "gsi",
+    "nominatim.openstreetmap.org": "nominatim",
+    "overpass-api.de": "overpass",
+    "router.project-osrm.org": "osrm",
+}
+
+# 每个服务同时进行的请求数上限
+DEFAULT_MAX_CONCURRENCY = {
+    "gsi": 4,
+    "nominatim": 1,
+    "overpass": 2,
+    "osrm": 4,
+    "default": 8,
+}
+
+# 需要重试的 HTTP 状态码
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+class HttpConfig:
+    """
+    外部 API 客户端的配置（服务名、并发上限、连接池、重试与退避）
+    """
+
+    def __init__(self):
+        self.services = {**DEFAULT_SERVICES, **get_setting("http.services", {})}
+        self.max_concurrency = {**DEFAULT_MAX_CONCURRENCY, **get_setting("http.max_concurrency", {})}
+        self.pool_maxsize = get_setting("http.pool_maxsize", 10)
+        self.max_retries = get_setting("http.max_retries", 2)
+        self.backoff_base = get_setting("http.backoff_base", 0.5)
+        self.backoff_max = get_setting("http.backoff_max", 8.0)
+
+    def service_name(self, url: str):
+        host = urlparse(url).hostname or ""
+        return self.services.get(host, host)
+
+    def concurrency_limit(self, service):
+        """服务同时进行的请求数上限"""
+        return self.max_concurrency.get(service, self.max_concurrency["default"])
+
+    def backoff_delay(self, attempt: int, resp=None):
+        """
+        计算第 attempt 次重试前的等待时间（指数退避 + 随机抖动，优先遵守 Retry-After）
+        """
+        if resp is not None:
+            retry_after = resp.headers.get("Retry-After")
+            if retry_after and retry_after.isdigit():
+                return min(float(retry_after), self.backoff_max)
+        delay = min(self.backoff_base * (2 ** attempt), self.backoff_max)
+        return random.uniform(0, delay)
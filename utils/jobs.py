@@ -0,0 +1,291 @@
+# utils/jobs.py
+# 功能：大批量地址的异步检查任务（任务 ID + 轮询）
+# 任务和每个地址的结果保存在本地 SQLite（默认 <cache_dir>/jobs.sqlite3），
+# 进程重启后可继续未完成的任务（已完成的地址不重复处理）
+# 多个进程共用同一文件时，任务通过条件 UPDATE 认领并持有租约（心跳续期），同一任务同时只由一个进程执行
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.settings import get_cache_dir, get_setting
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobStore:
+    """
+    任务持久化（SQLite，每个线程独立连接）
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_cache_dir(), "jobs.sqlite3")
+        self._local = threading.local()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, status TEXT NOT NULL, options TEXT NOT NULL,"
+                " total INTEGER NOT NULL, completed INTEGER NOT NULL DEFAULT 0,"
+                " error TEXT, created REAL NOT NULL, updated REAL NOT NULL,"
+                " owner TEXT, lease_until REAL)"
+            )
+            # 旧版本创建的表没有租约列
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_items ("
+                " job_id TEXT NOT NULL, idx INTEGER NOT NULL, address TEXT NOT NULL, result TEXT,"
+                " PRIMARY KEY (job_id, idx))"
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def create(self, addresses, options):
+        """
+        创建任务
+        :return: 任务 ID
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO jobs (id, status, options, total, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, QUEUED, json.dumps(options), len(addresses), now, now),
+        )
+        conn.executemany(
+            "INSERT INTO job_items (job_id, idx, address) VALUES (?, ?, ?)",
+            [(job_id, i, addr) for i, addr in enumerate(addresses)],
+        )
+        conn.commit()
+        return job_id
+
+    def get(self, job_id):
+        """
+        任务信息
+        :return: dict 或 None（任务不存在）
+        """
+        row = self._connect().execute(
+            "SELECT id, status, options, total, completed, error, created, updated FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if not row:
+            return None
+        return {
+            "job_id": row[0], "status": row[1], "options": json.loads(row[2]),
+            "total": row[3], "completed": row[4], "error": row[5],
+            "created": row[6], "updated": row[7],
+        }
+
+    def results(self, job_id, offset=0, limit=100):
+        """
+        分页读取已完成的结果
+        :return: [{"index", "address", "result"}, ...]（未完成的地址 result 为 None）
+        """
+        rows = self._connect().execute(
+            "SELECT idx, address, result FROM job_items WHERE job_id = ? AND idx >= ? ORDER BY idx LIMIT ?",
+            (job_id, offset, limit),
+        ).fetchall()
+        return [
+            {"index": idx, "address": addr, "result": json.loads(result) if result else None}
+            for idx, addr, result in rows
+        ]
+
+    def pending_items(self, job_id):
+        """未处理的地址 [(序号, 地址), ...]"""
+        return self._connect().execute(
+            "SELECT idx, address FROM job_items WHERE job_id = ? AND result IS NULL ORDER BY idx",
+            (job_id,),
+        ).fetchall()
+
+    def claim(self, job_id, owner, lease):
+        """
+        认领任务（排队中，或执行中但租约已过期——原执行进程已退出）
+        :param owner: 执行方标识
+        :param lease: 租约时长（秒）
+        :return: 是否认领成功（其他进程正在执行时为 False）
+        """
+        now = time.time()
+        conn = self._connect()
+        cur = conn.execute(
+            "UPDATE jobs SET status = ?, owner = ?, lease_until = ?, updated = ?"
+            " WHERE id = ? AND (status = ? OR (status = ? AND (lease_until IS NULL OR lease_until < ?)))",
+            (RUNNING, owner, now + lease, now, job_id, QUEUED, RUNNING, now),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+
+    def renew(self, job_id, owner, lease):
+        """
+        续期租约（心跳）
+        :return: 是否仍持有任务（租约已被其他进程接管时为 False）
+        """
+        conn = self._connect()
+        cur = conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND owner = ? AND status = ?",
+            (time.time() + lease, job_id, owner, RUNNING),
+        )
+        conn.commit()
+        return cur.rowcount == 1
+
+    def save_results(self, job_id, items, owner, lease):
+        """
+        保存一批结果、更新进度并续期租约
+        :param items: [(序号, 结果 dict), ...]
+        :return: 是否保存（已不再持有任务时不保存，返回 False）
+        """
+        conn = self._connect()
+        now = time.time()
+        cur = conn.execute(
+            "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND owner = ? AND status = ?",
+            (now + lease, now, job_id, owner, RUNNING),
+        )
+        if cur.rowcount != 1:
+            conn.rollback()
+            return False
+        conn.executemany(
+            "UPDATE job_items SET result = ? WHERE job_id = ? AND idx = ?",
+            [(json.dumps(result, ensure_ascii=False), job_id, idx) for idx, result in items],
+        )
+        conn.execute(
+            "UPDATE jobs SET completed = (SELECT COUNT(*) FROM job_items WHERE job_id = ? AND result IS NOT NULL)"
+            " WHERE id = ?",
+            (job_id, job_id),
+        )
+        conn.commit()
+        return True
+
+    def finish(self, job_id, owner, status, error=None):
+        """结束任务（只有持有任务的执行方可以结束）"""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, lease_until = NULL, updated = ? WHERE id = ? AND owner = ?",
+            (status, error, time.time(), job_id, owner),
+        )
+        conn.commit()
+
+    def unfinished(self):
+        """未完成的任务 ID（按创建时间）"""
+        rows = self._connect().execute(
+            "SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created", (QUEUED, RUNNING)
+        ).fetchall()
+        return [row[0] for row in rows]
+
+
+class JobManager:
+    """
+    任务执行：固定数量的工作线程，每个任务按小批量调用 process 处理
+    """
+
+    def __init__(self, process, store=None, max_workers=None, chunk_size=None, lease=None):
+        """
+        :param process: 处理一批地址的函数 process(addresses, options) → 与 addresses 顺序一致的结果列表
+                        （单个地址出错时应返回该地址的错误结果，抛出异常时整个任务标记为失败）
+        :param store: JobStore
+        :param max_workers: 同时执行的任务数（jobs.max_workers）
+        :param chunk_size: 每批处理的地址数（jobs.chunk_size），每批完成后保存进度
+        :param lease: 任务租约时长（秒，jobs.lease_seconds）；执行中每 1/3 租约续期一次，进程退出后租约过期才可被其他进程接管
+        """
+        self.process = process
+        self.store = store or JobStore()
+        self.chunk_size = chunk_size or get_setting("jobs.chunk_size", 20)
+        self.lease = lease or get_setting("jobs.lease_seconds", 120)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or get_setting("jobs.max_workers", 2),
+            thread_name_prefix="fcl-job",
+        )
+        self._submitted = set()
+        self._running = set()  # 本进程持有租约的任务
+        self._lock = threading.Lock()
+        self._heartbeat = None
+
+    def submit(self, addresses, options):
+        """
+        创建并开始执行任务
+        :return: 任务 ID
+        """
+        job_id = self.store.create(addresses, options)
+        self._schedule(job_id)
+        return job_id
+
+    def resume(self):
+        """
+        继续执行未完成的任务（由启动钩子显式调用；其他进程正在执行（租约有效）的任务会被跳过）
+        :return: 安排执行的任务数
+        """
+        job_ids = self.store.unfinished()
+        for job_id in job_ids:
+            self._schedule(job_id)
+        if job_ids:
+            print(f"检查未完成的任务: {len(job_ids)} 个")
+        return len(job_ids)
+
+    def _schedule(self, job_id):
+        with self._lock:
+            if job_id in self._submitted:
+                return
+            self._submitted.add(job_id)
+        self.executor.submit(self._run, job_id)
+
+    def _start_heartbeat(self):
+        with self._lock:
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._renew_leases, name="fcl-job-heartbeat", daemon=True)
+                self._heartbeat.start()
+
+    def _renew_leases(self):
+        while True:
+            time.sleep(self.lease / 3)
+            with self._lock:
+                job_ids = list(self._running)
+            for job_id in job_ids:
+                try:
+                    if not self.store.renew(job_id, self.owner, self.lease):
+                        print(f"任务 {job_id} 的租约已被其他进程接管")
+                except sqlite3.Error as e:
+                    print(f"任务 {job_id} 租约续期失败: {e}")
+
+    def _run(self, job_id):
+        try:
+            if not self.store.claim(job_id, self.owner, self.lease):
+                return  # 其他进程正在执行或任务已结束
+            with self._lock:
+                self._running.add(job_id)
+            self._start_heartbeat()
+            job = self.store.get(job_id)
+            pending = self.store.pending_items(job_id)
+            for start in range(0, len(pending), self.chunk_size):
+                chunk = pending[start:start + self.chunk_size]
+                results = self.process([addr for _, addr in chunk], job["options"])
+                if not self.store.save_results(job_id, [(idx, result) for (idx, _), result in zip(chunk, results)],
+                                               self.owner, self.lease):
+                    print(f"任务 {job_id} 已由其他进程执行，停止处理")
+                    return
+            self.store.finish(job_id, self.owner, DONE)
+        except Exception as e:
+            # 单个地址的错误由 process 记录为该地址的结果；这里只有存储等基础设施错误
+            print(f"任务 {job_id} 执行失败: {traceback.format_exc()}")
+            self.store.finish(job_id, self.owner, FAILED, str(e))
+        finally:
+            with self._lock:
+                self._submitted.discard(job_id)
+                self._running.discard(job_id)
@@ -0,0 +1,75 @@
+# utils/keyword_matcher.py
+# 功能：多模式关键词匹配（Aho-Corasick 自动机）
+# 所有分类的关键词编译为一个自动机，对地址只扫描一遍即可得到命中的全部分类，
+# 不再对每个关键词列表分别做 any(keyword in text ...)
+
+from collections import deque
+
+# 只折叠 ASCII 字母（与 str.upper() 不同，不改变日文和全角字符）
+_ASCII_UPPER = str.maketrans("abcdefghijklmnopqrstuvwxyz", "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+
+class KeywordMatcher:
+    """
+    关键词分类匹配器（构建一次，可在多线程中共享）
+    :param keywords: {分类: [关键词, ...]}，同一关键词可属于多个分类
+    :param ignore_ascii_case: 是否忽略 ASCII 字母大小写（FACTORY / factory 视为相同）
+    """
+
+    def __init__(self, keywords, ignore_ascii_case=True):
+        self.ignore_ascii_case = ignore_ascii_case
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [frozenset()]
+
+        # 1. 构建关键词前缀树
+        outputs = [set()]
+        for category, words in keywords.items():
+            for word in words:
+                if ignore_ascii_case:
+                    word = word.translate(_ASCII_UPPER)
+                state = 0
+                for ch in word:
+                    nxt = self._goto[state].get(ch)
+                    if nxt is None:
+                        nxt = len(self._goto)
+                        self._goto[state][ch] = nxt
+                        self._goto.append({})
+                        self._fail.append(0)
+                        outputs.append(set())
+                    state = nxt
+                outputs[state].add(category)
+
+        # 2. 按层次（BFS）计算失败指针，并合并后缀关键词的分类
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                outputs[nxt] |= outputs[self._fail[nxt]]
+                queue.append(nxt)
+        self._out = [frozenset(o) for o in outputs]
+
+    def match(self, text):
+        """
+        扫描文本一次，返回命中的所有分类
+        :param text: 待匹配文本（如完整地址）
+        :return: 分类集合 set
+        """
+        if self.ignore_ascii_case:
+            text = text.translate(_ASCII_UPPER)
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for ch in text:
+            nxt = goto[state].get(ch)
+            while nxt is None and state:
+                state = fail[state]
+                nxt = goto[state].get(ch)
+            state = nxt or 0
+            if out[state]:
+                found |= out[state]
+        return found
@@ -0,0 +1,206 @@
+# utils/offline_roads.py
+# 功能：离线道路数据后端（不依赖 Overpass API）
+# 从本地 OSM 日本数据（由 scripts/build_road_index.py 预先转换）读取 highway 道路，
+# 通过网格空间索引回答半径查询，返回与 Overpass 相同格式的 way 元素
+#
+# 文件格式（.fclroads，小端序）：
+#   b"FCLROADS" + uint32 版本号
+#   uint32 头部长度 + 头部 JSON {"ways", "coords", "cells", "cell_size", "strings"}
+#   int64[ways]          way id
+#   uint32[ways + 1]     每条道路在坐标数组中的起始位置
+#   uint32[ways * 4]     标签（highway / width / lanes / name）在字符串表中的下标，缺失为 0xFFFFFFFF
+#   int32[coords * 2]    坐标（lat, lng 交替，单位 1e-7 度）
+#   int64[cells]         网格编号（升序）
+#   uint32[cells + 1]    每个网格在道路列表中的起始位置
+#   uint32[...]          网格内的道路下标
+
+import json
+import math
+import os
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_left
+
+from utils.settings import get_setting
+
+MAGIC = b"FCLROADS"
+VERSION = 1
+TAG_KEYS = ["highway", "width", "lanes", "name"]
+MISSING = 0xFFFFFFFF
+COORD_SCALE = 1e7
+# 网格编号 = 行号 * CELL_STRIDE + 列号
+CELL_STRIDE = 1 << 20
+
+
+def cell_of(lat, lng, cell_size):
+    return int(math.floor(lat / cell_size)), int(math.floor(lng / cell_size))
+
+
+def _read_array(f, typecode, count):
+    arr = array(typecode)
+    arr.frombytes(f.read(arr.itemsize * count))
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def _write_array(f, arr):
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    f.write(arr.tobytes())
+
+
+def write_road_index(path, ways, cell_size=0.01):
+    """
+    写入离线道路索引文件
+    :param path: 输出文件路径
+    :param ways: 可迭代对象 [(way_id, tags, [(lat, lng), ...]), ...]
+    :param cell_size: 网格大小（度）
+    :return: 写入的道路条数
+    """
+    strings = {}
+    ids = array("q")
+    offsets = array("I", [0])
+    tag_idx = array("I")
+    coords = array("i")
+    cells = {}
+
+    for way_id, tags, points in ways:
+        if len(points) < 1:
+            continue
+        index = len(ids)
+        ids.append(way_id)
+        for key in TAG_KEYS:
+            value = tags.get(key)
+            if value is None and key == "name":
+                value = tags.get("name:ja")
+            if value is None:
+                tag_idx.append(MISSING)
+            else:
+                tag_idx.append(strings.setdefault(value, len(strings)))
+        for lat, lng in points:
+            coords.append(int(round(lat * COORD_SCALE)))
+            coords.append(int(round(lng * COORD_SCALE)))
+        offsets.append(len(coords) // 2)
+
+        # 按线段外接矩形登记到所有经过的网格
+        touched = set()
+        segments = zip(points, points[1:]) if len(points) > 1 else [(points[0], points[0])]
+        for (lat1, lng1), (lat2, lng2) in segments:
+            r1, c1 = cell_of(min(lat1, lat2), min(lng1, lng2), cell_size)
+            r2, c2 = cell_of(max(lat1, lat2), max(lng1, lng2), cell_size)
+            for r in range(r1, r2 + 1):
+                for c in range(c1, c2 + 1):
+                    touched.add(r * CELL_STRIDE + c)
+        for key in touched:
+            cells.setdefault(key, []).append(index)
+
+    cell_keys = array("q", sorted(cells))
+    cell_offsets = array("I", [0])
+    cell_ways = array("I")
+    for key in cell_keys:
+        cell_ways.extend(cells[key])
+        cell_offsets.append(len(cell_ways))
+
+    header = json.dumps({
+        "ways": len(ids),
+        "coords": len(coords) // 2,
+        "cells": len(cell_keys),
+        "cell_ways": len(cell_ways),
+        "cell_size": cell_size,
+        "strings": sorted(strings, key=strings.get),
+    }, ensure_ascii=False).encode("utf-8")
+
+    with open(path, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", VERSION))
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for arr in (ids, offsets, tag_idx, coords, cell_keys, cell_offsets, cell_ways):
+            _write_array(f, arr)
+    return len(ids)
+
+
+class OfflineRoadIndex:
+    """
+    内存中的离线道路索引（网格空间索引）
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            magic = f.read(len(MAGIC))
+            version = struct.unpack("<I", f.read(4))[0]
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"不支持的道路索引文件: {path}")
+            header_len = struct.unpack("<I", f.read(4))[0]
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            n_ways = header["ways"]
+            self.cell_size = header["cell_size"]
+            self.strings = header["strings"]
+            self.ids = _read_array(f, "q", n_ways)
+            self.offsets = _read_array(f, "I", n_ways + 1)
+            self.tag_idx = _read_array(f, "I", n_ways * len(TAG_KEYS))
+            self.coords = _read_array(f, "i", header["coords"] * 2)
+            self.cell_keys = _read_array(f, "q", header["cells"])
+            self.cell_offsets = _read_array(f, "I", header["cells"] + 1)
+            self.cell_ways = _read_array(f, "I", header["cell_ways"])
+        print(f"离线道路索引已加载: {n_ways} 条道路（{path}）")
+
+    def element(self, index):
+        """第 index 条道路 → Overpass 格式的 way 元素"""
+        tags = {}
+        base = index * len(TAG_KEYS)
+        for i, key in enumerate(TAG_KEYS):
+            string_index = self.tag_idx[base + i]
+            if string_index != MISSING:
+                tags[key] = self.strings[string_index]
+        start, end = self.offsets[index], self.offsets[index + 1]
+        geometry = [
+            {"lat": self.coords[2 * j] / COORD_SCALE, "lon": self.coords[2 * j + 1] / COORD_SCALE}
+            for j in range(start, end)
+        ]
+        return {"id": self.ids[index], "tags": tags, "geometry": geometry}
+
+    def candidates(self, lat, lng, radius):
+        """
+        半径外接矩形覆盖的网格内的所有道路（调用方再按实际距离筛选）
+        :return: way 元素列表
+        """
+        dlat = radius / 111320.0
+        dlng = radius / (111320.0 * math.cos(math.radians(lat)))
+        r1, c1 = cell_of(lat - dlat, lng - dlng, self.cell_size)
+        r2, c2 = cell_of(lat + dlat, lng + dlng, self.cell_size)
+
+        indexes = set()
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                key = r * CELL_STRIDE + c
+                pos = bisect_left(self.cell_keys, key)
+                if pos < len(self.cell_keys) and self.cell_keys[pos] == key:
+                    start, end = self.cell_offsets[pos], self.cell_offsets[pos + 1]
+                    indexes.update(self.cell_ways[start:end])
+        return [self.element(i) for i in sorted(indexes)]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_offline_index():
+    """
+    获取离线道路索引（首次调用时加载，文件路径见 roads.offline.path）
+    :return: OfflineRoadIndex；文件不存在或格式错误时返回 None
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            path = get_setting("roads.offline.path", "data/japan_roads.fclroads")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            try:
+                _index = OfflineRoadIndex(path)
+            except (OSError, ValueError) as e:
+                print(f"离线道路索引加载失败: {e}")
+                _index = False  # 不再重复尝试加载
+        return _index or None
@@ -1,10 +1,51 @@
 # utils/osm_roads.py
 # 功能：使用 OpenStreetMap (OSM) Overpass API 查询周边道路（地图集成）
 # 查询半径内道路宽度、类型（支持集装箱车可达性判断）
+# 支持按瓦片（slippy-map z16）缓存道路数据：同一工业园区内的多个地址只需查询一次 Overpass
+# 也可切换为离线后端（roads.backend: offline，见 utils/offline_roads.py）
+# 查询函数均为 async（xxx_async，在共享事件循环中执行），同名同步函数为兼容封装
 
-import requests
+import asyncio
+import math
+from itertools import chain
+from operator import itemgetter
 
-def query_osm_roads(lat, lng, radius=100, include_distance=True):
+import httpx
+import numpy as np
+
+from utils.async_http import async_http_post, run_sync
+from utils.cache import SQLiteCache
+from utils.offline_roads import get_offline_index
+from utils.settings import get_setting
+from utils.singleflight import SingleFlight
+from utils.timing import timer
+
+OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+
+EARTH_RADIUS = 6371000  # 地球半径（米）
+
+_get_lat = itemgetter("lat")
+_get_lon = itemgetter("lon")
+
+# 非机动车道路（不参与判断）
+NON_VEHICLE_TYPES = ["footway", "path", "steps", "cycleway", "pedestrian"]
+
+# 瓦片缓存只保留规则引擎用到的标签
+KEPT_TAGS = ["highway", "width", "lanes", "name", "name:ja"]
+
+TILE_ZOOM = get_setting("roads.tile_cache.zoom", 16)
+
+# 瓦片道路缓存（键：zoom/x/y，值：该瓦片内的道路及几何）
+ROAD_TILE_CACHE = SQLiteCache(
+    "osm_tiles",
+    ttl=get_setting("roads.tile_cache.ttl", 604800),
+    max_entries=get_setting("roads.tile_cache.max_entries", 20000),
+)
+
+# 进行中的相同 Overpass 查询（按查询语句 / 瓦片）只发送一次
+OVERPASS_FLIGHTS = SingleFlight()
+
+async def query_osm_roads_async(lat, lng, radius=100, include_distance=True):
     """
     查询 OSM 道路数据（改进版：返回道路到目标点的距离）
     :param lat, lng: 地址经纬度
@@ -12,77 +53,401 @@ def query_osm_roads(lat, lng, radius=100, include_distance=True):
     :param include_distance: 是否计算道路到目标点的距离
     :return: 道路列表 [{"name": "", "width": float/None, "type": "", "distance": float}]
     """
-    overpass_url = "https://overpass-api.de/api/interpreter"
-    
-    # 查询所有道路（包含几何信息以计算距离）
-    query = f"""
-    [out:json][timeout:15];
-    way(around:{radius},{lat},{lng})["highway"];
-    out geom;
-    """
-    
     try:
-        resp = requests.post(overpass_url, data=query, timeout=25)
-        resp.raise_for_status()
-        data = resp.json()
-        elements = data.get("elements", [])
-        
+        offline_index = get_offline_index() if get_setting("roads.backend", "overpass") == "offline" else None
+        if offline_index:
+            elements = filter_within_radius(offline_index.candidates(lat, lng, radius), lat, lng, radius)
+        elif get_setting("roads.tile_cache.enabled", True):
+            elements = await query_tile_elements_async(lat, lng, radius)
+        else:
+            elements = await fetch_overpass_async(f'way(around:{radius},{lat},{lng})["highway"];')
+
         if not elements:
             print(f"  OSM 未返回道路数据（可能是查询超时或该区域无数据）")
-        
-        roads = []
-        for e in elements:
-            tags = e.get("tags", {})
-            highway_type = tags.get("highway", "unknown")
-            
-            # 跳过非机动车道路
-            if highway_type in ["footway", "path", "steps", "cycleway", "pedestrian"]:
-                continue
-            
-            width = tags.get("width")
-            width_val = None
-            
-            # 尝试解析宽度
-            if width:
-                try:
-                    # 处理各种宽度格式：3.5, 3.5m, 3.5 m
-                    width_str = width.replace("m", "").replace("M", "").strip()
-                    width_val = float(width_str)
-                except (ValueError, AttributeError):
-                    pass
-            
-            # 如果没有明确宽度，根据道路类型估算
-            if width_val is None:
-                width_val = estimate_width_by_type(highway_type)
-            
-            # 计算道路到目标点的最短距离
-            distance = None
-            if include_distance and "geometry" in e:
-                distance = calculate_min_distance(lat, lng, e["geometry"])
-            
-            roads.append({
-                "name": tags.get("name", tags.get("name:ja", "未知道路")),
-                "width": width_val,
-                "type": highway_type,
-                "lanes": tags.get("lanes"),
-                "distance": distance
-            })
-        
-        return roads
-    except requests.exceptions.Timeout:
-        print(f"  OSM 查询超时: ({lat}, {lng}) - 请稍后重试")
+
+        return parse_road_elements(elements, lat, lng, include_distance)
+    except Exception as e:
+        _report_query_error(e, f"({lat}, {lng})")
         return []
-    except requests.exceptions.RequestException as e:
-        print(f"  OSM 网络错误: {e}")
+
+
+def query_osm_roads(lat, lng, radius=100, include_distance=True):
+    """同步版本（见 query_osm_roads_async）"""
+    return run_sync(query_osm_roads_async(lat, lng, radius, include_distance))
+
+
+async def query_osm_roads_batch_async(points, radius=100, include_distance=True):
+    """
+    批量查询多个地点的道路（合并为少量 Overpass 请求，再在本地把道路分配给各地点）
+    :param points: [(lat, lng), ...]
+    :param radius: 查询半径（米）
+    :param include_distance: 是否计算道路到目标点的距离
+    :return: 与 points 顺序一致的道路列表，每项格式同 query_osm_roads
+    """
+    if not points:
         return []
-    except KeyError as e:
+
+    # 相同坐标只查询一次，结果按原顺序分发（道路列表共享，调用方只读）
+    points = [tuple(point) for point in points]
+    unique = list(dict.fromkeys(points))
+    if len(unique) < len(points):
+        roads = dict(zip(unique, await query_osm_roads_batch_async(unique, radius, include_distance)))
+        return [roads[point] for point in points]
+
+    if get_setting("roads.backend", "overpass") == "offline" and get_offline_index():
+        return [await query_osm_roads_async(lat, lng, radius, include_distance) for lat, lng in points]
+
+    if get_setting("roads.tile_cache.enabled", True):
+        # 所有地点需要的瓦片一起加载，缺失的瓦片按区块合并查询
+        point_tiles = [tiles_for_radius(lat, lng, radius) for lat, lng in points]
+        tile_elements = await load_tiles_async(set(chain.from_iterable(point_tiles)))
+        results = []
+        for (lat, lng), tiles in zip(points, point_tiles):
+            if any(tile not in tile_elements for tile in tiles):
+                results.append([])  # 瓦片查询失败，与单点查询失败时一致
+                continue
+            elements = merge_tile_elements(tiles, tile_elements, lat, lng, radius)
+            results.append(parse_road_elements(elements, lat, lng, include_distance))
+        return results
+
+    # 无瓦片缓存：相近的地点合并为一个 around 并集查询（各组并发执行）
+    results = [[] for _ in points]
+
+    async def fetch_cluster(cluster):
+        clauses = "".join(
+            f'way(around:{radius},{points[i][0]},{points[i][1]})["highway"];' for i in cluster
+        )
+        try:
+            print(f"  OSM 批量查询: {len(cluster)} 个地点")
+            elements = await fetch_overpass_async(f"({clauses});")
+        except Exception as e:
+            _report_query_error(e, f"{len(cluster)} 个地点")
+            return
+        for i in cluster:
+            lat, lng = points[i]
+            results[i] = parse_road_elements(
+                filter_within_radius(elements, lat, lng, radius), lat, lng, include_distance
+            )
+
+    await asyncio.gather(*(fetch_cluster(cluster) for cluster in cluster_points(points)))
+    return results
+
+
+def query_osm_roads_batch(points, radius=100, include_distance=True):
+    """同步版本（见 query_osm_roads_batch_async）"""
+    return run_sync(query_osm_roads_batch_async(points, radius, include_distance))
+
+
+def cluster_points(points, cell_size=None, max_points=None):
+    """
+    按网格把相近的地点分组（每组一个 Overpass 请求，组内地点数有上限）
+    :return: [[地点下标, ...], ...]
+    """
+    cell_size = cell_size or get_setting("roads.batch.cluster_size", 0.05)
+    max_points = max_points or get_setting("roads.batch.max_points_per_query", 20)
+    groups = {}
+    for i, (lat, lng) in enumerate(points):
+        groups.setdefault((math.floor(lat / cell_size), math.floor(lng / cell_size)), []).append(i)
+    clusters = []
+    for indexes in groups.values():
+        for start in range(0, len(indexes), max_points):
+            clusters.append(indexes[start:start + max_points])
+    return clusters
+
+
+def _report_query_error(e, where):
+    """输出 Overpass 查询失败原因（在 except 块中调用）"""
+    if isinstance(e, httpx.TimeoutException):
+        print(f"  OSM 查询超时: {where} - 请稍后重试")
+    elif isinstance(e, httpx.HTTPError):
+        print(f"  OSM 网络错误: {e}")
+    elif isinstance(e, KeyError):
         print(f"  OSM 数据解析错误: {e}")
-        return []
-    except Exception as e:
+    else:
         print(f"  OSM 查询错误: {e}")
         import traceback
         traceback.print_exc()
-        return []
+
+
+async def fetch_overpass_async(statement: str, timeout=25):
+    """
+    执行 Overpass 查询（含几何信息）；同一语句正在查询时等待其结果
+    :param statement: 查询语句（如 way(around:100,lat,lng)["highway"];）
+    :return: elements 列表（可能与其他调用方共享，不要修改）
+    :raises: httpx.HTTPError / ValueError（服务端运行错误）
+    """
+    with timer("overpass"):
+        return await OVERPASS_FLIGHTS.do(statement, _fetch_overpass_async, statement, timeout)
+
+
+async def _fetch_overpass_async(statement, timeout):
+    query = f"""
+    [out:json][timeout:15];
+    {statement}
+    out geom;
+    """
+    resp = await async_http_post(OVERPASS_URL, data=query, timeout=timeout)
+    resp.raise_for_status()
+    data = resp.json()
+    # Overpass 超时/内存不足时返回 remark，结果不完整
+    if data.get("remark") and "error" in data["remark"].lower():
+        raise ValueError(f"Overpass 返回错误: {data['remark']}")
+    return data.get("elements", [])
+
+
+def fetch_overpass(statement: str, timeout=25):
+    """同步版本（见 fetch_overpass_async）"""
+    return run_sync(fetch_overpass_async(statement, timeout))
+
+
+def parse_road_elements(elements, lat, lng, include_distance=True):
+    """
+    将 Overpass 道路元素转换为规则引擎使用的道路列表
+    :param elements: Overpass 返回的 way 元素（含 tags / geometry）
+    :param lat, lng: 目标点坐标（用于计算距离）
+    :param include_distance: 是否计算道路到目标点的距离
+    :return: 道路列表
+    """
+    elements = [e for e in elements if e.get("tags", {}).get("highway", "unknown") not in NON_VEHICLE_TYPES]
+
+    # 一次向量化计算所有道路到目标点的最短距离
+    distances = [None] * len(elements)
+    if include_distance:
+        distances = calculate_min_distances(lat, lng, [e.get("geometry") for e in elements])
+
+    roads = []
+    for e, distance in zip(elements, distances):
+        tags = e.get("tags", {})
+        highway_type = tags.get("highway", "unknown")
+        
+        width = tags.get("width")
+        width_val = None
+        
+        # 尝试解析宽度
+        if width:
+            try:
+                # 处理各种宽度格式：3.5, 3.5m, 3.5 m
+                width_str = width.replace("m", "").replace("M", "").strip()
+                width_val = float(width_str)
+            except (ValueError, AttributeError):
+                pass
+        
+        # 如果没有明确宽度，根据道路类型估算
+        if width_val is None:
+            width_val = estimate_width_by_type(highway_type)
+        
+        roads.append({
+            "name": tags.get("name", tags.get("name:ja", "未知道路")),
+            "width": width_val,
+            "type": highway_type,
+            "lanes": tags.get("lanes"),
+            "distance": distance
+        })
+    
+    return roads
+
+
+# ============ 瓦片缓存 ============
+
+def latlng_to_tile(lat, lng, zoom=TILE_ZOOM):
+    """
+    经纬度 → slippy-map 瓦片坐标
+    :return: (x, y)
+    """
+    n = 2 ** zoom
+    x = int((lng + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return x, y
+
+
+def tile_bbox(x, y, zoom=TILE_ZOOM):
+    """
+    瓦片范围
+    :return: (south, west, north, east)
+    """
+    n = 2 ** zoom
+    west = x / n * 360.0 - 180.0
+    east = (x + 1) / n * 360.0 - 180.0
+    north = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    south = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tiles_for_radius(lat, lng, radius, zoom=TILE_ZOOM):
+    """
+    覆盖以目标点为中心、半径 radius 米的圆所需的瓦片（目标瓦片及相邻瓦片）
+    :return: [(x, y), ...]
+    """
+    dlat = radius / 111320.0
+    dlng = radius / (111320.0 * math.cos(math.radians(lat)))
+    x_min, y_min = latlng_to_tile(lat + dlat, lng - dlng, zoom)
+    x_max, y_max = latlng_to_tile(lat - dlat, lng + dlng, zoom)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def _compact_element(e):
+    """只保留规则引擎需要的字段，减小缓存体积"""
+    tags = e.get("tags", {})
+    return {
+        "id": e.get("id"),
+        "tags": {k: tags[k] for k in KEPT_TAGS if k in tags},
+        "geometry": [{"lat": g["lat"], "lon": g["lon"]} for g in e.get("geometry", []) if g],
+    }
+
+
+def _element_overlaps(e, bbox):
+    """道路外接矩形是否与瓦片范围相交"""
+    south, west, north, east = bbox
+    lats = [g["lat"] for g in e["geometry"]]
+    lngs = [g["lon"] for g in e["geometry"]]
+    if not lats:
+        return False
+    return min(lats) <= north and max(lats) >= south and min(lngs) <= east and max(lngs) >= west
+
+
+async def fetch_tiles_async(tiles, zoom=TILE_ZOOM):
+    """
+    一次 Overpass 查询获取多个瓦片的道路，按瓦片拆分后写入缓存
+    :param tiles: [(x, y), ...]
+    :return: {(x, y): elements}
+    """
+    bboxes = {tile: tile_bbox(tile[0], tile[1], zoom) for tile in tiles}
+    south = min(b[0] for b in bboxes.values())
+    west = min(b[1] for b in bboxes.values())
+    north = max(b[2] for b in bboxes.values())
+    east = max(b[3] for b in bboxes.values())
+
+    print(f"  OSM 瓦片查询: {len(tiles)} 个瓦片")
+    elements = await fetch_overpass_async(f'way["highway"]({south},{west},{north},{east});')
+    elements = [
+        _compact_element(e) for e in elements
+        if e.get("tags", {}).get("highway") not in NON_VEHICLE_TYPES
+    ]
+
+    # 拆分瓦片和写入 SQLite 缓存在线程池中执行，不阻塞共享事件循环
+    return await asyncio.to_thread(split_tiles, elements, bboxes, zoom)
+
+
+def split_tiles(elements, bboxes, zoom=TILE_ZOOM):
+    """
+    按瓦片拆分道路并写入缓存
+    :param bboxes: {(x, y): (south, west, north, east)}
+    :return: {(x, y): elements}
+    """
+    result = {}
+    for tile, bbox in bboxes.items():
+        tile_elements = [e for e in elements if _element_overlaps(e, bbox)]
+        ROAD_TILE_CACHE.set(f"{zoom}/{tile[0]}/{tile[1]}", tile_elements)
+        result[tile] = tile_elements
+    return result
+
+
+def fetch_tiles(tiles, zoom=TILE_ZOOM):
+    """同步版本（见 fetch_tiles_async）"""
+    return run_sync(fetch_tiles_async(tiles, zoom))
+
+
+def read_cached_tiles(tiles, zoom=TILE_ZOOM):
+    """
+    从缓存读取多个瓦片的道路
+    :return: {(x, y): elements}；未缓存的瓦片不在结果中
+    """
+    tile_elements = {}
+    for tile in tiles:
+        cached = ROAD_TILE_CACHE.get(f"{zoom}/{tile[0]}/{tile[1]}")
+        if cached is not None:
+            tile_elements[tile] = cached
+    return tile_elements
+
+
+async def load_tiles_async(tiles, zoom=TILE_ZOOM):
+    """
+    读取多个瓦片的道路（先查缓存，缺失的瓦片按区块合并为少量 Overpass 请求）
+    :param tiles: [(x, y), ...]
+    :return: {(x, y): elements}；查询失败的瓦片不在结果中
+    """
+    # SQLite 读取在线程池中执行，不阻塞共享事件循环
+    tile_elements = await asyncio.to_thread(read_cached_tiles, tiles, zoom)
+    missing = []
+    joined = {}
+    for tile in tiles:
+        if tile in tile_elements:
+            continue
+        # 其他请求正在查询该瓦片：等待其结果，不重复查询
+        waiter = OVERPASS_FLIGHTS.join((zoom, tile))
+        if waiter:
+            joined[waiter] = [tile]
+        else:
+            missing.append(tile)
+
+    if not missing and not joined:
+        print(f"  OSM 瓦片缓存命中: {len(tile_elements)} 个瓦片")
+        return tile_elements
+
+    # 同一区块（block × block 个瓦片）内的缺失瓦片合并为一次查询，各区块并发执行
+    block = get_setting("roads.batch.tile_block", 4)
+    groups = {}
+    for tile in missing:
+        groups.setdefault((tile[0] // block, tile[1] // block), []).append(tile)
+    for group in groups.values():
+        waiter = OVERPASS_FLIGHTS.start([(zoom, tile) for tile in group], fetch_tiles_async, group, zoom)
+        joined[waiter] = group
+
+    async def wait_group(waiter, group):
+        try:
+            result = await waiter.wait()
+        except Exception as e:
+            _report_query_error(e, f"{len(group)} 个瓦片")
+            return
+        tile_elements.update((tile, result[tile]) for tile in group if tile in result)
+
+    await asyncio.gather(*(wait_group(waiter, group) for waiter, group in joined.items()))
+    return tile_elements
+
+
+def load_tiles(tiles, zoom=TILE_ZOOM):
+    """同步版本（见 load_tiles_async）"""
+    return run_sync(load_tiles_async(tiles, zoom))
+
+
+def merge_tile_elements(tiles, tile_elements, lat, lng, radius):
+    """
+    合并相邻瓦片的道路（跨瓦片道路去重），只保留半径内的道路
+    """
+    seen = set()
+    elements = []
+    for tile in tiles:
+        for e in tile_elements.get(tile, []):
+            if e["id"] not in seen:
+                seen.add(e["id"])
+                elements.append(e)
+    return filter_within_radius(elements, lat, lng, radius)
+
+
+async def query_tile_elements_async(lat, lng, radius=100, zoom=TILE_ZOOM):
+    """
+    通过瓦片缓存查询半径内的道路元素（缺失的瓦片才访问 Overpass）
+    :return: 半径内的 way 元素列表（与 around 查询结果等价）
+    """
+    tiles = tiles_for_radius(lat, lng, radius, zoom)
+    tile_elements = await load_tiles_async(tiles, zoom)
+    if any(tile not in tile_elements for tile in tiles):
+        return []  # 瓦片查询失败（原因已在 load_tiles_async 中输出）
+    return merge_tile_elements(tiles, tile_elements, lat, lng, radius)
+
+
+def query_tile_elements(lat, lng, radius=100, zoom=TILE_ZOOM):
+    """同步版本（见 query_tile_elements_async）"""
+    return run_sync(query_tile_elements_async(lat, lng, radius, zoom))
+
+
+def filter_within_radius(elements, lat, lng, radius):
+    """
+    只保留有任意一段在半径内的道路（与 Overpass around 语义一致：按线段而非节点判断）
+    """
+    distances = calculate_min_distances(lat, lng, [e.get("geometry") for e in elements])
+    return [e for e, d in zip(elements, distances) if d is not None and d <= radius]
 
 
 def estimate_width_by_type(highway_type):
@@ -110,32 +475,64 @@ def calculate_min_distance(target_lat, target_lng, geometry):
     :param geometry: OSM 道路几何数据（节点列表）
     :return: 最短距离（米）
     """
-    import math
-    
-    min_distance = float('inf')
-    
-    # 遍历道路的所有节点
-    for node in geometry:
-        node_lat = node.get("lat")
-        node_lng = node.get("lon")
-        
-        if node_lat is None or node_lng is None:
-            continue
-        
-        # 使用 Haversine 公式计算距离
-        # 简化版：适用于短距离
-        lat_diff = math.radians(node_lat - target_lat)
-        lng_diff = math.radians(node_lng - target_lng)
-        
-        a = (math.sin(lat_diff / 2) ** 2 + 
-             math.cos(math.radians(target_lat)) * 
-             math.cos(math.radians(node_lat)) * 
-             math.sin(lng_diff / 2) ** 2)
-        
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = 6371000 * c  # 地球半径 6371km
-        
-        if distance < min_distance:
-            min_distance = distance
-    
-    return min_distance if min_distance != float('inf') else None
+    return calculate_min_distances(target_lat, target_lng, [geometry])[0]
+
+
+def calculate_min_distances(target_lat, target_lng, geometries):
+    """
+    一次向量化计算目标点到多条道路的最短距离（米）
+    按线段计算垂直距离（而不是只看节点），节点稀疏的长直道路也能得到正确距离
+    使用以目标点为原点的局部等距投影，100m 级别的距离误差可忽略
+    :param target_lat, target_lng: 目标点坐标
+    :param geometries: 多条道路的几何数据 [[{"lat", "lon"}, ...], ...]
+    :return: 每条道路的最短距离列表（无有效节点的道路为 None）
+    """
+    geometries = [geometry or [] for geometry in geometries]
+    try:
+        lats, lngs, way_index = _flatten_geometries(geometries)
+    except (TypeError, KeyError):
+        # 含有缺失坐标的节点（如 Overpass 不完整几何），先过滤再展开
+        geometries = [
+            [n for n in geometry if n and n.get("lat") is not None and n.get("lon") is not None]
+            for geometry in geometries
+        ]
+        lats, lngs, way_index = _flatten_geometries(geometries)
+
+    result = np.full(len(geometries), np.inf)
+    if len(lats):
+        # 投影到以目标点为原点的平面坐标（米）
+        meters_per_degree = EARTH_RADIUS * math.pi / 180
+        x = (lngs - target_lng) * meters_per_degree * math.cos(math.radians(target_lat))
+        y = (lats - target_lat) * meters_per_degree
+
+        # 每个节点到目标点的距离，与"以该节点为起点的线段"的距离取较小值
+        # （相邻节点属于同一条道路才构成线段；只有一个节点的道路只看节点距离）
+        distances = np.hypot(x, y)
+        seg = np.nonzero(way_index[:-1] == way_index[1:])[0]
+        if len(seg):
+            x1, y1 = x[seg], y[seg]
+            dx, dy = x[seg + 1] - x1, y[seg + 1] - y1
+            seg_len2 = dx * dx + dy * dy
+            with np.errstate(divide="ignore", invalid="ignore"):
+                t = np.where(seg_len2 > 0, -(x1 * dx + y1 * dy) / seg_len2, 0.0)
+            t = np.clip(t, 0.0, 1.0)
+            distances[seg] = np.minimum(distances[seg], np.hypot(x1 + t * dx, y1 + t * dy))
+
+        # way_index 已按道路顺序排列，按每条道路的起始位置分段取最小值
+        ways, starts = np.unique(way_index, return_index=True)
+        result[ways] = np.minimum.reduceat(distances, starts)
+
+    return [float(d) if np.isfinite(d) else None for d in result]
+
+
+def _flatten_geometries(geometries):
+    """
+    将多条道路的节点展开为连续数组
+    :return: (lats, lngs, way_index) 三个 numpy 数组
+    """
+    nodes = list(chain.from_iterable(geometries))
+    lats = np.fromiter(map(_get_lat, nodes), dtype=float, count=len(nodes))
+    lngs = np.fromiter(map(_get_lon, nodes), dtype=float, count=len(nodes))
+    counts = np.fromiter(map(len, geometries), dtype=np.intp, count=len(geometries))
+    way_index = np.repeat(np.arange(len(geometries)), counts)
+    return lats, lngs, way_index
@@ -0,0 +1,279 @@
+# utils/place_names.py
+# 功能：罗马字地名词典（英文地址 → 日文 都道府県 / 市区町村 / 町域）
+# - 47 个都道府県内置；市区町村（含政令市的区、郡）和町域由 scripts/build_place_names.py 从 KEN_ALL 生成
+# - 键统一为 romaji_key 并去掉行政后缀（Ōsaka / Oosaka / Osaka-fu、Inzai-shi / Inzaishi 视为相同）
+# - 词典文件按键排序、通过 mmap 二分查找，首次查询时才打开，不读入内存
+#
+# 文件格式（.fclnames，小端序）：
+#   b"FCLNAMES" + uint32 版本号
+#   uint32 头部长度 + 头部 JSON {"records", "source"}
+#   uint32[records]  每条记录在文本区中的偏移
+#   文本区：UTF-8，每条 "键\t类型\t名称\t都道府県\t上级\n"，按键升序
+#           类型：city（市区町村 / 政令市 / 郡）或 town（町域）；上级：政令市的区、郡内町村为 政令市 / 郡名，町域为所在市区町村
+
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from array import array
+from collections import namedtuple
+
+from utils.romaji import SUFFIX_ROMAJI, romaji_key, strip_suffix
+from utils.settings import get_setting
+
+MAGIC = b"FCLNAMES"
+VERSION = 1
+
+Place = namedtuple("Place", ["kind", "name", "prefecture", "parent"])
+
+# 都道府県英文名（romaji_key，不含 -ken / -fu / -to）
+PREFECTURE_ROMAJI = {
+    "hokkaido": "北海道", "aomori": "青森県", "iwate": "岩手県", "miyagi": "宮城県",
+    "akita": "秋田県", "yamagata": "山形県", "fukushima": "福島県", "ibaraki": "茨城県",
+    "tochigi": "栃木県", "gunma": "群馬県", "saitama": "埼玉県", "chiba": "千葉県",
+    "tokyo": "東京都", "kanagawa": "神奈川県", "niigata": "新潟県", "toyama": "富山県",
+    "ishikawa": "石川県", "fukui": "福井県", "yamanashi": "山梨県", "nagano": "長野県",
+    "gifu": "岐阜県", "shizuoka": "静岡県", "aichi": "愛知県", "mie": "三重県",
+    "shiga": "滋賀県", "kyoto": "京都府", "osaka": "大阪府", "hyogo": "兵庫県",
+    "nara": "奈良県", "wakayama": "和歌山県", "tottori": "鳥取県", "shimane": "島根県",
+    "okayama": "岡山県", "hiroshima": "広島県", "yamaguchi": "山口県", "tokushima": "徳島県",
+    "kagawa": "香川県", "ehime": "愛媛県", "kochi": "高知県", "fukuoka": "福岡県",
+    "saga": "佐賀県", "nagasaki": "長崎県", "kumamoto": "熊本県", "oita": "大分県",
+    "miyazaki": "宮崎県", "kagoshima": "鹿児島県", "okinawa": "沖縄県",
+}
+
+# 地名之后单独出现的后缀词（Inzai-shi、Chuo Ku、Hyogo Prefecture）
+SUFFIX_WORDS = {"shi", "ku", "machi", "cho", "mura", "son", "gun", "ken", "fu", "to", "do",
+                "prefecture", "city", "ward", "town", "village", "county", "district"}
+# 与地名连写的后缀（Inzaishi、Hyogoken），按长度优先尝试
+_ATTACHED_SUFFIXES = ("prefecture", "machi", "mura", "shi", "cho", "son", "gun", "ken", "ku", "fu", "to")
+_WORD_RE = re.compile(r"[^\W\d_]+")
+MAX_SPAN = 4  # 最多把连续 4 个单词合并为一个地名（Naka Yamate Dori）
+
+
+def prefecture_from_romaji(name: str):
+    """
+    英文都道府県名 → 日文（Tokyo / Hyōgo Prefecture / Osaka-fu / Kyoto-fu）
+    :return: 都道府県名；不是都道府県名时返回 None
+    """
+    key = romaji_key(name)
+    if key in PREFECTURE_ROMAJI:
+        return PREFECTURE_ROMAJI[key]
+    for suffix in _ATTACHED_SUFFIXES:
+        if key.endswith(suffix) and key[:-len(suffix)] in PREFECTURE_ROMAJI:
+            return PREFECTURE_ROMAJI[key[:-len(suffix)]]
+    return None
+
+
+def place_key(name: str, romaji: str) -> str:
+    """地名（汉字 + 读音）→ 词典键（去掉行政后缀）"""
+    return strip_suffix(name, romaji_key(romaji))
+
+
+def write_place_names(path, places, source=""):
+    """
+    写入地名词典文件
+    :param path: 输出文件路径
+    :param places: 可迭代对象 [(键, Place), ...]
+    :param source: 数据来源说明（写入头部）
+    :return: 写入的条数
+    """
+    lines = sorted({"\t".join((key,) + tuple(place)).encode("utf-8") + b"\n" for key, place in places if key})
+    offsets = array("I")
+    text = bytearray()
+    for line in lines:
+        offsets.append(len(text))
+        text += line
+    if struct.pack("=I", 1) != struct.pack("<I", 1):
+        offsets.byteswap()
+
+    header = json.dumps({"records": len(lines), "source": source}, ensure_ascii=False).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", VERSION))
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        f.write(offsets.tobytes())
+        f.write(text)
+    return len(lines)
+
+
+class PlaceNames:
+    """
+    地名词典（mmap + 二分查找）
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC or struct.unpack_from("<I", mm, len(MAGIC))[0] != VERSION:
+            mm.close()
+            raise ValueError(f"不支持的地名词典文件: {path}")
+        header_len = struct.unpack_from("<I", mm, len(MAGIC) + 4)[0]
+        start = len(MAGIC) + 8
+        header = json.loads(mm[start:start + header_len].decode("utf-8"))
+        self.count = header["records"]
+        self._offsets = start + header_len
+        self._text = self._offsets + self.count * 4
+        print(f"地名词典已加载: {self.count} 条（{path}）")
+
+    def _line(self, i):
+        start = self._text + struct.unpack_from("<I", self._mm, self._offsets + i * 4)[0]
+        return start, self._mm.find(b"\n", start)
+
+    def _key_at(self, i):
+        start, end = self._line(i)
+        return self._mm[start:self._mm.find(b"\t", start, end)]
+
+    def lookup(self, key: str):
+        """
+        :param key: 词典键（romaji_key，不含行政后缀）
+        :return: [Place, ...]
+        """
+        target = key.encode("utf-8")
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        places = []
+        while lo < self.count and self._key_at(lo) == target:
+            start, end = self._line(lo)
+            places.append(Place(*self._mm[start:end].decode("utf-8").split("\t")[1:]))
+            lo += 1
+        return places
+
+
+_names = None
+_names_lock = threading.Lock()
+
+def get_place_names():
+    """
+    获取地名词典（首次调用时打开，文件路径见 geocode.place_names.path）
+    :return: PlaceNames；未启用、文件不存在或格式错误时返回 None（仍可识别 47 个都道府県）
+    """
+    global _names
+    with _names_lock:
+        if _names is None:
+            if not get_setting("geocode.place_names.enabled", True):
+                _names = False
+                return None
+            path = get_setting("geocode.place_names.path", "data/place_names.fclnames")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            try:
+                _names = PlaceNames(path)
+            except (OSError, ValueError) as e:
+                print(f"地名词典加载失败: {e}")
+                _names = False  # 不再重复尝试加载
+        return _names or None
+
+
+def lookup_places(key: str):
+    """
+    查询词典键（含内置的都道府県）
+    :return: [Place, ...]
+    """
+    places = []
+    if key in PREFECTURE_ROMAJI:
+        places.append(Place("pref", PREFECTURE_ROMAJI[key], PREFECTURE_ROMAJI[key], ""))
+    names = get_place_names()
+    if names and len(key) >= 3:
+        places.extend(names.lookup(key))
+    return places
+
+
+def _lookup_span(joined: str):
+    """合并后的单词 → 地名（先按原样，再去掉连写的行政后缀）"""
+    places = lookup_places(joined)
+    if places:
+        return places
+    for suffix in _ATTACHED_SUFFIXES:
+        if joined.endswith(suffix) and len(joined) - len(suffix) >= 3:
+            places = lookup_places(joined[:-len(suffix)])
+            if places:
+                return places
+    return []
+
+
+def match_places(address: str):
+    """
+    从左到右一次扫描英文地址，匹配地名（每个位置优先匹配最多 MAX_SPAN 个连续单词）
+    :return: [[Place, ...], ...]（每个匹配到的地名一组候选）
+    """
+    words = [key for key in (romaji_key(w) for w in _WORD_RE.findall(address)) if key]
+    matches = []
+    i = 0
+    while i < len(words):
+        if words[i] in SUFFIX_WORDS:
+            i += 1
+            continue
+        for span in range(min(MAX_SPAN, len(words) - i), 0, -1):
+            places = _lookup_span("".join(words[i:i + span]))
+            if places:
+                matches.append(places)
+                i += span
+                break
+        else:
+            i += 1
+    return matches
+
+
+def resolve_places(address: str):
+    """
+    英文地址 → 日文 都道府県 + 市区町村 + 町域（按上下级关系在候选中选出一致的组合）
+    :return: (都道府県, 市区町村, 町域)；无法确定市区町村时只返回都道府県（如 ("東京都", "", "")）；
+             什么都没有匹配到，或同名市区町村无法区分时返回 None
+    """
+    matches = match_places(address)
+    prefectures = {p.name for group in matches for p in group if p.kind == "pref"}
+    cities = {(i, p) for i, group in enumerate(matches) for p in group if p.kind == "city"}
+    # 町域只采用与市区町村不同位置的单词（Tsurumi-ku 中的 tsurumi 不能同时作为町域 鶴見 为自己加分）
+    towns = [(i, p) for i, group in enumerate(matches) for p in group if p.kind == "town"]
+    city_names = {(p.prefecture, p.name) for _, p in cities}
+
+    def town_in(i, city):
+        return next((t.name for j, t in towns
+                     if j != i and t.parent == city.name and t.prefecture == city.prefecture), "")
+
+    def score(i, city):
+        return (4 * bool(town_in(i, city))
+                + 2 * (city.prefecture in prefectures)
+                + 1 * ((city.prefecture, city.parent) in city_names))
+
+    if cities:
+        scored = sorted(((score(i, c), i, c) for i, c in cities), key=lambda item: -item[0])
+        best_score, i, best = scored[0]
+        rivals = {(c.prefecture, c.name) for s, _, c in scored if s == best_score}
+        if len(rivals) == 1:
+            return best.prefecture, best.name, town_in(i, best)
+    if len(prefectures) == 1:
+        pref = next(iter(prefectures))
+        # 没有（可区分的）市区町村时，町域在该都道府県内唯一才采用
+        candidates = {(t.parent, t.name) for _, t in towns if t.prefecture == pref}
+        if len(candidates) == 1:
+            parent, town = candidates.pop()
+            return pref, parent, town
+        return pref, "", ""
+    return None
+
+
+def split_municipality(city: str):
+    """
+    市区町村名拆分为 上级 + 本级（横浜市鶴見区 → ("横浜市", "鶴見区")；西伯郡大山町 → ("西伯郡", "大山町")）
+    :return: (上级, 本级)；没有上级时上级为 ""
+    """
+    m = re.match(r"^(.+?郡)(.+)$", city) or re.match(r"^(.+?市)(.+区)$", city)
+    if m:
+        return m.group(1), m.group(2)
+    return "", city
+
+
+def parent_suffix(parent: str) -> str:
+    """上级（政令市 / 郡）在读音中的后缀"""
+    return SUFFIX_ROMAJI[parent[-1]][0]
@@ -0,0 +1,83 @@
+# utils/port_index.py
+# 功能：港口空间索引（启动时构建一次）
+# 港口坐标预先转换为单位球面三维坐标，最近邻 / 半径查询只需一次矩阵乘法，
+# 不再对每个地址用纯 Python 三角函数遍历所有港口
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+
+
+def to_unit_vectors(lats, lngs):
+    """经纬度 → 单位球面三维坐标 (n, 3)"""
+    lat = np.radians(np.asarray(lats, dtype=float))
+    lng = np.radians(np.asarray(lngs, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+class PortIndex:
+    """
+    港口索引：支持按类型（type: main / local）和地区（region）筛选的 k 近邻、半径查询
+    """
+
+    def __init__(self, ports):
+        self.ports = list(ports)
+        self.vectors = to_unit_vectors([p["lat"] for p in self.ports], [p["lng"] for p in self.ports])
+        self._views = {}
+
+    def view(self, port_type=None, region=None):
+        """
+        按条件筛选后的港口下标（结果缓存，相同条件只计算一次）
+        :return: numpy 下标数组
+        """
+        key = (port_type, region)
+        if key not in self._views:
+            self._views[key] = np.array([
+                i for i, p in enumerate(self.ports)
+                if (port_type is None or p.get("type") == port_type)
+                and (region is None or p.get("region") == region)
+            ], dtype=int)
+        return self._views[key]
+
+    def distances(self, points, port_type=None, region=None):
+        """
+        多个地点到筛选后港口的大圆距离矩阵（公里）
+        :param points: [(lat, lng), ...]
+        :return: (下标数组, 距离矩阵 [地点][港口])
+        """
+        indexes = self.view(port_type, region)
+        targets = to_unit_vectors([p[0] for p in points], [p[1] for p in points])
+        cos_angle = np.clip(targets @ self.vectors[indexes].T, -1.0, 1.0)
+        return indexes, EARTH_RADIUS_KM * np.arccos(cos_angle)
+
+    def nearest_batch(self, points, k=1, port_type=None, region=None):
+        """
+        多个地点各自最近的 k 个港口
+        :return: 与 points 顺序一致的 [[(port, distance_km), ...], ...]（按距离升序）
+        """
+        if not len(points):
+            return []
+        indexes, dist = self.distances(points, port_type, region)
+        k = min(k, len(indexes))
+        order = np.argsort(dist, axis=1, kind="stable")[:, :k]
+        return [
+            [(self.ports[indexes[j]], float(row_dist[j])) for j in row]
+            for row, row_dist in zip(order, dist)
+        ]
+
+    def nearest(self, lat, lng, k=1, port_type=None, region=None):
+        """
+        最近的 k 个港口
+        :return: [(port, distance_km), ...]（按距离升序）
+        """
+        return self.nearest_batch([(lat, lng)], k, port_type, region)[0]
+
+    def within(self, lat, lng, radius_km, port_type=None, region=None):
+        """
+        半径 radius_km 公里内的所有港口
+        :return: [(port, distance_km), ...]（按距离升序）
+        """
+        indexes, dist = self.distances([(lat, lng)], port_type, region)
+        dist = dist[0]
+        order = np.argsort(dist, kind="stable")
+        return [(self.ports[indexes[j]], float(dist[j])) for j in order if dist[j] <= radius_km]
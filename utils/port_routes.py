@@ -0,0 +1,118 @@
+# utils/port_routes.py
+# 功能：港口距离 / 牵引时间的计算（OSRM table 请求、直线距离估算、结果格式化）
+# 供 api/index.py 和离线脚本（scripts/build_drayage_grid.py）共用，导入时不创建 Flask 应用、不打开缓存
+
+import asyncio
+import math
+
+from utils.async_http import async_http_get, run_sync
+from utils.settings import get_setting
+from utils.timing import timer
+
+# OSRM 服务地址（可在 config/settings.yaml 的 osrm.base_url 改为自建服务）
+OSRM_URL = get_setting("osrm.base_url", "http://router.project-osrm.org")
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    R = 6371
+    dlat = math.radians(lat2 - lat1)
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    return round(R * c, 1)
+
+
+async def get_route_table_async(sources, destinations, timeout=15, base_url=None, max_table_size=None):
+    """
+    使用 OSRM table API 一次获取所有起点到所有终点的道路距离和时间
+    坐标数超过 osrm.max_table_size 时按起点分批请求（各批并发执行）
+    :param sources: 起点列表 [(lat, lng), ...]
+    :param destinations: 终点列表 [(lat, lng), ...]
+    :param base_url: OSRM 服务地址（默认 OSRM_URL）
+    :param max_table_size: 每次请求最多坐标数（默认 osrm.max_table_size）
+    :return: (distance_km, duration_minutes) 二维列表 [起点][终点]，失败的单元格为 (None, None)
+    """
+    table = [[(None, None)] * len(destinations) for _ in sources]
+    if not sources or not destinations:
+        return table
+    
+    base_url = base_url or OSRM_URL
+    max_sources = max(1, (max_table_size or get_setting("osrm.max_table_size", 100)) - len(destinations))
+    
+    async def fetch_chunk(start):
+        chunk = sources[start:start + max_sources]
+        coords = ";".join(f"{lng},{lat}" for lat, lng in list(chunk) + list(destinations))
+        params = {
+            "sources": ";".join(str(i) for i in range(len(chunk))),
+            "destinations": ";".join(str(len(chunk) + j) for j in range(len(destinations))),
+            "annotations": "duration,distance",
+        }
+        try:
+            with timer("osrm_table"):
+                resp = await async_http_get(f"{base_url}/table/v1/driving/{coords}", params=params, timeout=timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            if data.get("code") != "Ok":
+                print(f"OSRM table 查询失败: {data.get('code')}")
+                return
+            for i, (distances, durations) in enumerate(zip(data["distances"], data["durations"])):
+                for j, (distance_m, duration_s) in enumerate(zip(distances, durations)):
+                    if distance_m is None or duration_s is None:
+                        continue
+                    table[start + i][j] = (round(distance_m / 1000, 1), int(duration_s / 60))
+        except Exception as e:
+            print(f"OSRM table 查询失败: {e}")
+    
+    await asyncio.gather(*(fetch_chunk(start) for start in range(0, len(sources), max_sources)))
+    return table
+
+
+def get_route_table(sources, destinations, timeout=15, base_url=None, max_table_size=None):
+    """同步版本（见 get_route_table_async）"""
+    return run_sync(get_route_table_async(sources, destinations, timeout, base_url, max_table_size))
+
+
+def format_port_result(port, distance, total_minutes, estimated=False, source="osrm"):
+    """
+    港口距离结果（含格式化的牵引时间）
+    :param estimated: 是否为直线距离估算值（而非实际道路路线）
+    :param source: 数据来源 grid（预计算网格）/ osrm / estimate
+    :return: dict with name, code, distance, time
+    """
+    # 格式化时间字符串
+    hours = total_minutes // 60
+    mins = total_minutes % 60
+    
+    if hours > 0:
+        time_str = f"{hours}時間{mins}分" if mins > 0 else f"{hours}時間"
+    else:
+        time_str = f"{mins}分"
+    
+    return {
+        "name": port["name"],
+        "code": port["code"],
+        "distance": distance,
+        "time": time_str,
+        "minutes": total_minutes,  # 用于排序
+        "estimated": estimated,
+        "source": source
+    }
+
+
+def port_result_from_route(lat, lng, port, actual_distance, actual_duration):
+    """
+    由 OSRM 结果计算港口距离和牵引时间；OSRM 无结果时使用直线距离估算
+    """
+    if actual_distance and actual_duration:
+        distance = actual_distance
+        truck_factor = 2.0
+        total_minutes = int(actual_duration * truck_factor)
+        return format_port_result(port, distance, total_minutes)
+    
+    # 使用估算方法
+    straight_dist = haversine(lat, lng, port["lat"], port["lng"])
+    road_distance_factor = 1.4
+    distance = round(straight_dist * road_distance_factor, 1)
+    avg_speed = 25
+    total_minutes = int((distance / avg_speed) * 60)
+    return format_port_result(port, distance, total_minutes, estimated=True, source="estimate")
@@ -0,0 +1,166 @@
+# utils/postal_index.py
+# 功能：离线邮编索引（日本邮政 KEN_ALL，由 scripts/build_postal_index.py 预先转换）
+# 邮编 → 都道府県 / 市区町村 / 町域 + 代表坐标，不发送任何网络请求
+# 文件通过 mmap 打开、按邮编二分查找，加载时不读入整个文件
+#
+# 文件格式（.fclpost，小端序）：
+#   b"FCLPOSTL" + uint32 版本号
+#   uint32 头部长度 + 头部 JSON {"records", "text_bytes", "source"}
+#   records × (uint32 邮编, uint32 文本偏移, int32 纬度, int32 经度)   按邮编升序，坐标单位 1e-7 度，缺失为 0
+#   文本区：UTF-8，每条 "都道府県\t市区町村\t町域\t都道府県读音\t市区町村读音\t町域读音\t坐标精度\n"
+#           读音为罗马字（utils/romaji.py），坐标精度：town（町域）/ city（市区町村中心）/ 空（无坐标）
+
+import json
+import mmap
+import os
+import struct
+import threading
+
+from utils.settings import get_setting
+
+MAGIC = b"FCLPOSTL"
+VERSION = 1
+COORD_SCALE = 1e7
+RECORD = struct.Struct("<IIii")
+FIELDS = ["prefecture", "city", "town", "prefecture_romaji", "city_romaji", "town_romaji", "level"]
+
+
+def postal_number(postal_code):
+    """
+    "123-4567" / "1234567" → 1234567
+    :return: int；格式不正确返回 None
+    """
+    digits = str(postal_code).replace("-", "").strip()
+    if len(digits) != 7 or not digits.isdigit():
+        return None
+    return int(digits)
+
+
+def write_postal_index(path, entries, source=""):
+    """
+    写入离线邮编索引文件
+    :param path: 输出文件路径
+    :param entries: 可迭代对象 [{"postal_code", "prefecture", "city", "town", ..., "lat", "lng"}, ...]
+    :param source: 数据来源说明（写入头部）
+    :return: 写入的条数
+    """
+    records = []
+    text = bytearray()
+    offsets = {}
+    for entry in entries:
+        code = postal_number(entry["postal_code"])
+        if code is None:
+            continue
+        line = "\t".join(str(entry.get(key) or "") for key in FIELDS).encode("utf-8") + b"\n"
+        offset = offsets.get(line)
+        if offset is None:
+            offset = offsets[line] = len(text)
+            text += line
+        lat, lng = entry.get("lat"), entry.get("lng")
+        if lat is None or lng is None:
+            lat = lng = 0
+        records.append((code, offset, round(lat * COORD_SCALE), round(lng * COORD_SCALE)))
+    records.sort(key=lambda r: (r[0], r[1]))
+
+    header = json.dumps({"records": len(records), "text_bytes": len(text), "source": source},
+                        ensure_ascii=False).encode("utf-8")
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", VERSION))
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for record in records:
+            f.write(RECORD.pack(*record))
+        f.write(text)
+    return len(records)
+
+
+class PostalIndex:
+    """
+    离线邮编索引（mmap + 二分查找）
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mm = self._mm
+        if mm[:len(MAGIC)] != MAGIC or struct.unpack_from("<I", mm, len(MAGIC))[0] != VERSION:
+            mm.close()
+            raise ValueError(f"不支持的邮编索引文件: {path}")
+        header_len = struct.unpack_from("<I", mm, len(MAGIC) + 4)[0]
+        start = len(MAGIC) + 8
+        header = json.loads(mm[start:start + header_len].decode("utf-8"))
+        self.count = header["records"]
+        self._records = start + header_len
+        self._text = self._records + self.count * RECORD.size
+        print(f"离线邮编索引已加载: {self.count} 条（{path}）")
+
+    def _code_at(self, i):
+        return struct.unpack_from("<I", self._mm, self._records + i * RECORD.size)[0]
+
+    def lookup(self, postal_code):
+        """
+        查询邮编（一个邮编可能对应多个町域）
+        :param postal_code: "123-4567" 或 "1234567"
+        :return: [{"postal_code", "prefecture", "city", "town", ..., "level", "lat", "lng"}, ...]；没有记录返回 []
+        """
+        code = postal_number(postal_code)
+        if code is None:
+            return []
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._code_at(mid) < code:
+                lo = mid + 1
+            else:
+                hi = mid
+        entries = []
+        formatted = f"{code:07d}"
+        formatted = f"{formatted[:3]}-{formatted[3:]}"
+        while lo < self.count:
+            number, offset, lat, lng = RECORD.unpack_from(self._mm, self._records + lo * RECORD.size)
+            if number != code:
+                break
+            start = self._text + offset
+            end = self._mm.find(b"\n", start)
+            entry = dict(zip(FIELDS, self._mm[start:end].decode("utf-8").split("\t")))
+            entry["postal_code"] = formatted
+            entry["lat"] = lat / COORD_SCALE if entry["level"] else None
+            entry["lng"] = lng / COORD_SCALE if entry["level"] else None
+            entries.append(entry)
+            lo += 1
+        return entries
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_postal_index():
+    """
+    获取离线邮编索引（首次调用时打开，文件路径见 geocode.postal_index.path）
+    :return: PostalIndex；未启用、文件不存在或格式错误时返回 None
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            if not get_setting("geocode.postal_index.enabled", True):
+                _index = False
+                return None
+            path = get_setting("geocode.postal_index.path", "data/japan_postal.fclpost")
+            if not os.path.isabs(path):
+                path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), path)
+            try:
+                _index = PostalIndex(path)
+            except (OSError, ValueError) as e:
+                print(f"离线邮编索引加载失败: {e}")
+                _index = False  # 不再重复尝试加载
+        return _index or None
+
+
+def lookup_postal_code(postal_code):
+    """
+    查询邮编（离线索引不可用时返回 []）
+    :return: 同 PostalIndex.lookup
+    """
+    index = get_postal_index()
+    return index.lookup(postal_code) if index else []
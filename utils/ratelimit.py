@@ -0,0 +1,60 @@
+# utils/ratelimit.py
+# 功能：进程内共享的令牌桶限流器（遵守 Nominatim 等公共 API 的使用政策）
+# 所有请求共用同一个限流器实例，只有在真正达到速率上限时才等待
+
+import threading
+import time
+
+from utils.settings import get_setting
+
+
+class TokenBucket:
+    """
+    令牌桶：平均每秒 rate 个请求，允许突发 burst 个
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        预约一个令牌
+        :return: 需要等待的秒数（0 表示可以立即发送）
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+# 默认限流（可在 config/settings.yaml 的 rate_limits 中覆盖）
+# Nominatim / OSRM 演示服务器使用政策：每秒最多 1 个请求
+DEFAULT_RATE_LIMITS = {
+    "gsi": {"rate": 10.0, "burst": 10},
+    "nominatim": {"rate": 1.0, "burst": 1},
+    "overpass": {"rate": 1.0, "burst": 2},
+    "osrm": {"rate": 1.0, "burst": 2},
+}
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(name: str):
+    """
+    获取指定服务的共享限流器
+    :param name: 服务名（如 "nominatim"）
+    :return: TokenBucket；未配置限流的服务返回 None
+    """
+    with _limiters_lock:
+        if name not in _limiters:
+            conf = get_setting(f"rate_limits.{name}", DEFAULT_RATE_LIMITS.get(name))
+            _limiters[name] = TokenBucket(conf["rate"], conf.get("burst", 1)) if conf else None
+        return _limiters[name]
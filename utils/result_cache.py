@@ -0,0 +1,119 @@
+# utils/result_cache.py
+# 功能：/check 最终结果缓存（进程内 LRU + TTL，可选共享后端）
+# 同一地址、同一车辆类型在 TTL 内再次检查时直接返回结果，
+# 不再重复解析、地理编码、查询道路、判断规则和计算港口距离
+# 进程内缓存保存序列化后的 JSON（每次读取得到新的对象；按 JSON 大小限制内存占用）
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from utils.cache import SQLiteCache
+from utils.settings import get_setting
+
+
+class ResultCache:
+    """
+    两级结果缓存：进程内 LRU（微秒级）+ 可选共享后端（多 worker 进程共用）
+    共享后端只需实现 get_entry(key) → (value, 写入时间 time.time()) 或 None / set(key, value)，
+    默认使用 SQLiteCache，可替换为 Redis 等
+    """
+
+    def __init__(self, ttl=3600, max_entries=5000, backend=None, max_bytes=None):
+        """
+        :param ttl: 过期时间（秒）
+        :param max_entries: 进程内最多条数，超出后淘汰最久未访问的条目
+        :param backend: 共享后端（None 表示只用进程内缓存）
+        :param max_bytes: 进程内缓存结果的 JSON 总大小上限（字节），超出后同样按 LRU 淘汰；None 表示只限制条数
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.backend = backend
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """
+        读取缓存
+        :return: 新的结果 dict（含嵌套的 dict / list，调用方可任意修改）；未命中或已过期时返回 None
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return json.loads(entry[1])
+            if entry:
+                self._remove(key)
+
+        entry = self.backend.get_entry(key) if self.backend is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            value, created = entry
+            self.hits += 1
+            # 按后端的写入时间计算剩余有效期，进程内缓存不延长结果的 TTL
+            self._store(key, _dumps(value), now - max(0.0, time.time() - created))
+        return value
+
+    def set(self, key, value):
+        """
+        写入缓存（保存序列化后的 JSON，调用方之后修改结果不影响缓存）
+        """
+        data = _dumps(value)
+        with self._lock:
+            self._store(key, data, time.monotonic())
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def _store(self, key, data, now):
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (now, data)
+        self._bytes += len(data)
+        while len(self._entries) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    def _remove(self, key):
+        _, data = self._entries.pop(key)
+        self._bytes -= len(data)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """
+        命中统计（本进程）
+        :return: {"hits": int, "misses": int, "entries": int, "bytes": int（缓存结果的 JSON 总大小）}
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "bytes": self._bytes}
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def create_result_cache():
+    """
+    按 config/settings.yaml 的 result_cache 创建结果缓存
+    :return: ResultCache；未启用时返回 None
+    """
+    if not get_setting("result_cache.enabled", True):
+        return None
+    ttl = get_setting("result_cache.ttl", 3600)
+    backend = None
+    if get_setting("result_cache.shared", False):
+        backend = SQLiteCache("results", ttl=ttl, max_entries=get_setting("result_cache.shared_max_entries", 50000))
+    return ResultCache(ttl=ttl, max_entries=get_setting("result_cache.max_entries", 5000), backend=backend,
+                       max_bytes=get_setting("result_cache.max_bytes", 32 * 1024 * 1024))
@@ -0,0 +1,122 @@
+# utils/romaji.py
+# 功能：假名 → 罗马字（修正平文式），以及英文地名的比较键
+# 用于把 KEN_ALL 等数据中的读音（片假名）与英文地址中的地名对照（如 ﾌｶｴﾊﾏﾁｮｳ ↔ FUKAEHAMA-CHO）
+
+import re
+import unicodedata
+
+# 拗音（两个假名）
+_DIGRAPHS = {
+    "キャ": "kya", "キュ": "kyu", "キョ": "kyo",
+    "シャ": "sha", "シュ": "shu", "ショ": "sho", "シェ": "she",
+    "チャ": "cha", "チュ": "chu", "チョ": "cho", "チェ": "che",
+    "ニャ": "nya", "ニュ": "nyu", "ニョ": "nyo",
+    "ヒャ": "hya", "ヒュ": "hyu", "ヒョ": "hyo",
+    "ミャ": "mya", "ミュ": "myu", "ミョ": "myo",
+    "リャ": "rya", "リュ": "ryu", "リョ": "ryo",
+    "ギャ": "gya", "ギュ": "gyu", "ギョ": "gyo",
+    "ジャ": "ja", "ジュ": "ju", "ジョ": "jo", "ジェ": "je",
+    "ヂャ": "ja", "ヂュ": "ju", "ヂョ": "jo",
+    "ビャ": "bya", "ビュ": "byu", "ビョ": "byo",
+    "ピャ": "pya", "ピュ": "pyu", "ピョ": "pyo",
+    "ファ": "fa", "フィ": "fi", "フェ": "fe", "フォ": "fo",
+    "ティ": "ti", "ディ": "di", "ウィ": "wi", "ウェ": "we", "ウォ": "wo",
+}
+
+_MONOGRAPHS = {
+    "ア": "a", "イ": "i", "ウ": "u", "エ": "e", "オ": "o",
+    "カ": "ka", "キ": "ki", "ク": "ku", "ケ": "ke", "コ": "ko",
+    "サ": "sa", "シ": "shi", "ス": "su", "セ": "se", "ソ": "so",
+    "タ": "ta", "チ": "chi", "ツ": "tsu", "テ": "te", "ト": "to",
+    "ナ": "na", "ニ": "ni", "ヌ": "nu", "ネ": "ne", "ノ": "no",
+    "ハ": "ha", "ヒ": "hi", "フ": "fu", "ヘ": "he", "ホ": "ho",
+    "マ": "ma", "ミ": "mi", "ム": "mu", "メ": "me", "モ": "mo",
+    "ヤ": "ya", "ユ": "yu", "ヨ": "yo",
+    "ラ": "ra", "リ": "ri", "ル": "ru", "レ": "re", "ロ": "ro",
+    "ワ": "wa", "ヰ": "i", "ヱ": "e", "ヲ": "o", "ン": "n",
+    "ガ": "ga", "ギ": "gi", "グ": "gu", "ゲ": "ge", "ゴ": "go",
+    "ザ": "za", "ジ": "ji", "ズ": "zu", "ゼ": "ze", "ゾ": "zo",
+    "ダ": "da", "ヂ": "ji", "ヅ": "zu", "デ": "de", "ド": "do",
+    "バ": "ba", "ビ": "bi", "ブ": "bu", "ベ": "be", "ボ": "bo",
+    "パ": "pa", "ピ": "pi", "プ": "pu", "ペ": "pe", "ポ": "po",
+    "ヴ": "vu", "ァ": "a", "ィ": "i", "ゥ": "u", "ェ": "e", "ォ": "o",
+    "ャ": "ya", "ュ": "yu", "ョ": "yo", "ヮ": "wa",
+}
+
+# 英文拼写差异的统一：长音（ou / oo / uu / oh）、拨音 m（Shimbashi）、促音 cch
+_KEY_RULES = [
+    (re.compile(r"ou|oo|oh(?![aeiou])"), "o"),
+    (re.compile(r"uu"), "u"),
+    (re.compile(r"m(?=[bpm])"), "n"),
+    (re.compile(r"cch"), "tch"),
+]
+_NON_LETTER = re.compile(r"[^a-z]")
+
+
+def kana_to_romaji(text: str) -> str:
+    """
+    片假名 / 平假名（含半角片假名）→ 小写罗马字，非假名字符原样保留
+    :param text: 假名字符串（如 KEN_ALL 的读音 "ﾌｶｴﾊﾏﾁｮｳ"）
+    :return: 罗马字（如 "fukaehamachou"）
+    """
+    text = unicodedata.normalize("NFKC", text)
+    # 平假名 → 片假名
+    text = "".join(chr(ord(c) + 0x60) if "ぁ" <= c <= "ゖ" else c for c in text)
+    out = []
+    sokuon = False
+    i = 0
+    while i < len(text):
+        pair = text[i:i + 2]
+        if pair in _DIGRAPHS:
+            roma = _DIGRAPHS[pair]
+            i += 2
+        elif text[i] in _MONOGRAPHS:
+            roma = _MONOGRAPHS[text[i]]
+            i += 1
+        elif text[i] == "ッ":
+            sokuon = True
+            i += 1
+            continue
+        elif text[i] == "ー":
+            i += 1
+            continue
+        else:
+            roma = text[i]
+            i += 1
+        if sokuon:
+            # 促音：重复下一个辅音（chi → tchi）
+            if roma.startswith("ch"):
+                roma = "t" + roma
+            elif roma[:1].isalpha() and roma[:1] not in "aeiou":
+                roma = roma[0] + roma
+            sokuon = False
+        out.append(roma)
+    return "".join(out)
+
+
+def romaji_key(text: str) -> str:
+    """
+    英文 / 罗马字地名的比较键：只保留小写字母，并统一常见的拼写差异
+    例："Ōsaka" / "OSAKA" / "oosaka" → "osaka"；"Shimbashi" / "shinbashi" → "shinbashi"
+    """
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = _NON_LETTER.sub("", text)
+    for pattern, repl in _KEY_RULES:
+        text = pattern.sub(repl, text)
+    return text
+
+
+# 市区町村 / 町域的行政后缀在读音中的写法
+SUFFIX_ROMAJI = {"市": ("shi",), "区": ("ku",), "郡": ("gun",), "町": ("machi", "cho"), "村": ("mura", "son")}
+
+
+def strip_suffix(name: str, key: str) -> str:
+    """
+    去掉读音中与汉字名末尾行政后缀对应的部分（印西市 / inzaishi → inzai）
+    :param name: 汉字地名
+    :param key: 读音的比较键（romaji_key）
+    """
+    for suffix in SUFFIX_ROMAJI.get(name[-1:], ()):
+        if key.endswith(suffix) and len(key) > len(suffix):
+            return key[:-len(suffix)]
+    return key
@@ -1,9 +1,22 @@
 # utils/rules.py
 # 功能：FCL 可达性规则引擎（含黑白名单）
 # 判断逻辑：道路宽度 >= 3.5m + 黑名单（古街/步行街） + 白名单（工业区）
+# 关键词、道路类型分类和各车辆阈值见 config/rules.yaml（启动时编译，修改后自动重新加载）
 
-import yaml
+import hashlib
 import os
+import re
+import threading
+import time
+
+import yaml
+
+from utils.keyword_matcher import KeywordMatcher
+from utils.settings import get_setting
+
+CONFIG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "config")
+RULES_PATH = os.path.join(CONFIG_DIR, "rules.yaml")
+VEHICLES_PATH = os.path.join(CONFIG_DIR, "vehicles.yaml")
 
 # 修复：用 __file__ 定位到项目根目录下的 config
 def load_ports():
@@ -12,22 +25,102 @@ def load_ports():
     with open(config_path, "r", encoding="utf-8") as f:
         return yaml.safe_load(f)["destination_ports"]
 
-def load_vehicles():
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    config_path = os.path.join(current_dir, "..", "config", "vehicles.yaml")
-    with open(config_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)["vehicles"]
-
 # 全局变量
 PORTS = load_ports()
-VEHICLES = load_vehicles()
+
+# 楼层信息，匹配：3階、5F、10階建て、35F等
+FLOOR_PATTERN = re.compile(r'[0-9０-９]+[階F]|[0-9０-９]+階建')
+# 大写英文缩写（大楼名称）
+UPPER_ABBR_PATTERN = re.compile(r'[A-Z]{2,}')
+
+
+class CompiledRules:
+    """
+    编译后的规则（config/rules.yaml + config/vehicles.yaml）
+    请求处理时只做集合查找和自动机扫描，不再解析配置
+    """
+
+    def __init__(self, rules, vehicles, version):
+        self.version = version
+        self.vehicles = vehicles
+        # 地址关键词分类自动机
+        self.matcher = KeywordMatcher(rules["keywords"])
+        self.restricted_matcher = KeywordMatcher({"restricted": rules.get("restricted_areas", [])})
+        # 道路类型分类（highway → 分类名集合）
+        self.road_types = {name: frozenset(types) for name, types in rules["road_types"].items()}
+        self.large_vehicles = frozenset(rules.get("large_vehicles", []))
+        self.trailer_vehicles = frozenset(rules.get("trailer_vehicles", []))
+        # 按车辆类型的住宅区道路最低宽度
+        self.residential_width = rules.get("residential_width", {})
+        self.road_width = rules["road_width"]
+
+
+def load_rules():
+    """
+    读取并编译规则配置
+    :return: CompiledRules
+    """
+    with open(RULES_PATH, "rb") as f:
+        rules_bytes = f.read()
+    with open(VEHICLES_PATH, "rb") as f:
+        vehicles_bytes = f.read()
+    version = hashlib.sha1(rules_bytes + b"\0" + vehicles_bytes).hexdigest()[:12]
+    rules = yaml.safe_load(rules_bytes.decode("utf-8"))
+    vehicles = yaml.safe_load(vehicles_bytes.decode("utf-8"))["vehicles"]
+    return CompiledRules(rules, vehicles, version)
+
+
+def _config_mtimes():
+    return tuple(os.stat(path).st_mtime_ns for path in (RULES_PATH, VEHICLES_PATH))
+
+
+_rules = load_rules()
+_rules_mtimes = _config_mtimes()
+_rules_checked_at = time.monotonic()
+_rules_lock = threading.Lock()
+
+def get_rules():
+    """
+    获取当前规则（rules.hot_reload 开启时，配置文件修改后自动重新编译，无需重启）
+    文件修改时间最多每 rules.check_interval 秒检查一次；新配置有错误时继续使用旧规则
+    :return: CompiledRules
+    """
+    global _rules, _rules_mtimes, _rules_checked_at
+    if not get_setting("rules.hot_reload", True):
+        return _rules
+    now = time.monotonic()
+    if now - _rules_checked_at < get_setting("rules.check_interval", 2):
+        return _rules
+    with _rules_lock:
+        if now - _rules_checked_at < get_setting("rules.check_interval", 2):
+            return _rules
+        _rules_checked_at = now
+        try:
+            mtimes = _config_mtimes()
+            if mtimes != _rules_mtimes:
+                _rules_mtimes = mtimes  # 出错时也不重复解析同一版本的文件
+                _rules = load_rules()
+                print(f"规则配置已重新加载（版本 {_rules.version}）")
+        except (OSError, yaml.YAMLError, KeyError, TypeError) as e:
+            print(f"规则配置重新加载失败，继续使用旧规则: {e}")
+    return _rules
+
+
+def rules_version():
+    """当前规则配置版本（rules.yaml + vehicles.yaml 内容的哈希）"""
+    return get_rules().version
 
 def is_restricted_area(parsed):
     """检查是否在限制区域（黑名单）。"""
-    # 黑名单：古街/商业区，无法进入集装箱车
-    restricted = ["東山区", "祇園", "銀座", "谷中", "国際通り"]
+    # 黑名单：古街/商业区，无法进入集装箱车（见 config/rules.yaml 的 restricted_areas）
     text = (parsed["city"] + parsed["town"] + parsed["rest"])
-    return any(area in text for area in restricted)
+    return bool(get_rules().restricted_matcher.match(text))
+
+def address_text(parsed, original_address=None):
+    """使用原始地址（如果提供）或解析后的地址"""
+    if original_address:
+        return original_address
+    return parsed.get("full", "") + parsed.get("city", "") + parsed.get("town", "") + parsed.get("rest", "")
 
 def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     """
@@ -38,40 +131,46 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     :param original_address: 原始地址（用于检查建筑物名称等信息）
     :return: (bool, str) - (可达, 日文理由)
     """
+    rules = get_rules()
+    full_address = address_text(parsed, original_address)
+    # 一次扫描得到命中的所有关键词分类
+    matched = rules.matcher.match(full_address)
+    return _evaluate_vehicle(rules, roads, parsed, vehicle_type, full_address, matched)
+
+def evaluate_all_vehicles(roads, parsed, original_address=None):
+    """
+    对同一组道路和地址，一次判断所有车辆类型（关键词只扫描一次）
+    :param roads: OSM 道路列表
+    :param parsed: 解析后的地址
+    :param original_address: 原始地址
+    :return: {车辆类型: (bool, str)}，顺序与 config/vehicles.yaml 一致（从大到小）
+    """
+    rules = get_rules()
+    full_address = address_text(parsed, original_address)
+    matched = rules.matcher.match(full_address)
+    return {
+        vehicle_type: _evaluate_vehicle(rules, roads, parsed, vehicle_type, full_address, matched)
+        for vehicle_type in rules.vehicles
+    }
+
+def _evaluate_vehicle(rules, roads, parsed, vehicle_type, full_address, matched):
+    """
+    单一车辆类型的判断（地址关键词已匹配）
+    :param matched: 地址命中的关键词分类
+    :return: (bool, str) - (可达, 日文理由)
+    """
+    road_types_of = rules.road_types
+    width_rules = rules.road_width
+    
     # 获取车辆配置
-    vehicle_config = VEHICLES.get(vehicle_type, VEHICLES["40ft"])
+    vehicle_config = rules.vehicles.get(vehicle_type, rules.vehicles["40ft"])
     min_width_required = vehicle_config["min_road_width"]
     vehicle_name = vehicle_config["name"]
     vehicle_width = vehicle_config["width"]
     
-    # 使用原始地址（如果提供）或解析后的地址
-    if original_address:
-        full_address = original_address
-    else:
-        full_address = parsed.get("full", "") + parsed.get("city", "") + parsed.get("town", "") + parsed.get("rest", "")
-    
     # ========== 白名单：工业/物流设施（优先级最高）==========
-    # 这些地方通常有足够的空间和转弯半径
-    industrial_keywords = [
-        # 港口/码头
-        "ふ頭", "埠頭", "港", "港湾",
-        # 工业区
-        "工業団地", "工業地帯", "工場", "製造所", "事業所",
-        # 物流设施
-        "物流センター", "物流基地", "配送センター", "倉庫", "デポ",
-        # 其他
-        "流通センター", "卸売市場",
-        # 特定工业区地名
-        "向洋町", "六甲アイランド",  # 六甲岛工业区
-        "深江浜", "深江浜町",  # 神户深江浜工业区
-        # 英文关键词
-        "FACTORY", "WAREHOUSE", "PLANT"
-    ]
-    
-    # 检查日文和英文地址
-    full_address_upper = full_address.upper()
-    if any(keyword in full_address for keyword in industrial_keywords) or \
-       any(keyword in full_address_upper for keyword in ["FACTORY", "WAREHOUSE", "PLANT"]):
+    # 这些地方通常有足够的空间和转弯半径（英文关键词不区分大小写）
+    if "industrial" in matched:
         return True, f"工業・物流施設、{vehicle_name}対応可能（広い敷地・転回スペース確保）"
     
     # 特殊情况：如果地址包含"NO."或门牌号格式，且在农村/郊区（DISTRICT, TOWN等），可能是工厂
@@ -80,74 +179,52 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     # ========== 黑名单：不可达区域（优先级第二）==========
     
     # 1. 高层建筑（楼层信息）
-    import re
-    # 匹配：3階、5F、10階建て、35F等
-    floor_pattern = r'[0-9０-９]+[階F]|[0-9０-９]+階建'
-    if re.search(floor_pattern, full_address):
+    if FLOOR_PATTERN.search(full_address):
         return False, "高層ビル・商業施設内、コンテナ車進入不可"
     
     # 明确的高层建筑关键词
-    high_rise_keywords = ["タワー", "ツインタワー", "スクエア"]
-    if any(kw in full_address for kw in high_rise_keywords):
+    if "high_rise" in matched:
         # 但如果是工业设施的一部分，可能可达
-        if not any(kw in full_address for kw in ["工場", "倉庫", "物流"]):
+        if "high_rise_exempt" not in matched:
             return False, "高層ビル・商業施設内、コンテナ車進入不可"
     
     # "ビル"关键词需要更谨慎判断（很多地址都包含"ビル"）
     # 只有明确是商业大楼或写字楼才判断为不可达
-    building_keywords = ["ビル", "センタービル", "オフィスビル"]
-    if any(kw in full_address for kw in building_keywords):
+    if "building" in matched:
         # 如果不是工业设施，且不是简单的地址描述，判断为商业大楼
-        if not any(kw in full_address for kw in ["工場", "倉庫", "物流", "ふ頭", "港"]):
+        if "industrial_facility" not in matched:
             # 检查是否有明确的大楼名称（通常包含公司名或建筑名）
-            if any(kw in full_address for kw in ["生命", "センター", "オフィス"]) or \
-               re.search(r'[A-Z]{2,}', full_address):  # 包含大写英文缩写
+            if "building_name" in matched or \
+               UPPER_ABBR_PATTERN.search(full_address):  # 包含大写英文缩写
                 return False, "高層ビル・商業施設内、コンテナ車進入不可"
     
     # 2. 商业区/繁华街（道路狭窄、转弯困难）
-    # 检查明确的商业区关键词
-    commercial_keywords = [
-        "銀座", "祇園", "表参道", "原宿", "渋谷中心", "新宿駅", "池袋駅",
-        "商店街", "アーケード", "駅前ビル", "駅ビル", "ショッピングモール",
-        "109", "SHIBUYA109"  # 特定商业设施
-    ]
-    if any(keyword in full_address for keyword in commercial_keywords):
+    if "commercial" in matched:
         return False, "商業地区・繁華街、道路狭小・転回困難でコンテナ車進入不可"
     
     # 车站附近商业区（但不包括工业区）
     # 注意：有些车站前道路很宽，可以通行，所以不能一刀切
     # 只对明确的商业设施进行限制
-    station_commercial_keywords = ["駅ビル", "駅前ビル", "駅構内"]
-    if any(kw in full_address for kw in station_commercial_keywords):
+    if "station_commercial" in matched:
         return False, "駅前商業施設内、コンテナ車進入不可"
     
     # 3. 古街/观光地（道路狭窄、历史保护）
-    historic_keywords = [
-        "町家", "花見小路", "古街", "旧市街", "歴史地区",
-        "博物館", "神社", "寺", "城"
-    ]
-    if any(keyword in full_address for keyword in historic_keywords):
+    if "historic" in matched:
         return False, "歴史地区・観光地、道路狭小・文化財保護のためコンテナ車進入不可"
     
     # 4. 住宅密集区（道路狭窄、转弯困难）
-    residential_keywords = [
-        "住宅街", "団地", "マンション", "アパート"
-    ]
-    has_residential = any(keyword in full_address for keyword in residential_keywords)
+    has_residential = "residential" in matched
     
     # 检查是否为住宅区小路（生活道路）
     # 特征：地址中包含"丁目"但没有工业设施关键词
-    is_residential_area = "丁目" in full_address and not any(kw in full_address for kw in ["工場", "倉庫", "物流", "ふ頭", "港"])
+    is_residential_area = "chome" in matched and "industrial_facility" not in matched
     
     # 5. 公共设施（通常不适合大型车辆）
-    public_keywords = [
-        "動物園", "公園", "遊園地", "スタジアム", "体育館"
-    ]
-    if any(keyword in full_address for keyword in public_keywords):
+    if "public" in matched:
         return False, "公共施設、コンテナ車進入制限あり"
     
     # ========== 地址完整性检查 ==========
-    if "株式会社" in full_address or "近く" in full_address or "付近" in full_address:
+    if "unclear" in matched:
         return False, "住所不明確、詳細な住所確認が必要"
     
     # ========== 道路数据分析 ==========
@@ -158,14 +235,14 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
         return False, "住所解析不可、詳細確認必要"
     
     # 过滤无效道路类型（步行街、小路等）
-    pedestrian_types = ["pedestrian", "footway", "path", "steps", "cycleway"]
+    pedestrian_types = road_types_of["pedestrian"]
     valid_roads = [r for r in roads if r["type"] not in pedestrian_types]
     
     # 检查是否只有生活道路（living_street）- 这是住宅区的狭窄小路
     living_streets = [r for r in roads if r["type"] == "living_street"]
-    if living_streets and not any(r["type"] not in ["living_street"] + pedestrian_types for r in roads):
+    if living_streets and not any(r["type"] != "living_street" and r["type"] not in pedestrian_types for r in roads):
         # 只有生活道路，大型车辆无法通行
-        if vehicle_type in ["40ft", "20ft", "10t"]:
+        if vehicle_type in rules.large_vehicles:
             return False, "生活道路（住宅街の狭小路）、大型車両進入不可"
     
     if not valid_roads:
@@ -175,15 +252,15 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     road_types = [r["type"] for r in valid_roads]
     
     # 高速公路/主干道（通常可达）
-    major_roads = ["motorway", "trunk", "primary"]
+    major_roads = road_types_of["major"]
     has_major_road = any(t in major_roads for t in road_types)
     
     # 次要道路
-    secondary_roads = ["secondary", "tertiary"]
+    secondary_roads = road_types_of["secondary"]
     has_secondary_road = any(t in secondary_roads for t in road_types)
     
     # 小路/服务道路
-    minor_roads = ["residential", "service", "unclassified"]
+    minor_roads = road_types_of["minor"]
     has_minor_road = any(t in minor_roads for t in road_types)
     
     # ========== 道路宽度分析（优先考虑最近的道路）==========
@@ -192,15 +269,15 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     roads_with_distance = [r for r in valid_roads if r.get("distance") is not None]
     
     if roads_with_distance:
-        # 按距离排序，只使用最近的道路（30米内）
+        # 按距离排序，只使用最近的道路（默认30米内）
         nearest_roads = sorted(roads_with_distance, key=lambda x: x["distance"])
         
         # 只考虑30米内的道路（最后一段路）
-        last_mile_roads = [r for r in nearest_roads if r["distance"] <= 30]
+        last_mile_roads = [r for r in nearest_roads if r["distance"] <= width_rules["last_mile_distance"]]
         
         if not last_mile_roads:
             # 如果30米内没有道路，使用最近的3条道路
-            last_mile_roads = nearest_roads[:3]
+            last_mile_roads = nearest_roads[:width_rules["last_mile_fallback"]]
             min_distance = last_mile_roads[0]["distance"]
             print(f"  警告：最近道路距离{min_distance:.0f}m，判断可能不准确")
         
@@ -210,9 +287,9 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
         if not last_mile_widths:
             # 没有宽度数据，根据道路类型判断
             last_mile_types = [r["type"] for r in last_mile_roads]
-            if any(t in ["living_street", "service", "footway", "path"] for t in last_mile_types):
+            if any(t in road_types_of["narrow_no_width"] for t in last_mile_types):
                 return False, "最終区間が狭小路・生活道路、道路幅データなし、現地確認必要"
-            elif any(t in ["motorway", "trunk", "primary"] for t in last_mile_types):
+            elif any(t in major_roads for t in last_mile_types):
                 return True, f"最終区間が主要幹線道路、{vehicle_name}対応可能"
             else:
                 return False, "最終区間の道路幅データなし、現地確認必要"
@@ -228,7 +305,7 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
         print(f"  最后一段路：{len(last_mile_roads)}条道路，宽度{min_width:.1f}-{max_width:.1f}m")
         
         # 优先级1：如果最后一段路包含主干道（primary/trunk），且宽度足够，判断为可达
-        if any(t in ["motorway", "trunk", "primary"] for t in last_mile_types):
+        if any(t in major_roads for t in last_mile_types):
             # 主干道通常可达，但仍需检查最低宽度要求
             if max_width >= min_width_required:
                 return True, f"最終区間が主要幹線道路（幅{max_width:.1f}m）、{vehicle_name}対応可能"
@@ -236,8 +313,8 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
                 return False, f"主要幹線道路だが道路幅{max_width:.1f}m不足、{vehicle_name}（最低{min_width_required}m必要）進入不可"
         
         # 优先级2：如果最后一段路是生活街道或服务道路，大型车辆无法通行
-        if any(t in ["living_street", "service"] for t in last_mile_types):
-            if vehicle_type in ["40ft", "20ft", "10t"]:
+        if any(t in road_types_of["narrow"] for t in last_mile_types):
+            if vehicle_type in rules.large_vehicles:
                 return False, f"最終区間が生活道路・狭小路（幅{max_width:.1f}m）、{vehicle_name}進入不可"
             elif min_width < min_width_required:
                 return False, f"最終区間道路幅{min_width:.1f}m、{vehicle_name}（最低{min_width_required}m必要）進入不可"
@@ -245,25 +322,14 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
         # 如果最后一段路是住宅区道路（residential），需要更严格的判断
         if any(t == "residential" for t in last_mile_types):
             # 对于所有车辆，住宅区道路需要更宽的宽度（考虑路边停车、自行车、转弯等）
-            if vehicle_type in ["40ft", "20ft"]:
-                # 40ft/20ft拖车需要至少6米宽的住宅区道路
-                if max_width < 6.0:
-                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（転回困難・路上駐車あり）進入不可"
-            elif vehicle_type == "10t":
-                # 10t车需要至少5米宽的住宅区道路
-                if max_width < 5.0:
-                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（転回困難・路上駐車あり）進入不可"
-            elif vehicle_type == "4t":
-                # 4t车需要至少4.5米宽的住宅区道路
-                if max_width < 4.5:
-                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（転回困難・路上駐車あり）進入不可"
-            elif vehicle_type == "2t":
-                # 2t车需要至少4米宽的住宅区道路（考虑路边自行车、行人等）
-                if max_width < 4.0:
-                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（路上駐車・自転車あり）進入不可"
-                # 即使4米宽，也要警告可能有困难
-                elif max_width <= 4.0:
-                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（路上駐車・自転車により実質通行困難）進入不可"
+            # 各车辆的最低宽度见 config/rules.yaml 的 residential_width（40ft/20ft 6m、10t 5m、4t 4.5m、2t 4m）
+            residential = rules.residential_width.get(vehicle_type)
+            if residential:
+                if max_width < residential["min_width"]:
+                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（{residential['note']}）進入不可"
+                # 即使刚好满足最低宽度，也要警告可能有困难
+                elif residential.get("boundary_note") and max_width <= residential["min_width"]:
+                    return False, f"最終区間が住宅街の狭小路（幅{max_width:.1f}m）、{vehicle_name}（{residential['boundary_note']}）進入不可"
         
         # 使用最窄的道路宽度进行判断（车辆必须能通过最窄的地方）
         max_width = min_width
@@ -290,15 +356,15 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     # ========== 单向车道宽度计算 ==========
     # 假设双向道路，单向车道宽度约为总宽度的 40-45%
     # 考虑路边停车、路肩等因素
-    effective_lane_width = max_width * 0.45
+    effective_lane_width = max_width * width_rules["lane_ratio"]
     
     # 车辆需要的实际宽度（考虑安全余量）
     # 车宽 + 左右各 0.3m 安全距离
-    required_lane_width = vehicle_width + 0.6
+    required_lane_width = vehicle_width + width_rules["side_margin"]
     
     # 对向车辆通行所需宽度
     # 假设对向车辆为普通车（宽约2m）+ 安全余量0.5m
-    oncoming_vehicle_width = 2.5
+    oncoming_vehicle_width = width_rules["oncoming_width"]
     
     # 双向通行所需最小宽度
     min_width_for_two_way = required_lane_width + oncoming_vehicle_width
@@ -307,7 +373,7 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
     # 40ft 拖车转弯半径约 12-15m，需要较宽的道路
     # 如果是小路且没有工业设施，转弯可能困难
     turning_difficult = False
-    if vehicle_type in ["40ft", "20ft"] and has_minor_road and not has_major_road:
+    if vehicle_type in rules.trailer_vehicles and has_minor_road and not has_major_road:
         turning_difficult = True
     
     # ========== 综合判断 ==========
@@ -317,7 +383,7 @@ def can_access_fcl(roads, parsed, vehicle_type="40ft", original_address=None):
         return True, f"道路幅{max_width:.1f}m、{vehicle_name}対応可能（対向車通行に支障なし）"
     
     # 情况2：道路宽度满足车辆要求，但可能影响对向车辆
-    elif max_width >= min_width_required + 1.5:
+    elif max_width >= min_width_required + width_rules["one_way_margin"]:
         if turning_difficult:
             return False, f"道路幅{max_width:.1f}m、転回スペース不足、{vehicle_name}進入困難"
         elif has_residential or is_residential_area:
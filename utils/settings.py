@@ -0,0 +1,41 @@
+# utils/settings.py
+# 功能：加载 config/settings.yaml 运行时配置（缓存、外部 API 调用策略等）
+
+import os
+import tempfile
+import yaml
+
+def load_settings():
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    config_path = os.path.join(current_dir, "..", "config", "settings.yaml")
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            return yaml.safe_load(f) or {}
+    except FileNotFoundError:
+        return {}
+
+# 全局变量
+SETTINGS = load_settings()
+
+def get_setting(path: str, default=None):
+    """
+    按点分路径读取配置项
+    :param path: 配置路径，如 "geocode_cache.ttl"
+    :param default: 配置不存在时的默认值
+    :return: 配置值
+    """
+    node = SETTINGS
+    for key in path.split("."):
+        if not isinstance(node, dict) or key not in node:
+            return default
+        node = node[key]
+    return default if node is None else node
+
+def get_cache_dir():
+    """
+    获取本地缓存目录（不存在时自动创建）
+    :return: 目录绝对路径
+    """
+    cache_dir = get_setting("cache_dir") or os.path.join(tempfile.gettempdir(), "fcl-checker")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -0,0 +1,98 @@
+# utils/singleflight.py
+# 功能：合并进行中的相同请求（singleflight）
+# 同一个键同时只执行一次（如同一 GSI 候选地址、同一 Overpass 瓦片、同一 OSRM 起终点），
+# 其他调用方等待同一个结果；只在共享事件循环（utils/async_http.py）中使用，无需加锁
+
+import asyncio
+
+
+class _Call:
+    """一次进行中的请求（所有等待方都取消后才取消请求本身）"""
+
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+        self.abandoned = False  # 所有等待方都已取消
+
+    def release(self):
+        self.waiters -= 1
+        if self.waiters == 0 and not self.task.done():
+            self.abandoned = True
+            self.task.cancel()
+
+
+class _Waiter:
+    """
+    一个调用方对进行中请求的等待：join() / start() 时即登记，wait() 结束后注销
+    （在 join 与 wait 之间发起方被取消时，请求不会因为“没有等待方”而被取消）
+    """
+
+    def __init__(self, call):
+        self.call = call
+        call.waiters += 1
+
+    async def wait(self):
+        try:
+            return await asyncio.shield(self.call.task)
+        except asyncio.CancelledError:
+            # 共享请求本身被取消（而不是当前调用方被取消）：作为普通错误交给调用方处理
+            if self.call.task.cancelled():
+                raise RuntimeError("合并的请求已被取消") from None
+            raise
+        finally:
+            self.call.release()
+
+
+class SingleFlight:
+    """
+    按键合并进行中的相同异步调用
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.calls = 0    # 实际执行次数
+        self.shared = 0   # 合并到进行中请求的次数
+
+    def join(self, key):
+        """
+        加入进行中的请求（立即登记为等待方，之后必须 await waiter.wait() 一次）
+        :return: _Waiter；没有进行中的请求时返回 None
+        """
+        call = self._calls.get(key)
+        if call is None or call.abandoned:
+            return None
+        self.shared += 1
+        return _Waiter(call)
+
+    def start(self, keys, func, *args):
+        """
+        开始执行 func(*args) 并登记在 keys 下（一次请求覆盖多个键时，如多个瓦片合并查询）
+        :return: 发起方的 _Waiter（之后必须 await waiter.wait() 一次）
+        """
+        call = _Call(asyncio.ensure_future(func(*args)))
+        self.calls += 1
+        for key in keys:
+            self._calls[key] = call
+
+        def done(_):
+            for key in keys:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+
+        call.task.add_done_callback(done)
+        return _Waiter(call)
+
+    async def do(self, key, func, *args):
+        """
+        执行 func(*args)；同一键已有进行中的请求时等待其结果，不重复执行
+        :return: func 的返回值（异常同样传给所有等待方）
+        """
+        waiter = self.join(key) or self.start([key], func, *args)
+        return await waiter.wait()
+
+    def stats(self):
+        """
+        合并统计
+        :return: {"calls": int, "shared": int, "in_flight": int}
+        """
+        return {"calls": self.calls, "shared": self.shared, "in_flight": len(set(map(id, self._calls.values())))}
@@ -0,0 +1,136 @@
+# utils/timing.py
+# 功能：/check 各阶段耗时统计
+# - timer(stage)：记录一个阶段的耗时，汇总到进程内直方图（GET /metrics，Prometheus 文本格式）
+# - collect_spans()：同时把耗时记录到当前地址的列表中（contextvars），用于结果中的 timings
+
+import asyncio
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.settings import get_setting
+
+DEFAULT_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# 带查询内容的阶段（每次尝试单独列出）
+ATTEMPT_STAGES = {"geocode_gsi", "geocode_nominatim", "reverse_geocode_nominatim"}
+
+
+class StageMetrics:
+    """
+    各阶段耗时直方图（进程内累计）
+    """
+
+    def __init__(self, buckets=None):
+        self.buckets = sorted(buckets or get_setting("metrics.buckets", DEFAULT_BUCKETS))
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    entry["buckets"][i] += 1
+            entry["sum"] += seconds
+            entry["count"] += 1
+
+    def render(self):
+        """
+        Prometheus 文本格式
+        :return: str
+        """
+        lines = [
+            "# HELP fcl_stage_duration_seconds Duration of /check pipeline stages.",
+            "# TYPE fcl_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for stage in sorted(self._stages):
+                entry = self._stages[stage]
+                for bound, count in zip(self.buckets, entry["buckets"]):
+                    lines.append(f'fcl_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'fcl_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {entry["count"]}')
+                lines.append(f'fcl_stage_duration_seconds_sum{{stage="{stage}"}} {entry["sum"]:.6f}')
+                lines.append(f'fcl_stage_duration_seconds_count{{stage="{stage}"}} {entry["count"]}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = StageMetrics()
+
+# 当前地址的耗时记录 [(stage, detail, seconds), ...]
+_spans = contextvars.ContextVar("timing_spans", default=None)
+
+
+@contextmanager
+def timer(stage, detail=None):
+    """
+    记录一个阶段的耗时（同步代码和协程中都可使用；被取消的阶段不记录）
+    :param stage: 阶段名（parse / geocode / geocode_gsi / roads / rules / ports 等）
+    :param detail: 附加信息（如地理编码的候选地址）
+    """
+    start = time.perf_counter()
+    cancelled = False
+    try:
+        yield
+    except asyncio.CancelledError:
+        cancelled = True
+        raise
+    finally:
+        if not cancelled:
+            seconds = time.perf_counter() - start
+            METRICS.observe(stage, seconds)
+            spans = _spans.get()
+            if spans is not None:
+                spans.append((stage, detail, seconds))
+
+
+@contextmanager
+def collect_spans(spans=None):
+    """
+    在此范围内（含其中创建的子任务）记录的耗时同时加入 spans
+    :return: spans 列表
+    """
+    spans = [] if spans is None else spans
+    token = _spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _spans.reset(token)
+
+
+async def collect_async(coro):
+    """
+    执行协程并收集其中的耗时
+    :return: (协程的返回值, spans)
+    """
+    with collect_spans() as spans:
+        return await coro, spans
+
+
+async def timed(stage, coro):
+    """执行协程并记录耗时"""
+    with timer(stage):
+        return await coro
+
+
+def summarize(spans, total=None):
+    """
+    单个地址的耗时明细（毫秒）
+    :return: {"parse": ms, "geocode": ms, ..., "geocode_attempts": [{"stage", "query", "ms"}, ...], "total": ms}
+    """
+    summary = {}
+    attempts = []
+    for stage, detail, seconds in spans:
+        ms = round(seconds * 1000, 1)
+        if stage in ATTEMPT_STAGES:
+            attempts.append({"stage": stage, "query": detail, "ms": ms})
+        else:
+            summary[stage] = round(summary.get(stage, 0) + ms, 1)
+    if attempts:
+        summary["geocode_attempts"] = attempts
+    if total is not None:
+        summary["total"] = round(total * 1000, 1)
+    return summary